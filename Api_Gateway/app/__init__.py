@@ -1,8 +1,12 @@
-from flask import Flask
+import os
+import sys
+from flask import Flask, g, jsonify, request
 from flask_cors import CORS
-from flask_caching import Cache
 
-cache = Cache()  # Create the Cache object
+# Make the shared sigma_common package importable
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from .utils.cache import cache  # The Cache object, keyed by data generation
 
 def create_app():
     app = Flask(__name__)
@@ -14,6 +18,20 @@ def create_app():
     app.config.from_object('config.Config')
     cache.init_app(app)  # Initialize Cache with the app
 
+    # Latency, query and cache metrics for /api/metrics; registered before the other request hooks
+    # so the timing covers them
+    from .utils.metrics import init_metrics
+    init_metrics(app)
+
+    # Serialize responses with orjson when available; also handles shape=columnar
+    from .utils.json_provider import make_json_provider, SHAPES
+    app.json = make_json_provider(app)
+
+    @app.before_request
+    def check_shape():
+        if request.args.get('shape', 'rows') not in SHAPES:
+            return jsonify({"error": "shape must be one of: " + ", ".join(SHAPES)}), 400
+
     # Register Blueprints
     from .routes.alerts import alerts_bp
     from .routes.count import count_bp
@@ -24,6 +42,10 @@ def create_app():
     from .routes.timeline import timeline_bp
     from .routes.logs import logs_bp
     from .routes.highrisk_users_outliers import highrisk_bp  # Import the new highrisk blueprint
+    from .routes.export import export_bp
+    from .routes.stream import stream_bp
+    from .routes.batch import batch_bp
+    from .routes.metrics import metrics_bp
 
     app.register_blueprint(alerts_bp, url_prefix='/api')
     app.register_blueprint(count_bp, url_prefix='/api')
@@ -34,5 +56,22 @@ def create_app():
     app.register_blueprint(timeline_bp, url_prefix='/api')
     app.register_blueprint(logs_bp, url_prefix='/api')
     app.register_blueprint(highrisk_bp, url_prefix='/api')  # Register the new blueprint
+    app.register_blueprint(export_bp, url_prefix='/api')
+    app.register_blueprint(stream_bp, url_prefix='/api')
+    app.register_blueprint(batch_bp, url_prefix='/api')
+    app.register_blueprint(metrics_bp, url_prefix='/api')
+
+    # ETags with 304 Not Modified, then gzip/brotli for large bodies; registered before Server-Timing
+    # so it runs after it and 304s keep that header
+    from .utils.compression import conditional_and_compressed
+    app.after_request(conditional_and_compressed)
+
+    # Report time spent in the database so clients and benchmarks can separate it from app time
+    @app.after_request
+    def add_server_timing(response):
+        db_time_ms = g.get('db_time_ms')
+        if db_time_ms is not None:
+            response.headers['Server-Timing'] = f"db;dur={db_time_ms:.1f}"
+        return response
 
     return app
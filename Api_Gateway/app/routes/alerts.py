@@ -1,12 +1,26 @@
 from flask import Blueprint, jsonify, request
-from app.utils.db import fetch_data
+from app.utils.db import fetch_data, fetch_data_concurrently
+from app.utils.pagination import use_keyset, fetch_keyset_page
+from app.utils.fields import parse_fields
 from app import cache  # Import the initialized cache object
+from app.utils.cache import generation_cache_key
+from sigma_common.tags import tag_filter_values
 
 alerts_bp = Blueprint('alerts', __name__)
 
+# tag= is answered from the alert_tags bridge by index rather than a LIKE scan of sigma_alerts.tags
+TAG_FILTER = """
+    AND id IN (
+        SELECT alert_tags.alert_id
+        FROM alert_tags
+        JOIN tags ON tags.id = alert_tags.tag_id
+        WHERE (tags.name = %s OR tags.name LIKE %s)
+        AND alert_tags.system_time >= NOW() - INTERVAL 7 DAY
+    )"""
+
 # Fetch paginated alerts
 @alerts_bp.route('/alerts', methods=['GET'])
-@cache.cached(timeout=60, query_string=True)
+@cache.cached(make_cache_key=generation_cache_key)
 def get_alerts():
     page = request.args.get('page', default=1, type=int)
     per_page = request.args.get('per_page', default=100, type=int)
@@ -14,25 +28,52 @@ def get_alerts():
     if page < 1 or per_page < 1:
         return jsonify({"error": "Invalid pagination parameters"}), 400
 
+    columns, error = parse_fields(request.args)
+    if error:
+        return jsonify({"error": error}), 400
+
+    where = "system_time >= NOW() - INTERVAL 7 DAY"
+    params = ()
+    # e.g. tag=t1059 matches T1059 and its sub-techniques, tag=execution the tactic
+    tag = request.args.get('tag')
+    if tag:
+        where += TAG_FILTER
+        params = tag_filter_values(tag)
+
+    # Cursor-based pages: pass pagination=keyset for the first page, then next_cursor/prev_cursor
+    if use_keyset(request.args):
+        alerts, pagination, status_code = fetch_keyset_page(
+            columns,
+            where,
+            params,
+            request.args.get('cursor'),
+            per_page,
+            total=request.args.get('total'),
+        )
+        if status_code != 200:
+            return jsonify(alerts), status_code
+        return jsonify({"alerts": alerts, "pagination": pagination}), 200
+
     offset = (page - 1) * per_page
 
-    query = """
-    SELECT *
+    query = f"""
+    SELECT {columns}
     FROM sigma_alerts
-    WHERE system_time >= NOW() - INTERVAL 7 DAY
+    WHERE {where}
     ORDER BY system_time DESC
     LIMIT %s OFFSET %s
     """
-    alerts, status_code = fetch_data(query, (per_page, offset))
+    total_query = f"SELECT COUNT(*) as total FROM sigma_alerts WHERE {where}"
+    # The page and its total are independent, so they run side by side
+    (alerts, status_code), (total_records, total_status_code) = fetch_data_concurrently(
+        (query, params + (per_page, offset)),
+        (total_query, params),
+    )
 
     if status_code != 200:
         return jsonify(alerts), status_code
-
-    total_query = "SELECT COUNT(*) as total FROM sigma_alerts WHERE system_time >= NOW() - INTERVAL 7 DAY"
-    total_records, status_code = fetch_data(total_query)
-
-    if status_code != 200:
-        return jsonify(total_records), status_code
+    if total_status_code != 200:
+        return jsonify(total_records), total_status_code
 
     response = {
         "alerts": alerts,
@@ -44,3 +85,17 @@ def get_alerts():
         },
     }
     return jsonify(response), 200
+
+# Fetch the raw event payload for a single alert, left out of listing pages by default
+@alerts_bp.route('/alerts/<int:alert_id>/raw', methods=['GET'])
+@cache.cached(timeout=300)
+def get_alert_raw(alert_id):
+    query = "SELECT id, raw FROM sigma_alerts WHERE id = %s"
+    alert, status_code = fetch_data(query, (alert_id,))
+
+    if status_code != 200:
+        return jsonify(alert), status_code
+    if not alert:
+        return jsonify({"error": "Alert not found"}), 404
+
+    return jsonify(alert[0]), 200
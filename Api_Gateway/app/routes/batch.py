@@ -0,0 +1,62 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from flask import Blueprint, current_app, jsonify, request
+
+batch_bp = Blueprint('batch', __name__)
+
+# Separate from the query threads: panels run their own concurrent queries on those
+BATCH_THREADS = int(os.getenv("BATCH_THREADS", "8"))
+_batch_executor = ThreadPoolExecutor(max_workers=BATCH_THREADS, thread_name_prefix="batch")
+
+# Routes that stream or recurse cannot be answered inside a batch
+BATCH_EXCLUDED = {"/api/batch", "/api/stream", "/api/export"}
+
+
+def _run_panel(app, path, params):
+    """Dispatch one GET through the normal routing, caching and error handling."""
+    with app.test_request_context(path, method='GET', query_string=params):
+        try:
+            response = app.full_dispatch_request()
+        except Exception as e:
+            app.logger.error(f"Batch request to {path} failed: {e}")
+            return 500, {"error": "Internal error"}
+        body = response.get_json(silent=True)
+        if body is None:
+            body = {"error": response.status}
+        return response.status_code, body
+
+
+# Answer several dashboard panel requests in one round trip, running them concurrently
+@batch_bp.route('/batch', methods=['POST'])
+def batch():
+    payload = request.get_json(silent=True) or {}
+    panels = payload.get('requests')
+    if not isinstance(panels, list) or not panels:
+        return jsonify({"error": "requests must be a non-empty list"}), 400
+    if len(panels) > current_app.config['BATCH_MAX_REQUESTS']:
+        return jsonify({"error": f"At most {current_app.config['BATCH_MAX_REQUESTS']} requests per batch"}), 400
+
+    requested = []
+    for index, panel in enumerate(panels):
+        if not isinstance(panel, dict):
+            return jsonify({"error": f"requests[{index}] must be an object"}), 400
+        path = panel.get('path')
+        params = panel.get('params') or {}
+        if not isinstance(path, str) or not path.startswith('/api/') or path in BATCH_EXCLUDED:
+            return jsonify({"error": f"requests[{index}] has an unsupported path"}), 400
+        if not isinstance(params, dict):
+            return jsonify({"error": f"requests[{index}].params must be an object"}), 400
+        requested.append((panel.get('id', index), path, params))
+
+    app = current_app._get_current_object()
+    futures = [
+        (panel_id, _batch_executor.submit(_run_panel, app, path, params))
+        for panel_id, path, params in requested
+    ]
+
+    responses = []
+    for panel_id, future in futures:
+        status, body = future.result()
+        responses.append({"id": panel_id, "status": status, "body": body})
+
+    return jsonify({"responses": responses}), 200
@@ -1,14 +1,21 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 from app.utils.db import fetch_data
-from app import cache  # Import the initialized cache object
+from app.utils.swr import swr_cached
+from app.utils.admission import limited
+from app.utils.timerange import bucket_time_filter
 
 computers_bp = Blueprint('computers', __name__)
 
-# Fetch computer impacted logs with cumulative risk scores
+# Fetch computer impacted logs with cumulative risk scores between start and end (default: the last 7 days)
 @computers_bp.route('/computer_impacted', methods=['GET'])
-@cache.cached(timeout=300)
+@swr_cached('computer_impacted')
+@limited('aggregate')
 def get_computer_impacted():
-    query = """
+    where, params, error = bucket_time_filter(request.args)
+    if error:
+        return jsonify({"error": error}), 400
+
+    query = f"""
     SELECT
         computer_name,
         COUNT(DISTINCT title) AS unique_titles,
@@ -17,9 +24,9 @@ def get_computer_impacted():
         SELECT
             computer_name,
             title,
-            MAX(risk) AS risk_score
-        FROM sigma_alerts
-        WHERE system_time >= NOW() - INTERVAL 7 DAY
+            MAX(max_risk) AS risk_score
+        FROM sigma_alerts_hourly
+        WHERE {where}
         AND computer_name IS NOT NULL
         GROUP BY computer_name, title
     ) AS unique_risks
@@ -27,7 +34,7 @@ def get_computer_impacted():
     ORDER BY total_unique_risk_score DESC
     LIMIT 50;
     """
-    computer_impacted_logs, status_code = fetch_data(query)
+    computer_impacted_logs, status_code = fetch_data(query, params)
 
     if status_code != 200:
         return jsonify(computer_impacted_logs), status_code
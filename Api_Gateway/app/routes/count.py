@@ -1,19 +1,25 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 from app.utils.db import fetch_data
 from app import cache  # Import the initialized cache object
+from app.utils.cache import generation_cache_key
+from app.utils.timerange import bucket_time_filter
 
 count_bp = Blueprint('count', __name__)
 
-# Fetch total count of events for the last 7 days
+# Fetch total count of events between start and end (default: the last 7 days) from the hourly rollup
 @count_bp.route('/total_count', methods=['GET'])
-@cache.cached(timeout=60)
+@cache.cached(make_cache_key=generation_cache_key)
 def get_total_count():
-    query = """
-    SELECT COUNT(*) AS total_count
-    FROM sigma_alerts
-    WHERE system_time >= NOW() - INTERVAL 7 DAY
+    where, params, error = bucket_time_filter(request.args)
+    if error:
+        return jsonify({"error": error}), 400
+
+    query = f"""
+    SELECT CAST(IFNULL(SUM(event_count), 0) AS SIGNED) AS total_count
+    FROM sigma_alerts_hourly
+    WHERE {where}
     """
-    total_count, status_code = fetch_data(query)
+    total_count, status_code = fetch_data(query, params)
 
     if status_code != 200:
         return jsonify(total_count), status_code
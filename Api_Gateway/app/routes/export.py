@@ -0,0 +1,76 @@
+import io
+import csv
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from mysql.connector import Error
+from app.utils.db import stream_data
+from app.utils.fields import parse_fields
+
+export_bp = Blueprint('export', __name__)
+
+# Optional filters, matching the parameters of the *_logs routes
+EXPORT_FILTERS = {
+    'user_origin': 'user_id',
+    'user_impacted': 'target_user_name',
+    'computer_name': 'computer_name',
+    'title': 'title',
+}
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+# Last line of a CSV export cut short by a database error, in the csv module's line ending
+CSV_INTERRUPTED = "# error: Export interrupted\r\n"
+
+# Stream alerts for the last 7 days as NDJSON or CSV without buffering the result set
+@export_bp.route('/export', methods=['GET'])
+def export_alerts():
+    export_format = request.args.get('format', default='ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": "format must be one of: " + ", ".join(EXPORT_FORMATS)}), 400
+
+    columns, error = parse_fields(request.args)
+    if error:
+        return jsonify({"error": error}), 400
+
+    conditions = ["system_time >= NOW() - INTERVAL 7 DAY"]
+    params = []
+    for arg, column in EXPORT_FILTERS.items():
+        value = request.args.get(arg)
+        if value:
+            conditions.append(f"{column} = %s")
+            params.append(value)
+
+    query = f"""
+    SELECT {columns}
+    FROM sigma_alerts
+    WHERE {' AND '.join(conditions)}
+    ORDER BY system_time DESC, id DESC
+    """
+
+    def generate():
+        header_written = False
+        try:
+            for rows in stream_data(query, tuple(params)):
+                if export_format == 'ndjson':
+                    yield "".join(current_app.json.dumps(row) + "\n" for row in rows)
+                    continue
+
+                buffer = io.StringIO()
+                writer = csv.DictWriter(buffer, fieldnames=list(rows[0].keys()))
+                if not header_written:
+                    writer.writeheader()
+                    header_written = True
+                writer.writerows(rows)
+                yield buffer.getvalue()
+        except Error:
+            # Headers are already sent; end the stream with a marker the client can detect
+            if export_format == 'ndjson':
+                yield current_app.json.dumps({"error": "Export interrupted"}) + "\n"
+            else:
+                yield CSV_INTERRUPTED
+
+    response = Response(stream_with_context(generate()), mimetype=EXPORT_FORMATS[export_format])
+    response.headers['Content-Disposition'] = f"attachment; filename=sigma_alerts.{export_format}"
+    return response
@@ -1,12 +1,15 @@
 from flask import Blueprint, jsonify, request
-from app.utils.db import fetch_data
+from app.utils.db import fetch_data_concurrently
+from app.utils.pagination import use_keyset, fetch_keyset_page
+from app.utils.fields import parse_fields
 from app import cache  # Import the initialized cache object
+from app.utils.cache import generation_cache_key
 
 logs_bp = Blueprint('logs', __name__)
 
 # Fetch logs for a selected origin user and title (paginated)
 @logs_bp.route('/user_origin_logs', methods=['GET'])
-@cache.cached(timeout=300, query_string=True)
+@cache.cached(make_cache_key=generation_cache_key)
 def get_user_origin_logs():
     user_origin = request.args.get('user_origin')
     title = request.args.get('title')
@@ -21,10 +24,27 @@ def get_user_origin_logs():
     if page < 1 or per_page < 1:
         return jsonify({"error": "Invalid pagination parameters"}), 400
 
+    columns, error = parse_fields(request.args)
+    if error:
+        return jsonify({"error": error}), 400
+
+    if use_keyset(request.args):
+        user_origin_logs, pagination, status_code = fetch_keyset_page(
+            columns,
+            "system_time >= NOW() - INTERVAL 7 DAY AND user_id = %s AND title = %s",
+            (user_origin, title),
+            request.args.get('cursor'),
+            per_page,
+            total=request.args.get('total'),
+        )
+        if status_code != 200:
+            return jsonify(user_origin_logs), status_code
+        return jsonify({"user_origin_logs": user_origin_logs, "pagination": pagination}), 200
+
     offset = (page - 1) * per_page
 
-    query = """
-    SELECT *
+    query = f"""
+    SELECT {columns}
     FROM sigma_alerts
     WHERE system_time >= NOW() - INTERVAL 7 DAY
     AND user_id = %s
@@ -32,10 +52,6 @@ def get_user_origin_logs():
     ORDER BY system_time DESC
     LIMIT %s OFFSET %s;
     """
-    user_origin_logs, status_code = fetch_data(query, (user_origin, title, per_page, offset))
-
-    if status_code != 200:
-        return jsonify(user_origin_logs), status_code
 
     total_query = """
     SELECT COUNT(*) as total FROM sigma_alerts
@@ -43,10 +59,15 @@ def get_user_origin_logs():
     AND user_id = %s
     AND title = %s
     """
-    total_records, status_code = fetch_data(total_query, (user_origin, title))
+    (user_origin_logs, status_code), (total_records, total_status_code) = fetch_data_concurrently(
+        (query, (user_origin, title, per_page, offset)),
+        (total_query, (user_origin, title)),
+    )
 
     if status_code != 200:
-        return jsonify(total_records), status_code
+        return jsonify(user_origin_logs), status_code
+    if total_status_code != 200:
+        return jsonify(total_records), total_status_code
 
     response = {
         "user_origin_logs": user_origin_logs,
@@ -61,7 +82,7 @@ def get_user_origin_logs():
 
 # Fetch logs for a selected impacted user and title (paginated)
 @logs_bp.route('/user_impacted_logs', methods=['GET'])
-@cache.cached(timeout=300, query_string=True)
+@cache.cached(make_cache_key=generation_cache_key)
 def get_user_impacted_logs():
     user_impacted = request.args.get('user_impacted')
     title = request.args.get('title')
@@ -76,10 +97,27 @@ def get_user_impacted_logs():
     if page < 1 or per_page < 1:
         return jsonify({"error": "Invalid pagination parameters"}), 400
 
+    columns, error = parse_fields(request.args)
+    if error:
+        return jsonify({"error": error}), 400
+
+    if use_keyset(request.args):
+        user_impacted_logs, pagination, status_code = fetch_keyset_page(
+            columns,
+            "system_time >= NOW() - INTERVAL 7 DAY AND target_user_name = %s AND title = %s",
+            (user_impacted, title),
+            request.args.get('cursor'),
+            per_page,
+            total=request.args.get('total'),
+        )
+        if status_code != 200:
+            return jsonify(user_impacted_logs), status_code
+        return jsonify({"user_impacted_logs": user_impacted_logs, "pagination": pagination}), 200
+
     offset = (page - 1) * per_page
 
-    query = """
-    SELECT *
+    query = f"""
+    SELECT {columns}
     FROM sigma_alerts
     WHERE system_time >= NOW() - INTERVAL 7 DAY
     AND target_user_name = %s
@@ -87,10 +125,6 @@ def get_user_impacted_logs():
     ORDER BY system_time DESC
     LIMIT %s OFFSET %s;
     """
-    user_impacted_logs, status_code = fetch_data(query, (user_impacted, title, per_page, offset))
-
-    if status_code != 200:
-        return jsonify(user_impacted_logs), status_code
 
     total_query = """
     SELECT COUNT(*) as total FROM sigma_alerts
@@ -98,10 +132,15 @@ def get_user_impacted_logs():
     AND target_user_name = %s
     AND title = %s
     """
-    total_records, status_code = fetch_data(total_query, (user_impacted, title))
+    (user_impacted_logs, status_code), (total_records, total_status_code) = fetch_data_concurrently(
+        (query, (user_impacted, title, per_page, offset)),
+        (total_query, (user_impacted, title)),
+    )
 
     if status_code != 200:
-        return jsonify(total_records), status_code
+        return jsonify(user_impacted_logs), status_code
+    if total_status_code != 200:
+        return jsonify(total_records), total_status_code
 
     response = {
         "user_impacted_logs": user_impacted_logs,
@@ -116,7 +155,7 @@ def get_user_impacted_logs():
 
 # Fetch logs for a specific computer and title (paginated)
 @logs_bp.route('/computer_impacted_logs', methods=['GET'])
-@cache.cached(timeout=300, query_string=True)
+@cache.cached(make_cache_key=generation_cache_key)
 def get_computer_impacted_logs():
     computer_name = request.args.get('computer_name')
     title = request.args.get('title')
@@ -131,10 +170,27 @@ def get_computer_impacted_logs():
     if page < 1 or per_page < 1:
         return jsonify({"error": "Invalid pagination parameters"}), 400
 
+    columns, error = parse_fields(request.args)
+    if error:
+        return jsonify({"error": error}), 400
+
+    if use_keyset(request.args):
+        computer_impacted_logs, pagination, status_code = fetch_keyset_page(
+            columns,
+            "system_time >= NOW() - INTERVAL 7 DAY AND computer_name = %s AND title = %s",
+            (computer_name, title),
+            request.args.get('cursor'),
+            per_page,
+            total=request.args.get('total'),
+        )
+        if status_code != 200:
+            return jsonify(computer_impacted_logs), status_code
+        return jsonify({"computer_impacted_logs": computer_impacted_logs, "pagination": pagination}), 200
+
     offset = (page - 1) * per_page
 
-    query = """
-    SELECT *
+    query = f"""
+    SELECT {columns}
     FROM sigma_alerts
     WHERE system_time >= NOW() - INTERVAL 7 DAY
     AND computer_name = %s
@@ -142,10 +198,6 @@ def get_computer_impacted_logs():
     ORDER BY system_time DESC
     LIMIT %s OFFSET %s;
     """
-    computer_impacted_logs, status_code = fetch_data(query, (computer_name, title, per_page, offset))
-
-    if status_code != 200:
-        return jsonify(computer_impacted_logs), status_code
 
     total_query = """
     SELECT COUNT(*) as total FROM sigma_alerts
@@ -153,10 +205,15 @@ def get_computer_impacted_logs():
     AND computer_name = %s
     AND title = %s
     """
-    total_records, status_code = fetch_data(total_query, (computer_name, title))
+    (computer_impacted_logs, status_code), (total_records, total_status_code) = fetch_data_concurrently(
+        (query, (computer_name, title, per_page, offset)),
+        (total_query, (computer_name, title)),
+    )
 
     if status_code != 200:
-        return jsonify(total_records), status_code
+        return jsonify(computer_impacted_logs), status_code
+    if total_status_code != 200:
+        return jsonify(total_records), total_status_code
 
     response = {
         "computer_impacted_logs": computer_impacted_logs,
@@ -0,0 +1,9 @@
+from flask import Blueprint, Response
+from sigma_common.metrics import CONTENT_TYPE, render
+
+metrics_bp = Blueprint('metrics', __name__)
+
+# Request latency, query time and rows, cache hit rates and pool usage for Prometheus to scrape
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(render(), content_type=CONTENT_TYPE)
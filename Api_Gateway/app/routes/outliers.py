@@ -1,39 +1,40 @@
-from flask import Blueprint, jsonify
-from app.utils.db import fetch_data
+from flask import Blueprint, jsonify, request
+from app.utils.db import fetch_data, fetch_data_concurrently
 from app import cache  # Import the initialized cache object
+from app.utils.cache import generation_cache_key
+from app.utils.swr import swr_cached
+from app.utils.admission import limited
+from sigma_common.outliers import MEMBER_COLUMNS, MEMBER_SUMMARY_COLUMNS, split_sample
 
 outliers_bp = Blueprint('outliers', __name__)
 
-# Fetch outliers from the sigma_alerts table for the last 7 days
+# Fetch outlier groups for the last 7 days, precomputed by the ML jobs after labelling
 @outliers_bp.route('/outliers', methods=['GET'])
-@cache.cached(timeout=300)
+@swr_cached('outliers')
+@limited('aggregate')
 def get_outliers():
+    # origin_users/impacted_computers/source_ips list the most frequent members only;
+    # the *_count columns give the full number and /outliers/<id>/members lists them all
     query = """
     SELECT
+        id,
         title,
         tactics,
         techniques,
-        GROUP_CONCAT(DISTINCT user_id) AS origin_users,
-        GROUP_CONCAT(DISTINCT computer_name) AS impacted_computers,
-        GROUP_CONCAT(DISTINCT ip_address) AS source_ips,
-        MIN(system_time) AS first_seen,
-        MAX(system_time) AS last_seen,
-        COUNT(*) AS anomaly_count,
-        rule_level AS severity,
+        origin_users,
+        origin_users_count,
+        impacted_computers,
+        impacted_computers_count,
+        source_ips,
+        source_ips_count,
+        first_seen,
+        last_seen,
+        anomaly_count,
+        severity,
         risk,
         ml_description
     FROM
-        sigma_alerts
-    WHERE
-        ml_cluster = -1
-        AND system_time >= NOW() - INTERVAL 7 DAY
-    GROUP BY
-        title,
-        tactics,
-        techniques,
-        rule_level,
-        risk,
-        ml_description
+        outlier_groups
     ORDER BY
         anomaly_count DESC,
         last_seen DESC;
@@ -43,7 +44,69 @@ def get_outliers():
     if status_code != 200:
         return jsonify(outliers), status_code
 
+    # Samples are stored joined by a control character, since names may contain commas
+    for outlier in outliers:
+        for sample_column, _ in MEMBER_SUMMARY_COLUMNS.values():
+            outlier[sample_column] = split_sample(outlier[sample_column])
+
     response = {
         "outliers": outliers,
     }
     return jsonify(response), status_code
+
+# Fetch the users, computers and source IPs of one outlier group, most frequent first
+@outliers_bp.route('/outliers/<int:group_id>/members', methods=['GET'])
+@cache.cached(make_cache_key=generation_cache_key)
+def get_outlier_group_members(group_id):
+    page = request.args.get('page', default=1, type=int)
+    per_page = request.args.get('per_page', default=100, type=int)
+    member_type = request.args.get('type')
+
+    if page < 1 or per_page < 1:
+        return jsonify({"error": "Invalid pagination parameters"}), 400
+    if member_type and member_type not in MEMBER_COLUMNS:
+        return jsonify({"error": f"type must be one of {', '.join(MEMBER_COLUMNS)}"}), 400
+
+    group, status_code = fetch_data("SELECT id FROM outlier_groups WHERE id = %s", (group_id,))
+    if status_code != 200:
+        return jsonify(group), status_code
+    if not group:
+        return jsonify({"error": "Outlier group not found"}), 404
+
+    where = "group_id = %s"
+    params = (group_id,)
+    if member_type:
+        where += " AND member_type = %s"
+        params += (member_type,)
+
+    offset = (page - 1) * per_page
+
+    query = f"""
+    SELECT member_type, member, event_count, first_seen, last_seen
+    FROM outlier_group_members
+    WHERE {where}
+    ORDER BY event_count DESC, member_type, member
+    LIMIT %s OFFSET %s
+    """
+    total_query = f"SELECT COUNT(*) as total FROM outlier_group_members WHERE {where}"
+    (members, status_code), (total_records, total_status_code) = fetch_data_concurrently(
+        (query, params + (per_page, offset)),
+        (total_query, params),
+    )
+
+    if status_code != 200:
+        return jsonify(members), status_code
+    if total_status_code != 200:
+        return jsonify(total_records), total_status_code
+
+    response = {
+        "group_id": group_id,
+        "members": members,
+        "pagination": {
+            "current_page": page,
+            "per_page": per_page,
+            "total_records": total_records[0]["total"],
+            "total_pages": (total_records[0]["total"] + per_page - 1) // per_page,
+        },
+    }
+    return jsonify(response), 200
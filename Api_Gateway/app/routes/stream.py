@@ -0,0 +1,75 @@
+import queue
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from app.utils.db import fetch_data
+from app.utils.fields import DEFAULT_ALERT_FIELDS
+from app.utils.feed import feed, Subscriber, EVENT_NAMES, FILTER_FIELDS
+from sigma_common.notify import ALERTS
+
+stream_bp = Blueprint('stream', __name__)
+
+
+def _sse(event, payload, event_id=None):
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {current_app.json.dumps(payload)}")
+    return "\n".join(lines) + "\n\n"
+
+
+# Push newly inserted alerts, risk scores and outlier labels as Server-Sent Events
+@stream_bp.route('/stream', methods=['GET'])
+def stream_alerts():
+    kinds = {kind for kind, name in EVENT_NAMES.items()
+             if name in request.args.get('events', ",".join(EVENT_NAMES.values())).split(',')}
+    if not kinds:
+        return jsonify({"error": "events must list some of: " + ", ".join(EVENT_NAMES.values())}), 400
+
+    min_risk = request.args.get('min_risk', type=int)
+    filters = {field: request.args[field] for field in FILTER_FIELDS if request.args.get(field)}
+    subscriber = Subscriber(kinds, filters, min_risk, current_app.config['SSE_CLIENT_BUFFER'])
+
+    # Browsers resend the id of the last alert they saw when reconnecting; catch up from there
+    last_id = request.headers.get('Last-Event-ID', request.args.get('last_id'))
+    backlog = []
+    if last_id and last_id.isdigit() and ALERTS in kinds:
+        query = f"""
+        SELECT {', '.join(DEFAULT_ALERT_FIELDS)}
+        FROM sigma_alerts
+        WHERE id > %s
+        ORDER BY id
+        LIMIT %s
+        """
+        backlog, status_code = fetch_data(query, (int(last_id), current_app.config['SSE_BACKFILL_LIMIT']))
+        if status_code != 200:
+            return jsonify(backlog), status_code
+
+    app = current_app._get_current_object()
+    if not feed.subscribe(app, subscriber, current_app.config['SSE_MAX_CLIENTS']):
+        return jsonify({"error": "Too many live feed clients"}), 503
+    heartbeat = current_app.config['SSE_HEARTBEAT_SECONDS']
+
+    def generate():
+        try:
+            yield f"retry: {current_app.config['SSE_RETRY_MS']}\n\n"
+            for row in backlog:
+                if subscriber.matches(ALERTS, row):
+                    yield _sse("alert", row, row["id"])
+            while True:
+                try:
+                    event, event_id, payload = subscriber.events.get(timeout=heartbeat)
+                except queue.Empty:
+                    # Keeps proxies from closing an idle stream and surfaces disconnected clients
+                    yield ": heartbeat\n\n"
+                    continue
+                if subscriber.dropped:
+                    # The client fell behind; tell it how much it missed so it can resync over REST
+                    dropped, subscriber.dropped = subscriber.dropped, 0
+                    yield _sse("dropped", {"count": dropped})
+                yield _sse(event, payload, event_id)
+        finally:
+            feed.unsubscribe(subscriber)
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -1,25 +1,51 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 from app.utils.db import fetch_data
 from app import cache  # Import the initialized cache object
+from app.utils.cache import generation_cache_key
+from app.utils.timerange import bucket_time_filter
+from sigma_common.tags import split_tags
 
 tags_bp = Blueprint('tags', __name__)
 
-# Fetch tags and their counts for the last 7 days
+TAG_TYPES = ("tactic", "technique", "other")
+
+# Fetch per-tag counts between start and end (default: the last 7 days) from the hourly rollup
 @tags_bp.route('/tags', methods=['GET'])
-@cache.cached(timeout=60)
+@cache.cached(make_cache_key=generation_cache_key)
 def get_tags():
-    query = """
-    SELECT tags, COUNT(*) AS total_count
-    FROM sigma_alerts
-    WHERE system_time >= NOW() - INTERVAL 7 DAY
+    where, params, error = bucket_time_filter(request.args)
+    if error:
+        return jsonify({"error": error}), 400
+
+    tag_type = request.args.get('type')
+    if tag_type and tag_type not in TAG_TYPES:
+        return jsonify({"error": f"type must be one of {', '.join(TAG_TYPES)}"}), 400
+
+    # Few distinct tag combinations exist, so they are split and summed here rather than in SQL
+    query = f"""
+    SELECT tags, CAST(SUM(event_count) AS SIGNED) AS total_count
+    FROM sigma_alerts_hourly
+    WHERE {where}
     GROUP BY tags
     """
-    tags, status_code = fetch_data(query)
+    tags, status_code = fetch_data(query, params)
 
     if status_code != 200:
         return jsonify(tags), status_code
 
+    # by=combination keeps the previous shape: one entry per distinct comma-joined tags value
+    if request.args.get('by') == 'combination':
+        return jsonify({"tags": tags}), 200
+
+    counts = {}
+    for row in tags:
+        for name, name_type in split_tags(row["tags"]):
+            if tag_type and name_type != tag_type:
+                continue
+            entry = counts.setdefault(name, {"tag": name, "tag_type": name_type, "total_count": 0})
+            entry["total_count"] += row["total_count"]
+
     response = {
-        "tags": tags,
+        "tags": sorted(counts.values(), key=lambda entry: (-entry["total_count"], entry["tag"])),
     }
     return jsonify(response), 200
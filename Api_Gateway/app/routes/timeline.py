@@ -1,32 +1,48 @@
 from flask import Blueprint, jsonify, request
 from app.utils.db import fetch_data
 from app import cache  # Import the initialized cache object
+from app.utils.cache import generation_cache_key
+from app.utils.admission import limited, cacheable
+from app.utils.timerange import bucket_time_filter
+from app.utils.histogram import fetch_timeline_histogram
 
 timeline_bp = Blueprint('timeline', __name__)
 
-# Fetch user origin timeline logs for a specific user
+# Fetch user origin timeline logs between start and end (default: the last 7 days) for a specific user
 @timeline_bp.route('/user_origin_timeline', methods=['GET'])
-@cache.cached(timeout=300, query_string=True)
+@cache.cached(make_cache_key=generation_cache_key, response_filter=cacheable)
+@limited('timeline')
 def get_user_origin_timeline():
     user_origin = request.args.get('user_origin')
     if not user_origin:
         return jsonify({"error": "user_origin parameter is required"}), 400
 
-    query = """
+    # mode=histogram returns per-title counts over time instead of one row per group
+    if request.args.get('mode') == 'histogram':
+        histogram, status_code = fetch_timeline_histogram("user_id", user_origin, request.args)
+        if status_code != 200:
+            return jsonify(histogram), status_code
+        return jsonify({"user_origin_timeline": histogram}), status_code
+
+    where, params, error = bucket_time_filter(request.args)
+    if error:
+        return jsonify({"error": error}), 400
+
+    query = f"""
     SELECT
         user_id AS user_origin,
-        title, tags, description, rule_level, MIN(system_time) AS first_time_seen, MAX(system_time) AS last_time_seen, COUNT(*) AS total_events
+        title, tags, description, rule_level, MIN(first_seen) AS first_time_seen, MAX(last_seen) AS last_time_seen, CAST(SUM(event_count) AS SIGNED) AS total_events
     FROM
-        sigma_alerts
+        sigma_alerts_hourly
     WHERE
-        system_time >= NOW() - INTERVAL 7 DAY
+        {where}
         AND user_id = %s
     GROUP BY
         user_id, title, tags, description, rule_level
     ORDER BY
         title;
     """
-    user_origin_timeline, status_code = fetch_data(query, (user_origin,))
+    user_origin_timeline, status_code = fetch_data(query, params + [user_origin])
 
     if status_code != 200:
         return jsonify(user_origin_timeline), status_code
@@ -36,29 +52,41 @@ def get_user_origin_timeline():
     }
     return jsonify(response), status_code
 
-# Fetch user impacted timeline logs for a specific impacted user
+# Fetch user impacted timeline logs between start and end (default: the last 7 days) for a specific impacted user
 @timeline_bp.route('/user_impacted_timeline', methods=['GET'])
-@cache.cached(timeout=300, query_string=True)
+@cache.cached(make_cache_key=generation_cache_key, response_filter=cacheable)
+@limited('timeline')
 def get_user_impacted_timeline():
     user_impacted = request.args.get('user_impacted')
     if not user_impacted:
         return jsonify({"error": "user_impacted parameter is required"}), 400
 
-    query = """
+    # mode=histogram returns per-title counts over time instead of one row per group
+    if request.args.get('mode') == 'histogram':
+        histogram, status_code = fetch_timeline_histogram("target_user_name", user_impacted, request.args)
+        if status_code != 200:
+            return jsonify(histogram), status_code
+        return jsonify({"user_impacted_timeline": histogram}), status_code
+
+    where, params, error = bucket_time_filter(request.args)
+    if error:
+        return jsonify({"error": error}), 400
+
+    query = f"""
     SELECT
         target_user_name AS user_impacted,
-        title, tags, description, rule_level, MIN(system_time) AS first_time_seen, MAX(system_time) AS last_time_seen, COUNT(*) AS total_events
+        title, tags, description, rule_level, MIN(first_seen) AS first_time_seen, MAX(last_seen) AS last_time_seen, CAST(SUM(event_count) AS SIGNED) AS total_events
     FROM
-        sigma_alerts
+        sigma_alerts_hourly
     WHERE
-        system_time >= NOW() - INTERVAL 7 DAY
+        {where}
         AND target_user_name = %s
     GROUP BY
         target_user_name, title, tags, description, rule_level
     ORDER BY
         title;
     """
-    user_impacted_timeline, status_code = fetch_data(query, (user_impacted,))
+    user_impacted_timeline, status_code = fetch_data(query, params + [user_impacted])
 
     if status_code != 200:
         return jsonify(user_impacted_timeline), status_code
@@ -68,28 +96,40 @@ def get_user_impacted_timeline():
     }
     return jsonify(response), status_code
 
-# Fetch computer impacted timeline logs for a specific computer
+# Fetch computer impacted timeline logs between start and end (default: the last 7 days) for a specific computer
 @timeline_bp.route('/computer_impacted_timeline', methods=['GET'])
-@cache.cached(timeout=300, query_string=True)
+@cache.cached(make_cache_key=generation_cache_key, response_filter=cacheable)
+@limited('timeline')
 def get_computer_impacted_timeline():
     computer_name = request.args.get('computer_name')
     if not computer_name:
         return jsonify({"error": "computer_name parameter is required"}), 400
 
-    query = """
+    # mode=histogram returns per-title counts over time instead of one row per group
+    if request.args.get('mode') == 'histogram':
+        histogram, status_code = fetch_timeline_histogram("computer_name", computer_name, request.args)
+        if status_code != 200:
+            return jsonify(histogram), status_code
+        return jsonify({"computer_impacted_timeline": histogram}), status_code
+
+    where, params, error = bucket_time_filter(request.args)
+    if error:
+        return jsonify({"error": error}), 400
+
+    query = f"""
     SELECT
-        computer_name, title, tags, description, rule_level, MIN(system_time) AS first_time_seen, MAX(system_time) AS last_time_seen, COUNT(*) AS total_events
+        computer_name, title, tags, description, rule_level, MIN(first_seen) AS first_time_seen, MAX(last_seen) AS last_time_seen, CAST(SUM(event_count) AS SIGNED) AS total_events
     FROM
-        sigma_alerts
+        sigma_alerts_hourly
     WHERE
-        system_time >= NOW() - INTERVAL 7 DAY
+        {where}
         AND computer_name = %s
     GROUP BY
         computer_name, title, tags, description, rule_level
     ORDER BY
         title;
     """
-    computer_impacted_timeline, status_code = fetch_data(query, (computer_name,))
+    computer_impacted_timeline, status_code = fetch_data(query, params + [computer_name])
 
     if status_code != 200:
         return jsonify(computer_impacted_timeline), status_code
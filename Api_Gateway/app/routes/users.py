@@ -1,14 +1,21 @@
 from flask import Blueprint, jsonify, request
 from app.utils.db import fetch_data
-from app import cache  # Import the initialized cache object
+from app.utils.swr import swr_cached
+from app.utils.admission import limited
+from app.utils.timerange import bucket_time_filter
 
 users_bp = Blueprint('users', __name__)
 
-# Fetch user origin logs with cumulative risk scores
+# Fetch user origin logs with cumulative risk scores between start and end (default: the last 7 days)
 @users_bp.route('/user_origin', methods=['GET'])
-@cache.cached(timeout=300)
+@swr_cached('user_origin')
+@limited('aggregate')
 def get_user_origin():
-    query = """
+    where, params, error = bucket_time_filter(request.args)
+    if error:
+        return jsonify({"error": error}), 400
+
+    query = f"""
     SELECT
         user_id AS user_origin,
         COUNT(DISTINCT title) AS unique_titles,
@@ -17,9 +24,9 @@ def get_user_origin():
         SELECT
             user_id,
             title,
-            MAX(risk) AS risk_score
-        FROM sigma_alerts
-        WHERE system_time >= NOW() - INTERVAL 7 DAY
+            MAX(max_risk) AS risk_score
+        FROM sigma_alerts_hourly
+        WHERE {where}
         AND user_id IS NOT NULL
         GROUP BY user_id, title
     ) AS unique_risks
@@ -27,7 +34,7 @@ def get_user_origin():
     ORDER BY total_unique_risk_score DESC
     LIMIT 50;
     """
-    user_origin_logs, status_code = fetch_data(query)
+    user_origin_logs, status_code = fetch_data(query, params)
 
     if status_code != 200:
         return jsonify(user_origin_logs), status_code
@@ -37,11 +44,16 @@ def get_user_origin():
     }
     return jsonify(response), status_code
 
-# Fetch user impacted logs with cumulative risk scores
+# Fetch user impacted logs with cumulative risk scores between start and end (default: the last 7 days)
 @users_bp.route('/user_impacted', methods=['GET'])
-@cache.cached(timeout=300)
+@swr_cached('user_impacted')
+@limited('aggregate')
 def get_user_impacted():
-    query = """
+    where, params, error = bucket_time_filter(request.args)
+    if error:
+        return jsonify({"error": error}), 400
+
+    query = f"""
     SELECT
         target_user_name AS user_impacted,
         COUNT(DISTINCT title) AS unique_titles,
@@ -50,9 +62,9 @@ def get_user_impacted():
         SELECT
             target_user_name,
             title,
-            MAX(risk) AS risk_score
-        FROM sigma_alerts
-        WHERE system_time >= NOW() - INTERVAL 7 DAY
+            MAX(max_risk) AS risk_score
+        FROM sigma_alerts_hourly
+        WHERE {where}
         AND target_user_name IS NOT NULL
         GROUP BY target_user_name, title
     ) AS unique_risks
@@ -60,7 +72,7 @@ def get_user_impacted():
     ORDER BY total_unique_risk_score DESC
     LIMIT 50;
     """
-    user_impacted_logs, status_code = fetch_data(query)
+    user_impacted_logs, status_code = fetch_data(query, params)
 
     if status_code != 200:
         return jsonify(user_impacted_logs), status_code
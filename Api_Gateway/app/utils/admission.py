@@ -0,0 +1,162 @@
+import time
+import functools
+import threading
+from collections import OrderedDict
+from flask import Response, current_app, g, jsonify
+from app import cache  # Import the initialized cache object
+from app.utils.cache import request_cache_key
+from app.utils.db import pool_stats
+from app.utils.metrics import ADMISSIONS, ADMISSION_WAIT_SECONDS, route_label
+
+# Statuses that must not be cached: shed or degraded answers, and transient database failures
+UNCACHEABLE_STATUSES = {203, 429, 503, 504}
+
+# How many request keys the cost estimates remember per worker
+COST_KEYS = 10000
+
+# Weight of the newest observation in a key's moving average
+COST_SMOOTHING = 0.3
+
+
+class CostEstimates:
+    """Moving average of the database time each request key (path and query string) has cost.
+
+    The same entity timeline for a noisy service account is slow every time, so
+    its history predicts the next request better than EXPLAIN's row guesses and
+    costs nothing to look up.
+    """
+
+    def __init__(self, max_keys=COST_KEYS):
+        self.max_keys = max_keys
+        self._costs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Estimated milliseconds of database time for key, or None if it has not been seen."""
+        with self._lock:
+            return self._costs.get(key)
+
+    def observe(self, key, milliseconds):
+        with self._lock:
+            previous = self._costs.pop(key, None)
+            if previous is not None:
+                milliseconds = previous + COST_SMOOTHING * (milliseconds - previous)
+            self._costs[key] = milliseconds
+            while len(self._costs) > self.max_keys:
+                self._costs.popitem(last=False)
+
+
+costs = CostEstimates()
+
+_slots = {}
+_slots_lock = threading.Lock()
+
+
+def _slot(name, concurrency):
+    with _slots_lock:
+        if name not in _slots:
+            _slots[name] = threading.BoundedSemaphore(concurrency)
+        return _slots[name]
+
+
+def db_saturated():
+    """True when any pool has requests waiting or DB_SATURATION of its connections in use."""
+    threshold = current_app.config['DB_SATURATION']
+    return any(
+        stats['waiting'] > 0 or stats['in_use'] >= threshold * stats['size']
+        for stats in pool_stats().values()
+    )
+
+
+def cacheable(rv):
+    """response_filter for cache.cached on limited views: keep shed, degraded and failed answers out."""
+    status = rv[1] if isinstance(rv, tuple) and len(rv) > 1 else getattr(rv, 'status_code', 200)
+    return status not in UNCACHEABLE_STATUSES
+
+
+def _fallback(key):
+    """An earlier answer to this request as a 203, or None.
+
+    Views under swr_cached answer from their SWR entry, which outlives its
+    freshness anyway; other views from the copy limited() keeps of their last 200.
+    """
+    swr_key = g.get("swr_key")
+    fallback = cache.get(swr_key if swr_key else "fallback:" + key)
+    if not fallback:
+        return None
+    ADMISSIONS.inc(route=route_label(), action="degraded")
+    response = Response(fallback["body"], status=203, mimetype=fallback["mimetype"])
+    response.headers['Age'] = str(int(time.time() - fallback["computed_at"]))
+    response.headers['Warning'] = '110 - "Response is Stale"'
+    return response
+
+
+def _shed(name, key, reason):
+    """The fallback answer to this request, or 429 when there is none."""
+    fallback = _fallback(key)
+    if fallback is not None:
+        return fallback
+    route = route_label()
+    ADMISSIONS.inc(route=route, action="rejected")
+    current_app.logger.warning(f"Shed {route} ({name}): {reason}")
+    response = jsonify({"error": "Database busy, please retry", "reason": reason})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(current_app.config['SHED_RETRY_AFTER'])
+    return response
+
+
+def limited(name):
+    """Admission control for an expensive view, configured by ROUTE_LIMITS[name].
+
+    At most `concurrency` requests of the class run at once per worker; the
+    rest queue for up to `queue_seconds`. Requests whose key has historically
+    cost EXPENSIVE_REQUEST_MS or more are not queued while the database is
+    saturated. Requests that time out in the queue, or whose statements hit
+    the class's max_execution_ms, get the last good answer to the same request
+    as a 203: the swr_cached entry for SWR views, otherwise a copy kept for
+    SHED_FALLBACK_SECONDS. Without one, queued-out requests get
+    a 429 with Retry-After and timed-out ones their 504. Place it below the
+    cache decorator so cache hits are never limited, and pass
+    response_filter=cacheable to cache.cached.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            app = current_app._get_current_object()
+            limit = app.config['ROUTE_LIMITS'][name]
+            key = request_cache_key()
+            route = route_label()
+
+            estimate = costs.get(key)
+            if estimate is not None and estimate >= app.config['EXPENSIVE_REQUEST_MS'] and db_saturated():
+                return _shed(name, key, f"estimated {estimate:.0f} ms of database time while the database is saturated")
+
+            slot = _slot(name, limit['concurrency'])
+            start = time.perf_counter()
+            if not slot.acquire(timeout=limit['queue_seconds']):
+                ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - start, route=route)
+                return _shed(name, key, f"more than {limit['concurrency']} concurrent {name} requests")
+            ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - start, route=route)
+            ADMISSIONS.inc(route=route, action="admitted")
+
+            db_time_before = g.get("db_time_ms", 0.0)
+            g.max_execution_ms = limit['max_execution_ms']
+            try:
+                response = app.make_response(view(*args, **kwargs))
+            finally:
+                g.pop("max_execution_ms", None)
+                slot.release()
+            costs.observe(key, g.get("db_time_ms", 0.0) - db_time_before)
+
+            if response.status_code == 200 and not g.get("swr_key"):
+                # Shaped like an SWR entry, so _fallback reads either
+                cache.set(
+                    "fallback:" + key,
+                    {"body": response.get_data(), "mimetype": response.mimetype, "computed_at": time.time()},
+                    timeout=app.config['SHED_FALLBACK_SECONDS'],
+                )
+            elif response.status_code == 504:
+                return _fallback(key) or response
+            return response
+        return wrapper
+    return decorator
@@ -1,3 +1,51 @@
+import time
+import hashlib
+import threading
+from flask import current_app, request
 from flask_caching import Cache
+from app.utils.db import get_db_connection
+from sigma_common.generation import read_generation
 
 cache = Cache()
+
+_generation = {"value": 0, "checked_at": 0.0}
+_generation_lock = threading.Lock()
+
+
+def current_generation():
+    """Return the sigma_alerts data generation, re-read at most every CACHE_GENERATION_CHECK_SECONDS."""
+    interval = current_app.config.get('CACHE_GENERATION_CHECK_SECONDS', 2)
+    now = time.monotonic()
+    if now - _generation["checked_at"] < interval:
+        return _generation["value"]
+
+    with _generation_lock:
+        if now - _generation["checked_at"] < interval:
+            return _generation["value"]
+        # Read from the same server as the data (the replica when configured), so a lagging
+        # replica never fills entries for a generation whose rows it has not applied yet
+        connection = get_db_connection()
+        if connection:
+            try:
+                cursor = connection.cursor()
+                _generation["value"] = read_generation(cursor)
+                cursor.close()
+            except Exception as e:
+                # Keep serving with the last known generation; entries still expire on timeout
+                current_app.logger.error(f"Error reading data generation: {e}")
+            finally:
+                connection.close()
+        _generation["checked_at"] = now
+    return _generation["value"]
+
+
+def request_cache_key():
+    """Cache key from the request path and its query string."""
+    query = tuple(sorted(request.args.items(multi=True)))
+    digest = hashlib.md5(str(query).encode()).hexdigest()
+    return f"{request.path}?{digest}"
+
+
+def generation_cache_key(*args, **kwargs):
+    """Cache key from the request path, its query string and the current data generation."""
+    return f"{request_cache_key()}@{current_generation()}"
@@ -0,0 +1,122 @@
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # optional; without it only gzip is offered
+    brotli = None
+
+
+def body_etag(body):
+    """Strong ETag for a response body; identical payloads get identical tags."""
+    return hashlib.md5(body).hexdigest()
+
+
+class CompressedBodies:
+    """In-process LRU of compressed bodies keyed by (ETag, encoding), bounded by total bytes.
+
+    Keys are content hashes, so an entry never goes stale; polled endpoints that
+    return the same payload are compressed once rather than on every request.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = body
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+
+_compressed = None
+
+
+def _negotiate(response):
+    """The encoding to send response with, or None to send it as is."""
+    config = current_app.config
+    if response.mimetype not in config['COMPRESS_MIMETYPES'] or response.content_length is None:
+        return None
+    if response.content_length < config['COMPRESS_MIN_SIZE']:
+        return None
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def _compress(body, encoding, etag):
+    global _compressed
+    if _compressed is None:
+        _compressed = CompressedBodies(current_app.config['COMPRESS_CACHE_BYTES'])
+    key = (etag, encoding)
+    data = _compressed.get(key)
+    if data is None:
+        if encoding == 'br':
+            data = brotli.compress(body, quality=current_app.config['COMPRESS_BROTLI_QUALITY'])
+        else:
+            data = gzip.compress(body, compresslevel=current_app.config['COMPRESS_GZIP_LEVEL'])
+        _compressed.put(key, data)
+    return data
+
+
+def conditional_and_compressed(response):
+    """after_request hook: tag successful GETs with an ETag, answer 304 on a match, and compress the body.
+
+    The ETag is the hash of the uncompressed body, or the one a cached view
+    already set, so checking it never re-serializes anything. Compressed
+    variants get a -gzip or -br suffix, as different bytes need a different
+    strong tag. Streamed responses (the live feed, exports) are left alone.
+    """
+    if request.method not in ('GET', 'HEAD') or response.status_code != 200:
+        return response
+    if response.is_streamed or response.direct_passthrough or 'Content-Encoding' in response.headers:
+        return response
+
+    etag, _ = response.get_etag()
+    if etag is None:
+        etag = body_etag(response.get_data())
+    encoding = _negotiate(response)
+    tag = f"{etag}-{encoding}" if encoding else etag
+
+    response.headers['Vary'] = 'Accept-Encoding'
+    # Clients may keep the body but must revalidate it; unchanged data then costs a 304
+    response.headers.setdefault('Cache-Control', 'no-cache')
+
+    # Any encoding of the same payload counts as a match
+    if request.if_none_match.star_tag or any(
+        request.if_none_match.contains(candidate) for candidate in (etag, f"{etag}-gzip", f"{etag}-br")
+    ):
+        not_modified = current_app.response_class(status=304)
+        not_modified.set_etag(tag)
+        for header in ('Vary', 'Cache-Control', 'Server-Timing'):
+            if header in response.headers:
+                not_modified.headers[header] = response.headers[header]
+        return not_modified
+
+    if encoding:
+        response.set_data(_compress(response.get_data(), encoding, etag))
+        response.headers['Content-Encoding'] = encoding
+    response.set_etag(tag)
+    return response
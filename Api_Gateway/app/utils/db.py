@@ -1,41 +1,190 @@
-import mysql.connector.pooling
+import os
+import re
+import time
+import threading
+import mysql.connector
+from concurrent.futures import ThreadPoolExecutor
 from mysql.connector import Error
-from flask import current_app
-
-db_config = {
-    "host": "localhost",
-    "user": "root",
-    "password": "sigma",
-    "database": "sigma_db",
-}
-
-db_pool = mysql.connector.pooling.MySQLConnectionPool(
-    pool_name="mypool",
-    pool_size=10,
-    **db_config
+from flask import current_app, g
+from app.utils.metrics import route_label
+from sigma_common.db import (
+    ConnectionPool, PoolTimeout, TimedCursor, CONNECTION_ERRORS, db_config, DB_POOL_SIZE, DB_POOL_TIMEOUT,
+    DB_POOL_MAX_WAITING, DB_HEALTH_CHECK_SECONDS, DB_CONNECTION_MAX_AGE,
 )
 
-def get_db_connection():
+# Optional read replica for the dashboard's read-only queries; unset means everything goes to db_config
+replica_config = dict(db_config, host=os.environ["DB_REPLICA_HOST"]) if os.getenv("DB_REPLICA_HOST") else None
+
+# Server-side limit per SELECT; MySQL uses milliseconds, MariaDB seconds
+DB_MAX_EXECUTION_MS = int(os.getenv("DB_MAX_EXECUTION_MS", "30000"))
+
+# Server errors raised when a statement hits its execution time limit (MySQL, MariaDB)
+QUERY_TIMEOUT_ERRORS = {3024, 1969}
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+# Pool name -> True for MariaDB, False for MySQL; read from the server once per pool
+_mariadb = {}
+
+def _session_sql(max_execution_ms):
+    return [
+        f"SET SESSION max_execution_time = {int(max_execution_ms)}",
+        f"SET SESSION max_statement_time = {max_execution_ms / 1000:.3f}",
+    ]
+
+def _pool_name(readonly):
+    return "replica" if readonly and replica_config else "primary"
+
+def get_pool(readonly=True):
+    """The pool for reads (the replica when configured) or writes, created on first use."""
+    name = _pool_name(readonly)
+    with _pools_lock:
+        if name not in _pools:
+            _pools[name] = ConnectionPool(
+                replica_config if name == "replica" else db_config,
+                size=DB_POOL_SIZE,
+                acquire_timeout=DB_POOL_TIMEOUT,
+                max_waiting=DB_POOL_MAX_WAITING,
+                health_check_after=DB_HEALTH_CHECK_SECONDS,
+                max_age=DB_CONNECTION_MAX_AGE,
+                session_sql=_session_sql(DB_MAX_EXECUTION_MS),
+            )
+        return _pools[name]
+
+def pool_stats():
+    """Usage of every pool created so far, by name."""
+    with _pools_lock:
+        return {name: pool.stats() for name, pool in _pools.items()}
+
+# Threads for running a request's independent queries side by side; kept below the pool size
+# so request threads still find connections
+QUERY_THREADS = int(os.getenv("DB_QUERY_THREADS", "4"))
+_query_executor = ThreadPoolExecutor(max_workers=QUERY_THREADS, thread_name_prefix="db-query")
+
+def _is_mariadb(name, cursor):
+    """Whether the pool's server is MariaDB, asked on the first limited query and remembered."""
+    if name not in _mariadb:
+        cursor.execute("SELECT VERSION() AS version")
+        _mariadb[name] = "mariadb" in cursor.fetchall()[0]["version"].lower()
+    return _mariadb[name]
+
+def _limited_query(query, max_execution_ms, mariadb):
+    """query carrying its own execution time limit: SET STATEMENT on MariaDB, an optimizer hint on MySQL.
+
+    MySQL only limits SELECT statements, so anything else is returned unchanged.
+    """
+    if mariadb:
+        return f"SET STATEMENT max_statement_time = {max_execution_ms / 1000:.3f} FOR {query}"
+    return re.sub(
+        r"^\s*SELECT\b", lambda m: f"{m.group(0)} /*+ MAX_EXECUTION_TIME({int(max_execution_ms)}) */", query,
+        count=1, flags=re.IGNORECASE,
+    )
+
+def get_db_connection(readonly=True):
     try:
-        connection = db_pool.get_connection()
-        return connection
-    except Error as e:
+        return get_pool(readonly).acquire()
+    except (Error, PoolTimeout) as e:
         current_app.logger.error(f"Error getting connection from pool: {e}")
         return None
 
-def fetch_data(query, params=None):
-    connection = get_db_connection()
-    if not connection:
+def fetch_data(query, params=None, readonly=True, max_execution_ms=None):
+    """Run a query on a pooled connection and return (rows, status_code).
+
+    Waits for a free connection rather than failing at once; if none frees up
+    in time the status is 503, and a query stopped by its execution time limit
+    (DB_MAX_EXECUTION_MS, or max_execution_ms for this query) gives 504.
+    Views under admission control (app.utils.admission) default max_execution_ms
+    to their route's limit.
+    """
+    if max_execution_ms is None:
+        max_execution_ms = g.get("max_execution_ms")
+    start = time.perf_counter()
+    try:
+        connection = get_pool(readonly).acquire()
+    except PoolTimeout as e:
+        current_app.logger.warning(f"Database pool exhausted: {e}")
+        return {"error": "Database busy, please retry"}, 503
+    except Error as e:
+        current_app.logger.error(f"Error getting connection from pool: {e}")
         return {"error": "Database connection failed"}, 500
 
     try:
-        cursor = connection.cursor(dictionary=True)
+        # Buffered, so the statement's timing and rowcount cover reading every row
+        cursor = connection.cursor(dictionary=True, buffered=True)
+        if max_execution_ms is not None:
+            # The limit rides on the statement itself (SET STATEMENT on MariaDB, an optimizer hint
+            # on MySQL), so it costs no extra round trips and needs no reset afterwards
+            query = _limited_query(query, max_execution_ms, _is_mariadb(_pool_name(readonly), cursor))
         cursor.execute(query, params)
         data = cursor.fetchall()
         return data, 200
     except Error as e:
+        if e.errno in QUERY_TIMEOUT_ERRORS:
+            current_app.logger.warning(f"Query exceeded its execution time limit: {e}")
+            return {"error": "Query timed out"}, 504
+        if e.errno in CONNECTION_ERRORS:
+            connection.mark_broken()
         current_app.logger.error(f"Error fetching data: {e}")
         return {"error": f"Error fetching data: {e}"}, 500
+    finally:
+        # Accumulated per request and reported in the Server-Timing header
+        g.db_time_ms = g.get("db_time_ms", 0.0) + (time.perf_counter() - start) * 1000
+        connection.close()
+
+def run_concurrently(*calls):
+    """Run independent (function, args) calls in parallel, each in the app context; results keep their order.
+
+    The calls must not submit work of their own. The request's DB time grows by
+    the wall time of the group rather than the sum of its queries.
+    """
+    app = current_app._get_current_object()
+    route = route_label()
+    max_execution_ms = g.get("max_execution_ms")
+
+    def run(function, args):
+        with app.app_context():
+            # Queries run here are attributed to the request's route in the metrics
+            g.metrics_route = route
+            # and keep the request's statement time limit
+            if max_execution_ms is not None:
+                g.max_execution_ms = max_execution_ms
+            return function(*args)
+
+    start = time.perf_counter()
+    futures = [_query_executor.submit(run, function, args) for function, args in calls]
+    results = [future.result() for future in futures]
+    g.db_time_ms = g.get("db_time_ms", 0.0) + (time.perf_counter() - start) * 1000
+    return results
+
+def fetch_data_concurrently(*queries):
+    """fetch_data for several (query, params) pairs at once, returning [(data, status_code), ...]."""
+    return run_concurrently(*[(fetch_data, query) for query in queries])
+
+def stream_data(query, params=None, batch_size=1000):
+    """Yield rows one batch at a time from an unbuffered cursor so memory stays flat.
+
+    Uses a dedicated connection rather than the pool: long exports should not
+    hold a pooled connection, and an abandoned stream is cut off by closing it.
+    """
+    connection = None
+    try:
+        connection = mysql.connector.connect(**(replica_config or db_config))
+        # Timed like pooled cursors, so exports show up in the metrics and the slow statement log
+        cursor = TimedCursor(connection.cursor(dictionary=True, buffered=False))
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+    except Error as e:
+        current_app.logger.error(f"Error streaming data: {e}")
+        raise
     finally:
         if connection:
-            connection.close()
+            try:
+                connection.close()
+            except Error:
+                # Closing with unread rows (client went away mid-export) is expected
+                pass
@@ -0,0 +1,116 @@
+import queue
+import threading
+from app.utils.db import fetch_data
+from app.utils.fields import DEFAULT_ALERT_FIELDS
+from sigma_common.notify import ALERTS, RISK, ML, subscribe, receive
+
+# Event name sent to clients for each notification kind, and the fields it carries
+EVENT_NAMES = {ALERTS: "alert", RISK: "risk", ML: "outlier"}
+EVENT_FIELDS = {
+    RISK: ["id", "risk"],
+    ML: ["id", "ml_cluster", "ml_description"],
+}
+
+# Query parameters a client can filter the feed on, matched against the alert row
+FILTER_FIELDS = ["computer_name", "user_id", "target_user_name", "title", "rule_level"]
+
+
+class Subscriber:
+    """One live client: its filters and a bounded buffer of pending events."""
+
+    def __init__(self, kinds, filters, min_risk, buffer_size):
+        self.kinds = kinds
+        self.filters = filters
+        self.min_risk = min_risk
+        self.events = queue.Queue(maxsize=buffer_size)
+        self.dropped = 0
+
+    def matches(self, kind, row):
+        if kind not in self.kinds:
+            return False
+        if any(row.get(field) != value for field, value in self.filters.items()):
+            return False
+        return self.min_risk is None or (row.get("risk") is not None and row["risk"] >= self.min_risk)
+
+    def offer(self, event):
+        """Queue an event without ever blocking the feed; a slow client loses events instead."""
+        try:
+            self.events.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+
+class AlertFeed:
+    """Per-process fan-out of change notifications to live clients.
+
+    One listener thread per worker receives the writers' notifications and
+    fetches the announced rows once, however many clients are connected.
+    """
+
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def subscribe(self, app, subscriber, max_clients):
+        """Register a client, returning False when the worker already serves max_clients."""
+        with self._lock:
+            if len(self._subscribers) >= max_clients:
+                return False
+            self._subscribers.add(subscriber)
+            # Started lazily so it runs in the serving process, after any pre-fork
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._listen, args=(app,), name="alert-feed", daemon=True)
+                self._thread.start()
+        return True
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def _listen(self, app):
+        try:
+            sock = subscribe()
+        except OSError as e:
+            # Clients still get heartbeats; the next subscription retries
+            app.logger.error(f"Could not join the live feed group: {e}")
+            with self._lock:
+                self._thread = None
+            return
+        try:
+            while True:
+                with self._lock:
+                    if not self._subscribers:
+                        self._thread = None
+                        return
+                message = receive(sock)
+                if message:
+                    with app.app_context():
+                        try:
+                            self._dispatch(*message)
+                        except Exception as e:
+                            app.logger.error(f"Error dispatching live feed notification: {e}")
+        finally:
+            sock.close()
+
+    def _dispatch(self, kind, ids):
+        if kind not in EVENT_NAMES or not ids:
+            return
+        placeholders = ", ".join(["%s"] * len(ids))
+        query = f"SELECT {', '.join(DEFAULT_ALERT_FIELDS)} FROM sigma_alerts WHERE id IN ({placeholders}) ORDER BY id"
+        rows, status_code = fetch_data(query, ids)
+        if status_code != 200:
+            return
+
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for row in rows:
+            fields = EVENT_FIELDS.get(kind)
+            payload = {field: row[field] for field in fields} if fields else row
+            event = (EVENT_NAMES[kind], row["id"] if kind == ALERTS else None, payload)
+            for subscriber in subscribers:
+                if subscriber.matches(kind, row):
+                    subscriber.offer(event)
+
+
+feed = AlertFeed()
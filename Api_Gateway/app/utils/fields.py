@@ -0,0 +1,32 @@
+# Columns of sigma_alerts that listing endpoints may return
+ALERT_COLUMNS = [
+    "id", "title", "tags", "description", "system_time", "computer_name", "user_id", "event_id",
+    "provider_name", "ml_cluster", "ip_address", "task", "rule_level", "target_user_name",
+    "target_domain_name", "ruleid", "raw", "unique_hash", "tactics", "techniques", "ml_description", "risk",
+]
+
+# The raw event is by far the largest column; it is served on demand by /api/alerts/<id>/raw
+DEFAULT_ALERT_FIELDS = [column for column in ALERT_COLUMNS if column != "raw"]
+
+# Needed for ordering and keyset cursors, so always returned
+REQUIRED_ALERT_FIELDS = ["id", "system_time"]
+
+
+def parse_fields(args):
+    """Return (column list SQL, error message) for the fields= projection parameter.
+
+    fields is a comma-separated list of column names, or 'all' for every column
+    including raw. Without it the lean default set is used.
+    """
+    fields = args.get('fields')
+    if not fields:
+        selected = DEFAULT_ALERT_FIELDS
+    elif fields == 'all':
+        selected = ALERT_COLUMNS
+    else:
+        requested = [field.strip() for field in fields.split(',') if field.strip()]
+        unknown = [field for field in requested if field not in ALERT_COLUMNS]
+        if unknown:
+            return None, f"Unknown fields: {', '.join(unknown)}"
+        selected = REQUIRED_ALERT_FIELDS + [field for field in requested if field not in REQUIRED_ALERT_FIELDS]
+    return ", ".join(selected), None
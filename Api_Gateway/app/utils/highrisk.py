@@ -0,0 +1,114 @@
+from decimal import Decimal
+from app.utils.db import fetch_data
+from app import cache  # Import the initialized cache object
+from app.utils.cache import current_generation
+from app.utils.swr import single_flight
+from app.utils.metrics import count_cache
+
+# The snapshot is also keyed by data generation; this only bounds drift of the 7-day window
+HIGHRISK_SNAPSHOT_TIMEOUT = 300
+
+# Output name of each entity kind, and the sigma_alerts column it aggregates
+HIGHRISK_ENTITIES = {
+    'user_origin': ('user', 'user_id'),
+    'user_impacted': ('user', 'target_user_name'),
+    'computer_impacted': ('computer', 'computer_name'),
+}
+
+# One scan of the 7-day window at (user, target user, computer, title, tactics) grain;
+# everything the three highrisk routes need can be rolled up from these groups
+HIGHRISK_QUERY = """
+SELECT
+    user_id,
+    target_user_name,
+    computer_name,
+    title,
+    tactics,
+    MAX(risk) AS risk_score,
+    MAX(ml_cluster) AS ml_cluster,
+    MAX(ml_cluster = -1) AS has_outlier
+FROM sigma_alerts
+WHERE system_time >= NOW() - INTERVAL 7 DAY
+GROUP BY user_id, target_user_name, computer_name, title, tactics
+"""
+
+
+def _max(current, value):
+    if value is None:
+        return current
+    return value if current is None else max(current, value)
+
+
+def summarize_entities(groups, column, name):
+    """Roll fine-grained groups up to one outlier risk summary per entity.
+
+    Mirrors the per-route SQL it replaces: per (entity, title) take MAX(risk),
+    MAX(ml_cluster) and COUNT(DISTINCT tactics); sum per entity with a +25
+    outlier bonus; keep only entities with at least one outlier alert.
+    """
+    titles = {}
+    outlier_entities = set()
+    for group in groups:
+        entity = group[column]
+        if entity is None:
+            continue
+        if group["has_outlier"]:
+            outlier_entities.add(entity)
+        per_title = titles.setdefault(entity, {}).setdefault(
+            group["title"], {"risk_score": None, "ml_cluster": None, "tactics": set()}
+        )
+        per_title["risk_score"] = _max(per_title["risk_score"], group["risk_score"])
+        per_title["ml_cluster"] = _max(per_title["ml_cluster"], group["ml_cluster"])
+        if group["tactics"] is not None:
+            per_title["tactics"].add(group["tactics"])
+
+    summaries = []
+    for entity in sorted(outlier_entities):
+        cumulative_risk_score = None
+        unique_outliers = set()
+        unique_tactics_count = 0
+        for title, per_title in titles[entity].items():
+            risk_score = per_title["risk_score"]
+            if per_title["ml_cluster"] == -1:
+                if title is not None:
+                    unique_outliers.add(title)
+                if risk_score is not None:
+                    risk_score += 25
+            if risk_score is not None:
+                cumulative_risk_score = (cumulative_risk_score or 0) + risk_score
+            unique_tactics_count += len(per_title["tactics"])
+
+        # Decimal keeps the JSON identical to what MySQL SUM() returned before
+        summaries.append({
+            name: entity,
+            "unique_title_count": sum(1 for title in titles[entity] if title is not None),
+            "cumulative_risk_score": Decimal(cumulative_risk_score) if cumulative_risk_score is not None else None,
+            "unique_outliers": len(unique_outliers),
+            "unique_tactics_count": Decimal(unique_tactics_count),
+        })
+    return summaries
+
+
+def _compute_snapshot():
+    groups, status_code = fetch_data(HIGHRISK_QUERY)
+    if status_code != 200:
+        return (groups, status_code), False
+    snapshot = {
+        kind: summarize_entities(groups, column, name)
+        for kind, (name, column) in HIGHRISK_ENTITIES.items()
+    }
+    return (snapshot, 200), True
+
+
+def get_highrisk_snapshot():
+    """Return (snapshot, status_code); the snapshot maps each entity kind to its outlier risk summaries.
+
+    Computed in a single scan and shared by the three highrisk routes across workers.
+    """
+    key = f"highrisk_snapshot@{current_generation()}"
+    cached = cache.get(key)
+    if cached is not None:
+        count_cache("highrisk_snapshot", "hit")
+        return cached
+    count_cache("highrisk_snapshot", "miss")
+    return single_flight(key, _compute_snapshot, HIGHRISK_SNAPSHOT_TIMEOUT)
@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+from app.utils.db import fetch_data
+from app.utils.timerange import bucket_time_filter, parse_time_range, window_hours
+
+# Bucket widths the server picks from, smallest first; all are whole hours so they map onto the hourly rollup
+BUCKET_HOURS = [1, 2, 3, 6, 12, 24, 48, 168, 336, 720]
+
+# Upper bound on buckets per series; a week at 3-hour buckets is 56
+MAX_BUCKETS = 60
+
+# Buckets are counted in whole hours since this instant, so widths of a day align to midnight
+BUCKET_EPOCH = datetime(1970, 1, 1)
+
+
+def choose_bucket_hours(span_hours):
+    """Smallest bucket width that keeps span_hours within MAX_BUCKETS buckets."""
+    for hours in BUCKET_HOURS:
+        if span_hours / hours <= MAX_BUCKETS:
+            return hours
+    return BUCKET_HOURS[-1]
+
+
+def fetch_timeline_histogram(column, value, args):
+    """Per-title event counts for one entity in auto-sized time buckets, read from sigma_alerts_hourly.
+
+    Returns (payload, status_code). Every series holds one count per bucket from
+    first_bucket onwards, so a week for a noisy host stays a few KB.
+    """
+    start, end, error = parse_time_range(args)
+    if error:
+        return {"error": error}, 400
+    where, params, error = bucket_time_filter(args)
+    if error:
+        return {"error": error}, 400
+
+    bucket_hours = choose_bucket_hours(window_hours(start, end))
+    query = f"""
+    SELECT
+        title,
+        TIMESTAMPDIFF(HOUR, %s, bucket_hour) DIV %s AS bucket,
+        CAST(SUM(event_count) AS SIGNED) AS total_events
+    FROM
+        sigma_alerts_hourly
+    WHERE
+        {where}
+        AND {column} = %s
+    GROUP BY
+        title, bucket
+    ORDER BY
+        title, bucket;
+    """
+    rows, status_code = fetch_data(query, [BUCKET_EPOCH, bucket_hours] + params + [value])
+    if status_code != 200:
+        return rows, status_code
+
+    payload = {"bucket_hours": bucket_hours, "first_bucket": None, "bucket_count": 0, "series": []}
+    if not rows:
+        return payload, 200
+
+    first = min(row["bucket"] for row in rows)
+    last = max(row["bucket"] for row in rows)
+    series = {}
+    for row in rows:
+        entry = series.setdefault(row["title"], {"title": row["title"], "total_events": 0, "counts": [0] * (last - first + 1)})
+        entry["counts"][row["bucket"] - first] = row["total_events"]
+        entry["total_events"] += row["total_events"]
+
+    payload.update(
+        first_bucket=BUCKET_EPOCH + timedelta(hours=first * bucket_hours),
+        bucket_count=last - first + 1,
+        series=sorted(series.values(), key=lambda entry: -entry["total_events"]),
+    )
+    return payload, 200
@@ -0,0 +1,119 @@
+from datetime import date, datetime, timezone
+from flask import has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional; without it responses go through the standard library encoder
+    orjson = None
+
+# Values of the shape= query parameter; 'rows' is the default list-of-objects layout
+SHAPES = ("rows", "columnar")
+
+
+def to_columnar(rows):
+    """Turn a list of row dicts into one list per column, so each key is sent once instead of per row."""
+    columns = tuple(rows[0])
+    if all(tuple(row) == columns for row in rows):
+        # Database rows share their key order, so the values can be transposed directly
+        return dict(zip(columns, map(list, zip(*[row.values() for row in rows]))))
+    columns = dict.fromkeys(key for row in rows for key in row)
+    return {column: [row.get(column) for row in rows] for column in columns}
+
+
+def shape_payload(obj):
+    """Rewrite every list of objects in a response to columnar form, leaving the rest as is."""
+    if isinstance(obj, list):
+        if obj and all(isinstance(item, dict) for item in obj):
+            return to_columnar(obj)
+        return obj
+    if isinstance(obj, dict):
+        return {key: shape_payload(value) for key, value in obj.items()}
+    return obj
+
+
+_WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+_MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+
+def _http_default(o):
+    """Flask's default() with a faster HTTP date formatter; naive datetimes are taken as UTC, like http_date."""
+    if isinstance(o, date):
+        if isinstance(o, datetime):
+            if o.tzinfo is not None:
+                o = o.astimezone(timezone.utc)
+            hour, minute, second = o.hour, o.minute, o.second
+        else:
+            hour = minute = second = 0
+        return (
+            f"{_WEEKDAYS[o.weekday()]}, {o.day:02d} {_MONTHS[o.month - 1]} {o.year:04d} "
+            f"{hour:02d}:{minute:02d}:{second:02d} GMT"
+        )
+    return DefaultJSONProvider.default(o)
+
+
+def _iso_default(o):
+    if isinstance(o, date):
+        return o.isoformat()
+    return DefaultJSONProvider.default(o)
+
+
+class ShapedJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider plus the shape=columnar response layout and JSON_DATETIME_FORMAT."""
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.iso_dates = app.config.get('JSON_DATETIME_FORMAT') == 'iso'
+        self.default = _iso_default if self.iso_dates else _http_default
+
+    def _prepare_response_obj(self, args, kwargs):
+        obj = super()._prepare_response_obj(args, kwargs)
+        # Cache keys include the query string, so columnar and row responses are cached apart
+        if has_request_context() and request.args.get('shape') == 'columnar':
+            obj = shape_payload(obj)
+        return obj
+
+
+class FastJSONProvider(ShapedJSONProvider):
+    """ShapedJSONProvider encoding with orjson, which serializes rows with datetimes natively.
+
+    Dates keep Flask's HTTP date format unless JSON_DATETIME_FORMAT is 'iso';
+    ISO dates are encoded inside orjson and are the fastest option.
+    """
+
+    def _options(self, indent=False):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if not self.iso_dates:
+            # Hand dates to default() so they come out as HTTP dates, like the standard provider
+            option |= orjson.OPT_PASSTHROUGH_DATETIME
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            # Encoder arguments such as indent or cls only mean something to the json module
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._options()).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = orjson.dumps(obj, default=self.default, option=self._options(indent))
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
+
+
+def make_json_provider(app):
+    """The provider for app: orjson-backed when JSON_FAST is on and orjson is installed."""
+    if app.config.get('JSON_FAST', True) and orjson is not None:
+        return FastJSONProvider(app)
+    if app.config.get('JSON_FAST', True):
+        app.logger.info("orjson is not installed; using the standard library JSON encoder.")
+    return ShapedJSONProvider(app)
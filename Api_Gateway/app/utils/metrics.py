@@ -0,0 +1,118 @@
+import time
+from flask import g, has_app_context, has_request_context, request
+from flask_caching.signals import cache_view_hit, cache_view_miss
+from sigma_common.db import add_statement_hook, strip_statement_settings
+from sigma_common.metrics import Counter, Gauge, Histogram
+
+# Row counts per statement, from single-row lookups to full-window scans
+ROW_BUCKETS = (0, 1, 10, 100, 500, 1000, 5000, 10000, 50000, 100000, 500000)
+
+REQUEST_SECONDS = Histogram(
+    "sigma_api_request_duration_seconds", "Time to answer a request", ["route", "method", "status"],
+)
+REQUEST_DB_SECONDS = Histogram(
+    "sigma_api_request_db_seconds", "Database time spent answering a request", ["route"],
+)
+QUERY_SECONDS = Histogram(
+    "sigma_api_query_duration_seconds", "Time to run a SQL statement and read its rows", ["route", "statement"],
+)
+QUERY_ROWS = Histogram(
+    "sigma_api_query_rows", "Rows returned or changed by a SQL statement", ["route", "statement"], buckets=ROW_BUCKETS,
+)
+CACHE_REQUESTS = Counter(
+    "sigma_api_cache_requests_total", "Cache lookups by cache and result (hit, stale or miss)", ["cache", "result"],
+)
+ADMISSIONS = Counter(
+    "sigma_api_admissions_total", "Requests to limited routes by outcome (admitted, degraded or rejected)",
+    ["route", "action"],
+)
+ADMISSION_WAIT_SECONDS = Histogram(
+    "sigma_api_admission_wait_seconds", "Time limited requests queued for a slot", ["route"],
+)
+
+
+def _pool_values(field):
+    # Imported here because app.utils.db imports route_label from this module
+    from app.utils.db import pool_stats
+    return [({"pool": name}, stats[field]) for name, stats in pool_stats().items()]
+
+
+POOL_CONNECTIONS = Gauge(
+    "sigma_api_db_pool_connections", "Pooled database connections by state", ["pool", "state"],
+    function=lambda: [
+        (dict(labels, state=state), value)
+        for state in ("size", "in_use", "idle", "waiting")
+        for labels, value in _pool_values(state)
+    ],
+)
+POOL_TIMEOUTS = Counter(
+    "sigma_api_db_pool_timeouts_total", "Requests that gave up waiting for a pooled connection", ["pool"],
+    function=lambda: _pool_values("timeouts"),
+)
+POOL_WAIT_SECONDS = Counter(
+    "sigma_api_db_pool_wait_seconds_total", "Time spent waiting for pooled connections", ["pool"],
+    function=lambda: _pool_values("wait_seconds"),
+)
+
+
+def route_label():
+    """The URL rule being served, e.g. /api/user_origin_logs, for labelling metrics."""
+    if has_app_context() and g.get("metrics_route"):
+        # Set on query threads, which run in an app context without the request
+        return g.metrics_route
+    if has_request_context():
+        return request.url_rule.rule if request.url_rule else "unmatched"
+    return "background"
+
+
+def count_cache(cache, result):
+    """Count one lookup in the named cache: result is 'hit', 'stale' or 'miss'."""
+    CACHE_REQUESTS.inc(cache=cache, result=result)
+
+
+def _record_statement(statement, params, seconds, rowcount):
+    # Limited queries carry their time limit as a SET STATEMENT prefix on MariaDB; count the query itself
+    statement = strip_statement_settings(statement)
+    kind = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "UNKNOWN"
+    if kind == "SET":
+        # Session settings applied around queries, not work done for the route
+        return
+    route = route_label()
+    QUERY_SECONDS.observe(seconds, route=route, statement=kind)
+    if rowcount is not None and rowcount >= 0:
+        QUERY_ROWS.observe(rowcount, route=route, statement=kind)
+
+
+def _count_response_hit(sender, **kwargs):
+    count_cache("response", "hit")
+
+
+def _count_response_miss(sender, **kwargs):
+    count_cache("response", "miss")
+
+
+def _start_timer():
+    g.request_start = time.perf_counter()
+
+
+def _observe_request(response):
+    start = g.get("request_start")
+    if start is not None:
+        route = route_label()
+        REQUEST_SECONDS.observe(
+            time.perf_counter() - start, route=route, method=request.method, status=response.status_code,
+        )
+        if g.get("db_time_ms") is not None:
+            REQUEST_DB_SECONDS.observe(g.db_time_ms / 1000, route=route)
+    return response
+
+
+def init_metrics(app):
+    """Time every request and statement and count response cache hits for /api/metrics."""
+    app.before_request(_start_timer)
+    app.after_request(_observe_request)
+    # Both are process-wide and ignore repeated registration
+    add_statement_hook(_record_statement)
+    # Sent by cache.cached when CACHE_ENABLE_SIGNALS is on
+    cache_view_hit.connect(_count_response_hit)
+    cache_view_miss.connect(_count_response_miss)
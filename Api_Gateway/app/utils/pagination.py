@@ -0,0 +1,144 @@
+import json
+import base64
+import hashlib
+from datetime import datetime
+from app.utils.db import fetch_data, run_concurrently
+from app import cache  # Import the initialized cache object
+from app.utils.cache import current_generation
+from app.utils.metrics import count_cache
+
+# Exact totals are expensive on deep 7-day windows, so they are shared for a minute
+TOTAL_COUNT_TIMEOUT = 60
+
+# Values accepted for total=; leaving it out returns no total
+TOTAL_MODES = ("exact", "estimate")
+
+CURSOR_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def use_keyset(args):
+    """Keyset pagination is opt-in so page/per_page clients keep working."""
+    return bool(args.get('cursor')) or args.get('pagination') == 'keyset'
+
+
+def encode_cursor(row, direction):
+    """Build an opaque token pointing at a row's (system_time, id) position."""
+    payload = [row["system_time"].strftime(CURSOR_TIME_FORMAT), row["id"], direction]
+    token = base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode())
+    return token.decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Return (system_time, id, direction) from a token, raising ValueError if it is malformed."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        system_time, row_id, direction = json.loads(base64.urlsafe_b64decode(padded))
+        datetime.strptime(system_time, CURSOR_TIME_FORMAT)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+    if direction not in ("next", "prev") or not isinstance(row_id, int):
+        raise ValueError("Invalid cursor")
+    return system_time, row_id, direction
+
+
+def fetch_total(where, params, mode):
+    """Total rows matching where: 'exact' (cached COUNT), 'estimate' (optimizer estimate) or None."""
+    if mode == 'estimate':
+        plan, status_code = fetch_data(f"EXPLAIN SELECT id FROM sigma_alerts WHERE {where}", params)
+        if status_code != 200:
+            return plan, status_code
+        # A tag filter joins alert_tags and tags ahead of sigma_alerts, so take its row, not the first
+        row = next((row for row in plan if row["table"] == "sigma_alerts"), plan[-1])
+        return {"total_records": int(row["rows"] or 0), "total_is_estimate": True}, 200
+
+    if mode == 'exact':
+        key = "total:" + hashlib.sha1(repr((where, params)).encode()).hexdigest() + f"@{current_generation()}"
+        total = cache.get(key)
+        count_cache("total_count", "miss" if total is None else "hit")
+        if total is None:
+            total_records, status_code = fetch_data(f"SELECT COUNT(*) AS total FROM sigma_alerts WHERE {where}", params)
+            if status_code != 200:
+                return total_records, status_code
+            total = total_records[0]["total"]
+            cache.set(key, total, timeout=TOTAL_COUNT_TIMEOUT)
+        return {"total_records": total, "total_is_estimate": False}, 200
+
+    return {}, 200
+
+
+def fetch_keyset_page(columns, where, params, cursor, per_page, total=None):
+    """Fetch one page ordered by (system_time, id) DESC, continuing from an opaque cursor.
+
+    Returns (rows, pagination, status_code); on error rows holds the error payload.
+    """
+    if total and total not in TOTAL_MODES:
+        return {"error": "total must be one of: " + ", ".join(TOTAL_MODES)}, None, 400
+
+    params = tuple(params)
+    direction = None
+    if cursor:
+        try:
+            system_time, row_id, direction = decode_cursor(cursor)
+        except ValueError as e:
+            return {"error": str(e)}, None, 400
+
+    if direction == "prev":
+        # Walk towards newer rows, then flip back to newest-first
+        query = f"""
+        SELECT {columns}
+        FROM sigma_alerts
+        WHERE {where}
+        AND (system_time > %s OR (system_time = %s AND id > %s))
+        ORDER BY system_time ASC, id ASC
+        LIMIT %s
+        """
+        query_params = params + (system_time, system_time, row_id, per_page + 1)
+    elif direction == "next":
+        query = f"""
+        SELECT {columns}
+        FROM sigma_alerts
+        WHERE {where}
+        AND (system_time < %s OR (system_time = %s AND id < %s))
+        ORDER BY system_time DESC, id DESC
+        LIMIT %s
+        """
+        query_params = params + (system_time, system_time, row_id, per_page + 1)
+    else:
+        query = f"""
+        SELECT {columns}
+        FROM sigma_alerts
+        WHERE {where}
+        ORDER BY system_time DESC, id DESC
+        LIMIT %s
+        """
+        query_params = params + (per_page + 1,)
+
+    if total:
+        # The total does not depend on the page, so both queries run at once
+        (rows, status_code), (totals, total_status_code) = run_concurrently(
+            (fetch_data, (query, query_params)),
+            (fetch_total, (where, params, total)),
+        )
+    else:
+        rows, status_code = fetch_data(query, query_params)
+        totals, total_status_code = {}, 200
+    if status_code != 200:
+        return rows, None, status_code
+    if total_status_code != 200:
+        return totals, None, total_status_code
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if direction == "prev":
+        rows.reverse()
+
+    # Coming from a cursor means there is at least one row on the side we came from
+    has_newer = direction == "next" or (direction == "prev" and has_more)
+    has_older = direction == "prev" or has_more
+    pagination = {
+        "per_page": per_page,
+        "next_cursor": encode_cursor(rows[-1], "next") if rows and has_older else None,
+        "prev_cursor": encode_cursor(rows[0], "prev") if rows and has_newer else None,
+    }
+    pagination.update(totals)
+    return rows, pagination, 200
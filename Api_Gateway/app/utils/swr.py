@@ -0,0 +1,232 @@
+import os
+import time
+import uuid
+import hashlib
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import Response, current_app, g, request
+from app import cache  # Import the initialized cache object
+from app.utils.cache import current_generation, request_cache_key
+from app.utils.compression import body_etag
+from app.utils.metrics import count_cache
+
+# Background recomputation of stale entries; a couple of workers is plenty for a handful of routes
+_refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="swr-refresh")
+
+# Keys being computed in this process, so concurrent requests wait on one computation
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+class _Flight:
+    """One in-process computation of a key; waiting threads take its outcome instead of recomputing."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+def route_freshness(name):
+    """Return (fresh_for, stale_for) seconds for a route from SWR_ROUTES, falling back to SWR_DEFAULT."""
+    settings = dict(current_app.config['SWR_DEFAULT'], **current_app.config['SWR_ROUTES'].get(name, {}))
+    return settings['fresh_for'], settings['stale_for']
+
+
+def _to_response(entry):
+    response = Response(entry["body"], status=entry["status"], mimetype=entry["mimetype"])
+    if entry.get("etag"):
+        # Hashed once when the entry was stored, so revalidating a hit costs nothing
+        response.set_etag(entry["etag"])
+    return response
+
+
+def _acquire_file_lock(path, token, timeout):
+    """Create path exclusively, breaking it once it is older than timeout; return a release function or None."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    for _ in range(2):
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600)
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(path) < timeout:
+                    return None
+                # Expired: its owner died or overran the lock timeout
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            continue
+        with os.fdopen(fd, "w") as file:
+            file.write(token)
+
+        def release():
+            try:
+                with open(path) as file:
+                    owned = file.read() == token
+                if owned:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+        return release
+    return None
+
+
+def acquire_lock(lock_key, timeout):
+    """Take the cross-worker lock lock_key for up to timeout seconds.
+
+    Returns a function that releases it, or None if another owner holds it.
+    FileSystemCache's add() is check-then-set, so with the file backend the lock
+    is an O_EXCL file under CACHE_LOCK_DIR instead; RedisCache's add() is atomic.
+    The lock holds a per-owner token and release() leaves it alone once it has
+    expired and been taken by someone else.
+    """
+    token = uuid.uuid4().hex
+    if "filesystem" in str(current_app.config.get('CACHE_TYPE', '')).lower():
+        name = hashlib.sha1(lock_key.encode("utf-8")).hexdigest()
+        return _acquire_file_lock(os.path.join(current_app.config['CACHE_LOCK_DIR'], name), token, timeout)
+
+    if not cache.add(lock_key, token, timeout=timeout):
+        return None
+
+    def release():
+        if cache.get(lock_key) == token:
+            cache.delete(lock_key)
+    return release
+
+
+def _store(key, compute, timeout, release=None):
+    """Run compute() -> (value, cacheable), cache the value if cacheable and release the lock if given."""
+    try:
+        value, cacheable = compute()
+        if cacheable:
+            cache.set(key, value, timeout=timeout)
+        return value
+    finally:
+        if release:
+            release()
+
+
+def single_flight(key, compute, timeout, lock_timeout=60):
+    """Compute a missing cache entry once across threads (in-process flight) and workers (lock).
+
+    compute returns (value, cacheable). Threads that lose the race get the
+    winner's value, or its exception, even when it is not cacheable, so a failing
+    computation is not repeated by every waiter. Workers that lose the race wait
+    for the winner's cached value instead of repeating the work.
+    """
+    with _inflight_lock:
+        flight = _inflight.get(key)
+        owner = flight is None
+        if owner:
+            flight = _inflight[key] = _Flight()
+
+    if not owner:
+        if flight.done.wait(lock_timeout):
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        # The owner overran the lock timeout; don't wait on it forever
+        value = cache.get(key)
+        if value is not None:
+            return value
+        return _store(key, compute, timeout)
+
+    try:
+        release = acquire_lock(key + ":lock", lock_timeout)
+        if release is None:
+            # Another worker is computing; wait for its result before doing the work ourselves
+            deadline = time.monotonic() + lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(0.1)
+                value = cache.get(key)
+                if value is not None:
+                    flight.value = value
+                    return value
+        flight.value = _store(key, compute, timeout, release)
+        return flight.value
+    except Exception as e:
+        flight.error = e
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+        flight.done.set()
+
+
+def _view_entry(app, view, args, kwargs, key):
+    """Run the view and capture its response; only successful responses are cacheable."""
+    # Read first: data written while the view runs must make this entry stale
+    generation = current_generation()
+    # Admission control sheds to this entry rather than keeping a copy of its own
+    g.swr_key = key
+    try:
+        response = app.make_response(view(*args, **kwargs))
+    finally:
+        # /api/batch dispatches several requests in one app context
+        g.pop("swr_key", None)
+    body = response.get_data()
+    entry = {
+        "body": body,
+        "etag": body_etag(body),
+        "status": response.status_code,
+        "mimetype": response.mimetype,
+        "generation": generation,
+        "computed_at": time.time(),
+    }
+    return entry, response.status_code == 200
+
+
+def _refresh_in_background(app, view, args, kwargs, key, timeout, lock_timeout, path, query_string):
+    release = acquire_lock(key + ":lock", lock_timeout)
+    if release is None:
+        return  # someone is already refreshing this entry
+
+    def refresh():
+        with app.test_request_context(path, query_string=query_string):
+            try:
+                _store(key, lambda: _view_entry(app, view, args, kwargs, key), timeout, release)
+            except Exception as e:
+                app.logger.error(f"Background refresh of {path} failed: {e}")
+
+    _refresh_executor.submit(refresh)
+
+
+def swr_cached(name, lock_timeout=60):
+    """Cache a view with stale-while-revalidate semantics and single-flight recomputation.
+
+    Entries are fresh for fresh_for seconds and while the data generation is
+    unchanged. After that, and for up to stale_for more seconds, the stale body
+    is returned immediately while one background worker recomputes it. Only a
+    cold miss blocks, and concurrent misses share a single computation.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            app = current_app._get_current_object()
+            fresh_for, stale_for = route_freshness(name)
+            timeout = fresh_for + stale_for
+            key = "swr:" + request_cache_key()
+
+            entry = cache.get(key)
+            if entry:
+                age = time.time() - entry["computed_at"]
+                if age < fresh_for and entry["generation"] == current_generation():
+                    count_cache("swr", "hit")
+                    return _to_response(entry)
+                if age < timeout:
+                    count_cache("swr", "stale")
+                    _refresh_in_background(
+                        app, view, args, kwargs, key, timeout, lock_timeout,
+                        request.path, request.query_string,
+                    )
+                    return _to_response(entry)
+
+            count_cache("swr", "miss")
+
+            def compute():
+                return _view_entry(app, view, args, kwargs, key)
+
+            return _to_response(single_flight(key, compute, timeout, lock_timeout))
+        return wrapper
+    return decorator
@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta
+
+# Window used when neither start nor end is given, matching the raw table's retention
+DEFAULT_WINDOW_DAYS = 7
+
+
+def parse_time(value):
+    """Parse an ISO 8601 date or date-time such as 2024-05-01 or 2024-05-01T10:00:00Z."""
+    value = value.strip()
+    if value.endswith("Z"):
+        value = value[:-1]
+    return datetime.fromisoformat(value).replace(tzinfo=None)
+
+
+def parse_time_range(args):
+    """Return (start, end, error message) from the start/end parameters; either may be None."""
+    try:
+        start = parse_time(args['start']) if args.get('start') else None
+        end = parse_time(args['end']) if args.get('end') else None
+    except ValueError:
+        return None, None, "start and end must be ISO 8601 dates or date-times"
+    if start and end and start >= end:
+        return None, None, "start must be before end"
+    return start, end, None
+
+
+def window_hours(start, end):
+    """Approximate length of the requested window in hours, applying the same defaults as bucket_time_filter."""
+    end = end or datetime.now()
+    start = start or end - timedelta(days=DEFAULT_WINDOW_DAYS)
+    return max(1, (end - start).total_seconds() / 3600)
+
+
+def bucket_time_filter(args):
+    """Return (where SQL, params, error message) selecting sigma_alerts_hourly buckets for start/end.
+
+    A bucket is included when its hour overlaps [start, end), so results are at
+    hourly granularity. start defaults to DEFAULT_WINDOW_DAYS before end, and
+    end to now.
+    """
+    start, end, error = parse_time_range(args)
+    if error:
+        return None, None, error
+
+    # Keep the relative defaults in SQL so they follow the database clock, like the raw queries did
+    end_sql, params = ("%s", [end]) if end else ("NOW()", [])
+    if start:
+        start_sql = "%s"
+        params = [start] + params
+    else:
+        start_sql = f"{end_sql} - INTERVAL {DEFAULT_WINDOW_DAYS} DAY"
+        params = params * 2
+    where = f"bucket_hour > {start_sql} - INTERVAL 1 HOUR AND bucket_hour < {end_sql}"
+    return where, params, None
@@ -1,4 +1,78 @@
+import os
+
 class Config:
-    CACHE_TYPE = 'simple'
-    CACHE_DEFAULT_TIMEOUT = 300
+    # Shared by all gunicorn workers. Use CACHE_TYPE=RedisCache with CACHE_REDIS_URL for a
+    # Redis-protocol server, or CACHE_TYPE=SimpleCache for a per-process stand-in in tests.
+    CACHE_TYPE = os.getenv('CACHE_TYPE', 'FileSystemCache')
+    CACHE_DIR = os.getenv('CACHE_DIR', '/tmp/sigma_api_cache')
+    CACHE_THRESHOLD = int(os.getenv('CACHE_THRESHOLD', '5000'))
+    CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    CACHE_KEY_PREFIX = 'sigma_api:'
+    # Single-flight locks for FileSystemCache, whose add() is not atomic; kept outside CACHE_DIR
+    # so the cache's pruning never sees them. RedisCache locks with an atomic add() instead
+    CACHE_LOCK_DIR = os.getenv('CACHE_LOCK_DIR', CACHE_DIR.rstrip('/') + '_locks')
+    # Lets /api/metrics count response cache hits and misses
+    CACHE_ENABLE_SIGNALS = True
+    # Cache keys embed the data generation, so entries are replaced when the data changes;
+    # the timeout only bounds drift of the rolling 7-day window
+    CACHE_DEFAULT_TIMEOUT = int(os.getenv('CACHE_DEFAULT_TIMEOUT', '900'))
+    # How long a worker trusts its last read of the data generation
+    CACHE_GENERATION_CHECK_SECONDS = float(os.getenv('CACHE_GENERATION_CHECK_SECONDS', '2'))
+    # Stale-while-revalidate for expensive dashboard routes: an entry is served as-is for
+    # fresh_for seconds, then served stale for up to stale_for more while it is recomputed
+    SWR_DEFAULT = {'fresh_for': 300, 'stale_for': 3600}
+    SWR_ROUTES = {
+        'outliers': {'fresh_for': 300},
+        'user_origin_outlier_highrisk': {'fresh_for': 300},
+        'user_impacted_outlier_highrisk': {'fresh_for': 300},
+        'computer_impacted_outlier_highrisk': {'fresh_for': 300},
+        'user_origin': {'fresh_for': 120},
+        'user_impacted': {'fresh_for': 120},
+        'computer_impacted': {'fresh_for': 120},
+    }
+    # Live feed (/api/stream): each worker serves up to SSE_MAX_CLIENTS streams, so run it under
+    # a threaded worker class; a client that falls SSE_CLIENT_BUFFER events behind starts losing them
+    SSE_MAX_CLIENTS = int(os.getenv('SSE_MAX_CLIENTS', '100'))
+    SSE_CLIENT_BUFFER = int(os.getenv('SSE_CLIENT_BUFFER', '1000'))
+    SSE_HEARTBEAT_SECONDS = 15
+    SSE_RETRY_MS = 3000
+    SSE_BACKFILL_LIMIT = 500
+    # Most panel requests /api/batch accepts in one call
+    BATCH_MAX_REQUESTS = int(os.getenv('BATCH_MAX_REQUESTS', '20'))
+    # Encode responses with orjson when it is installed (JSON_FAST=0 forces the standard library).
+    # Dates are HTTP dates as Flask has always sent them; JSON_DATETIME_FORMAT=iso sends ISO 8601
+    # instead, which is cheaper to produce and to parse
+    JSON_FAST = os.getenv('JSON_FAST', '1') != '0'
+    JSON_DATETIME_FORMAT = os.getenv('JSON_DATETIME_FORMAT', 'http')
+    # Compress bodies of these types once they reach COMPRESS_MIN_SIZE bytes; brotli is used when
+    # the brotli package is installed and the client accepts it. Compressed bodies are kept in a
+    # per-worker LRU of COMPRESS_CACHE_BYTES so unchanged payloads are compressed once
+    COMPRESS_MIMETYPES = {'application/json', 'application/x-ndjson', 'text/csv'}
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))
+    COMPRESS_GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', '6'))
+    COMPRESS_BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', '5'))
+    COMPRESS_CACHE_BYTES = int(os.getenv('COMPRESS_CACHE_BYTES', str(32 * 1024 * 1024)))
+    # Admission control for expensive routes: each class runs at most `concurrency` requests per
+    # worker and the rest queue for up to `queue_seconds`; its statements stop after
+    # `max_execution_ms`. Requests whose key has historically cost EXPENSIVE_REQUEST_MS of database
+    # time are not queued while the pool is saturated (DB_SATURATION of its connections in use, or
+    # any waiting). Shed requests get the last good answer to the same request as a 203 (the SWR
+    # entry for SWR routes, otherwise a copy kept for SHED_FALLBACK_SECONDS), or a 429 with
+    # Retry-After: SHED_RETRY_AFTER
+    ROUTE_LIMITS = {
+        'timeline': {
+            'concurrency': int(os.getenv('TIMELINE_CONCURRENCY', '4')),
+            'queue_seconds': 2,
+            'max_execution_ms': int(os.getenv('TIMELINE_MAX_EXECUTION_MS', '10000')),
+        },
+        'aggregate': {
+            'concurrency': int(os.getenv('AGGREGATE_CONCURRENCY', '4')),
+            'queue_seconds': 5,
+            'max_execution_ms': int(os.getenv('AGGREGATE_MAX_EXECUTION_MS', '20000')),
+        },
+    }
+    EXPENSIVE_REQUEST_MS = int(os.getenv('EXPENSIVE_REQUEST_MS', '1000'))
+    DB_SATURATION = float(os.getenv('DB_SATURATION', '0.8'))
+    SHED_FALLBACK_SECONDS = int(os.getenv('SHED_FALLBACK_SECONDS', '3600'))
+    SHED_RETRY_AFTER = 5
     # Add other configuration settings as needed
@@ -1,14 +1,25 @@
 import os
 import re
+import sys
+import hashlib
 import time
 import logging
 import schedule
 import threading
-import mysql.connector
-from datetime import datetime, timedelta
+from datetime import datetime, timezone
 from mysql.connector import Error
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
+# Make the shared sigma_common package importable when run as a script
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from sigma_common.db import get_connection, execute_batched, with_retry, register_pool_metrics
+from sigma_common.metrics import Counter, Gauge, Histogram, LAG_BUCKETS, serve
+from sigma_common.generation import bump_generation
+from sigma_common.migrations import migrate_with_retry
+from sigma_common.rollup import refresh_ingested, refresh_raw_span, rollup_is_empty, purge_expired_buckets, raw_cutoff
+from sigma_common.notify import publish, ALERTS
+from sigma_common.tags import sync_alert_tags, backfill_alert_tags, alert_tags_is_empty, delete_alert_tags_before
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger()
@@ -16,20 +27,29 @@ logger = logging.getLogger()
 # Folder path for logs
 log_folder = os.getenv("LOG_FOLDER_PATH", "/var/log/logstash/detected_zircolite/")
 
-# Database configuration
-db_config = {
-    "host": "localhost",
-    "user": "root",
-    "password": "sigma",
-    "database": "sigma_db",
-}
-
 # Bookmark file to track the last processed log time
 bookmark_file = "bookmark.txt"
 
 # Batch size for database insertions
 BATCH_SIZE = 1000
 
+# Port of the local /metrics endpoint; 0 turns it off
+METRICS_PORT = int(os.getenv("INGEST_METRICS_PORT", "9108"))
+
+# Ingest pipeline metrics, per stage: read (file to lines), parse (lines to rows), hash (unique_hash) and write (upsert, tags, rollup)
+STAGE_SECONDS = Histogram("sigma_ingest_stage_duration_seconds", "Time spent per file or batch in each ingest stage", ["stage"])
+FILES = Counter("sigma_ingest_files_total", "Log files read")
+LINES = Counter("sigma_ingest_lines_total", "Non-empty log lines read")
+SKIPPED_LINES = Counter("sigma_ingest_skipped_lines_total", "Lines skipped as older than the bookmark")
+PARSE_ERRORS = Counter("sigma_ingest_parse_errors_total", "Lines that could not be parsed into a row")
+READ_ERRORS = Counter("sigma_ingest_read_errors_total", "Log files that could not be read")
+ROWS_WRITTEN = Counter("sigma_ingest_rows_written_total", "Rows upserted into sigma_alerts")
+WRITE_ERRORS = Counter("sigma_ingest_write_errors_total", "Batches that failed to write after retries")
+EVENT_LAG = Histogram("sigma_ingest_event_lag_seconds", "Seconds from event SystemTime to ingested_at", buckets=LAG_BUCKETS)
+NEWEST_EVENT = Gauge("sigma_ingest_newest_event_timestamp_seconds", "SystemTime of the newest event written, as a Unix timestamp")
+LAST_WRITE = Gauge("sigma_ingest_last_write_timestamp_seconds", "When a batch was last written, as a Unix timestamp")
+register_pool_metrics("sigma_ingest")
+
 # Function to normalize fields by converting to lowercase and removing spaces
 def normalize_field(field):
     if field:
@@ -42,67 +62,10 @@ def process_user_id(user_id):
         return normalize_field(user_id.split('\\')[-1].strip())
     return normalize_field(user_id)
 
-# Initialize SQL tables
-def initialize_sql_tables():
-    """Create the sigma_alerts table in the database if it doesn't exist."""
-    try:
-        connection = mysql.connector.connect(**db_config)
-        with connection.cursor() as cursor:
-            # Create sigma_alerts table
-            create_sigma_alerts_query = """
-            CREATE TABLE IF NOT EXISTS sigma_alerts (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                title VARCHAR(255),
-                tags TEXT,
-                description TEXT,
-                system_time DATETIME,
-                computer_name VARCHAR(100),
-                user_id VARCHAR(100),
-                event_id VARCHAR(50),
-                provider_name VARCHAR(100),
-                ml_cluster INT DEFAULT NULL,
-                ip_address VARCHAR(50),
-                task VARCHAR(255),
-                rule_level VARCHAR(50),
-                target_user_name VARCHAR(100),
-                target_domain_name VARCHAR(100),
-                ruleid VARCHAR(50),
-                raw TEXT,
-                unique_hash VARCHAR(64),
-                tactics TEXT DEFAULT NULL,
-                techniques TEXT DEFAULT NULL,
-                ml_description TEXT DEFAULT NULL,
-                risk INT DEFAULT NULL,
-                UNIQUE INDEX unique_log (unique_hash)
-            );
-            """
-            cursor.execute(create_sigma_alerts_query)
-            connection.commit()
-
-            logger.info("Initialized SQL table 'sigma_alerts'.")
-    except Error as e:
-        logger.error(f"Error initializing SQL tables: {e}")
-    finally:
-        if connection.is_connected():
-            connection.close()
-
-# Ensure columns exist
-def ensure_column_exists(table_name, column_name, column_definition):
-    """Ensure the specified column exists in the given table."""
-    try:
-        connection = mysql.connector.connect(**db_config)
-        with connection.cursor() as cursor:
-            cursor.execute(f"SHOW COLUMNS FROM {table_name} LIKE '{column_name}'")
-            result = cursor.fetchone()
-            if not result:
-                cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_definition}")
-                connection.commit()
-                logger.info(f"Added '{column_name}' column to '{table_name}' table.")
-    except Error as e:
-        logger.error(f"Error ensuring '{column_name}' column exists in '{table_name}': {e}")
-    finally:
-        if connection.is_connected():
-            connection.close()
+# Compute the unique_hash of a row in Python so the inserted ids can be looked up afterwards
+def compute_unique_hash(*values):
+    """SHA-256 of the non-NULL values joined by '|', the same as SHA2(CONCAT_WS('|', ...), 256) in MySQL."""
+    return hashlib.sha256("|".join(str(value) for value in values if value is not None).encode("utf-8")).hexdigest()
 
 # Read the last processed timestamp from the bookmark file
 def read_last_processed_time():
@@ -137,14 +100,20 @@ def process_log_file(file_path, last_processed_time):
     processed_data = []
     latest_time = last_processed_time
     try:
+        start = time.perf_counter()
         with open(file_path, "r") as file:
             lines = file.readlines()
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage="read")
+        FILES.inc()
 
         logger.info(f"Reading file: {file_path}")
 
+        start = time.perf_counter()
+        line_count = skipped = errors = 0
         for line in lines:
             if not line.strip():
                 continue
+            line_count += 1
 
             try:
                 # Extract fields using regex
@@ -204,6 +173,7 @@ def process_log_file(file_path, last_processed_time):
                         truncated_time = system_time.group(1).replace(" ", "").split('.')[0] + "Z"
                         system_time = datetime.strptime(truncated_time, "%Y-%m-%dT%H:%M:%SZ")
                         if last_processed_time and system_time <= last_processed_time:
+                            skipped += 1
                             continue  # Skip already processed entries
                         if not latest_time or system_time > latest_time:
                             latest_time = system_time
@@ -214,8 +184,14 @@ def process_log_file(file_path, last_processed_time):
                 processed_data.append((title, tags, description, system_time.strftime("%Y-%m-%d %H:%M:%S"), computer_name, user_id, event_id, provider_name, ip_address, task, rule_level, target_user_name, target_domain_name, ruleid, line.strip(), tactics, techniques, None))  # Add None for risk value
 
             except Exception as e:
+                errors += 1
                 logger.error(f"Failed to process line: {line.strip()} | Error: {e}")
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage="parse")
+        LINES.inc(line_count)
+        SKIPPED_LINES.inc(skipped)
+        PARSE_ERRORS.inc(errors)
     except Exception as e:
+        READ_ERRORS.inc()
         logger.error(f"Error reading log file {file_path}: {e}")
 
     return processed_data, latest_time
@@ -224,59 +200,148 @@ def process_log_file(file_path, last_processed_time):
 def insert_data_to_sql(data, table, cluster_value):
     """Insert processed data into the specified table ('sigma_alerts')."""
     if data:
-        try:
-            connection = mysql.connector.connect(**db_config)
+        insert_query = f"""
+        INSERT INTO {table} (title, tags, description, system_time, computer_name, user_id, event_id, provider_name, ml_cluster, ip_address, task, rule_level, target_user_name, target_domain_name, ruleid, raw, unique_hash, tactics, techniques, ml_description, risk, ingested_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+        title = VALUES(title), tags = VALUES(tags), description = VALUES(description), computer_name = VALUES(computer_name), user_id = VALUES(user_id), event_id = VALUES(event_id), provider_name = VALUES(provider_name), ml_cluster = VALUES(ml_cluster), ip_address = VALUES(ip_address), task = VALUES(task), rule_level = VALUES(rule_level), target_user_name = VALUES(target_user_name), target_domain_name = VALUES(target_domain_name), ruleid = VALUES(ruleid), raw = VALUES(raw), tactics = VALUES(tactics), techniques = VALUES(techniques), ml_description = VALUES(ml_description), risk = VALUES(risk);
+        """
+        # ingested_at is not updated on a duplicate, so it keeps the time the row first arrived
+        start = time.perf_counter()
+        unique_hashes = [
+            compute_unique_hash(row[3], row[0], row[1], row[2], row[4], row[5], row[6], row[7], row[11], row[12], row[13])
+            for row in data
+        ]
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage="hash")
+        # UTC, like the SystemTime the rows carry, so the two can be subtracted for lag
+        ingested_at = datetime.utcnow().replace(microsecond=0)
+        data_with_cluster = [
+            (
+                row[0], row[1], row[2], row[3],
+                row[4],  # computer_name
+                row[5],  # user_id
+                row[6], row[7], cluster_value,
+                row[8], row[9], row[10],
+                row[11],  # target_user_name
+                row[12], row[13], row[14],
+                unique_hashes[i],
+                row[15],  # tactics
+                row[16],  # techniques
+                None,  # ml_description
+                row[17],  # risk (use the provided value)
+                ingested_at
+            ) for i, row in enumerate(data)
+        ]
+
+        def write(connection):
             with connection.cursor() as cursor:
-                insert_query = f"""
-                INSERT INTO {table} (title, tags, description, system_time, computer_name, user_id, event_id, provider_name, ml_cluster, ip_address, task, rule_level, target_user_name, target_domain_name, ruleid, raw, unique_hash, tactics, techniques, ml_description, risk)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, SHA2(CONCAT_WS('|', %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s), 256), %s, %s, %s, %s)
-                ON DUPLICATE KEY UPDATE
-                title = VALUES(title), tags = VALUES(tags), description = VALUES(description), computer_name = VALUES(computer_name), user_id = VALUES(user_id), event_id = VALUES(event_id), provider_name = VALUES(provider_name), ml_cluster = VALUES(ml_cluster), ip_address = VALUES(ip_address), task = VALUES(task), rule_level = VALUES(rule_level), target_user_name = VALUES(target_user_name), target_domain_name = VALUES(target_domain_name), ruleid = VALUES(ruleid), raw = VALUES(raw), tactics = VALUES(tactics), techniques = VALUES(techniques), ml_description = VALUES(ml_description), risk = VALUES(risk);
-                """
-                # Batch insert in chunks
-                for i in range(0, len(data), BATCH_SIZE):
-                    batch = data[i:i + BATCH_SIZE]
-                    data_with_cluster = [
-                        (
-                            row[0], row[1], row[2], row[3],
-                            row[4],  # computer_name
-                            row[5],  # user_id
-                            row[6], row[7], cluster_value,
-                            row[8], row[9], row[10],
-                            row[11],  # target_user_name
-                            row[12], row[13], row[14],
-                            row[3], row[0], row[1], row[2], row[4], row[5], row[6], row[7], row[11], row[12], row[13],
-                            row[15],  # tactics
-                            row[16],  # techniques
-                            None,  # ml_description
-                            row[17]  # risk (use the provided value)
-                        ) for row in batch
-                    ]
-                    cursor.executemany(insert_query, data_with_cluster)
-                    connection.commit()
-                logger.info(f"Inserted {len(data)} rows into '{table}' with cluster value {cluster_value}.")
+                # Batch insert in chunks; rows, tags and rollup commit together, so a failure leaves no stale buckets
+                execute_batched(cursor, insert_query, data_with_cluster, BATCH_SIZE)
+                # Split the tags of the inserted rows into the tags dimension and alert_tags bridge
+                inserted_ids = []
+                for i in range(0, len(unique_hashes), BATCH_SIZE):
+                    hashes = unique_hashes[i:i + BATCH_SIZE]
+                    placeholders = ", ".join(["%s"] * len(hashes))
+                    cursor.execute(f"SELECT id, system_time, tags FROM {table} WHERE unique_hash IN ({placeholders})", hashes)
+                    rows = cursor.fetchall()
+                    sync_alert_tags(cursor, rows)
+                    inserted_ids.extend(row[0] for row in rows)
+                # Recompute the hourly buckets these rows fall into, or add late rows onto already truncated hours
+                refresh_ingested(cursor, [row[3] for row in data], unique_hashes, ingested_at)
+                bump_generation(cursor)
+                connection.commit()
+                return inserted_ids
 
+        try:
+            start = time.perf_counter()
+            # Concurrent files refresh overlapping hourly buckets and can deadlock; the upsert is safe to repeat
+            inserted_ids = with_retry(write)
+            STAGE_SECONDS.observe(time.perf_counter() - start, stage="write")
+            record_written(data, ingested_at)
+            # Push the new rows to live feed subscribers
+            publish(ALERTS, inserted_ids)
+            logger.info(f"Inserted {len(data)} rows into '{table}' with cluster value {cluster_value}.")
         except Error as e:
+            WRITE_ERRORS.inc()
             logger.error(f"Error inserting data into {table}: {e}")
-        finally:
-            if connection.is_connected():
-                connection.close()
+
+# Record how many rows were written and how far behind their events the write was
+def record_written(data, ingested_at):
+    """Update the row, lag and freshness metrics for a written batch."""
+    ROWS_WRITTEN.inc(len(data))
+    newest = None
+    for row in data:
+        system_time = datetime.fromisoformat(row[3])
+        EVENT_LAG.observe(max((ingested_at - system_time).total_seconds(), 0))
+        if newest is None or system_time > newest:
+            newest = system_time
+    # Files are written concurrently and out of order, so only move the high-water mark forward
+    NEWEST_EVENT.set_max(newest.replace(tzinfo=timezone.utc).timestamp())
+    LAST_WRITE.set(time.time())
 
 # Truncate data older than 7 days
 def truncate_old_data():
     """Delete data older than 7 days from the sigma_alerts table."""
+    connection = None
     try:
-        connection = mysql.connector.connect(**db_config)
+        connection = get_connection()
         with connection.cursor() as cursor:
-            seven_days_ago = datetime.now() - timedelta(days=7)
+            # Cut on an hour boundary so every hour left in sigma_alerts is complete and can be re-rolled up
+            seven_days_ago = raw_cutoff()
             delete_query = "DELETE FROM sigma_alerts WHERE system_time < %s"
             cursor.execute(delete_query, (seven_days_ago.strftime("%Y-%m-%d %H:%M:%S"),))
+            if cursor.rowcount:
+                delete_alert_tags_before(cursor, seven_days_ago.strftime("%Y-%m-%d %H:%M:%S"))
+                bump_generation(cursor)
+            # Hourly buckets are kept longer than the raw rows
+            purged = purge_expired_buckets(cursor)
             connection.commit()
             logger.info("Truncated data older than 7 days from 'sigma_alerts' table.")
+            if purged:
+                logger.info(f"Purged {purged} expired hourly buckets from 'sigma_alerts_hourly'.")
     except Error as e:
         logger.error(f"Error truncating old data: {e}")
     finally:
-        if connection.is_connected():
+        if connection:
+            connection.close()
+
+# Build the hourly rollup from the raw rows when it is empty, e.g. on first start after an upgrade
+def backfill_hourly_rollup():
+    """Populate sigma_alerts_hourly from sigma_alerts if it has no buckets yet."""
+    connection = None
+    try:
+        connection = get_connection()
+        with connection.cursor() as cursor:
+            if rollup_is_empty(cursor):
+                refresh_raw_span(cursor)
+                bump_generation(cursor)
+                connection.commit()
+                logger.info("Backfilled 'sigma_alerts_hourly' from 'sigma_alerts'.")
+    except Error as e:
+        logger.error(f"Error backfilling hourly rollup: {e}")
+    finally:
+        if connection:
+            connection.close()
+
+# Bridge existing alerts to their tags when alert_tags is empty, e.g. on first start after an upgrade
+def backfill_tag_bridge():
+    """Populate tags and alert_tags from sigma_alerts in batches if the bridge has no rows yet."""
+    connection = None
+    try:
+        connection = get_connection()
+        with connection.cursor() as cursor:
+            if alert_tags_is_empty(cursor):
+                last_id = 0
+                while last_id is not None:
+                    last_id = backfill_alert_tags(cursor, last_id, BATCH_SIZE)
+                    connection.commit()
+                bump_generation(cursor)
+                connection.commit()
+                logger.info("Backfilled 'alert_tags' from 'sigma_alerts'.")
+    except Error as e:
+        logger.error(f"Error backfilling tag bridge: {e}")
+    finally:
+        if connection:
             connection.close()
 
 # Schedule truncation every 12 hours
@@ -354,19 +419,17 @@ def monitor_folder(log_folder):
 
 # Main execution
 if __name__ == "__main__":
-    initialize_sql_tables()
-    ensure_column_exists("sigma_alerts", "ml_cluster", "INT DEFAULT NULL")
-    ensure_column_exists("sigma_alerts", "tactics", "TEXT DEFAULT NULL")
-    ensure_column_exists("sigma_alerts", "techniques", "TEXT DEFAULT NULL")
-    ensure_column_exists("sigma_alerts", "ml_description", "TEXT DEFAULT NULL")
-    ensure_column_exists("sigma_alerts", "raw", "TEXT")
-    ensure_column_exists("sigma_alerts", "ip_address", "VARCHAR(50)")
-    ensure_column_exists("sigma_alerts", "task", "VARCHAR(255)")
-    ensure_column_exists("sigma_alerts", "rule_level", "VARCHAR(50)")
-    ensure_column_exists("sigma_alerts", "target_user_name", "VARCHAR(100)")
-    ensure_column_exists("sigma_alerts", "target_domain_name", "VARCHAR(100)")
-    ensure_column_exists("sigma_alerts", "ruleid", "VARCHAR(50)")
-    ensure_column_exists("sigma_alerts", "risk", "INT DEFAULT NULL")
+    # Creates the tables on first start and applies pending schema changes; one query when current
+    if migrate_with_retry() is None:
+        # Every insert would fail against an unmigrated schema
+        logger.error("Could not bring the database schema up to date, exiting.")
+        sys.exit(1)
+
+    backfill_hourly_rollup()
+    backfill_tag_bridge()
+
+    if METRICS_PORT and serve(METRICS_PORT):
+        logger.info(f"Serving ingest metrics on port {METRICS_PORT} at /metrics.")
 
     # Start the truncation scheduling in a separate thread
     truncation_thread = threading.Thread(target=schedule_truncation)
@@ -0,0 +1,266 @@
+"""Load-test the Api_Gateway routes against a seeded scratch database.
+
+Seeds N days of synthetic alerts, then drives every GET /api/* route through
+the Flask app in-process: a cold pass with the cache cleared before each
+request and a concurrent warm pass. Reports p50/p95/p99 latency, throughput
+and DB time per route (from the Server-Timing header) and exits non-zero when
+a threshold or baseline comparison flags a regression.
+
+    python Benchmarks/api_benchmark.py --seed-days 7 --rows-per-day 200000
+    python Benchmarks/api_benchmark.py --thresholds Benchmarks/api_thresholds.json --baseline last.json
+"""
+import os
+import sys
+import json
+import math
+import time
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+
+from synthetic_alerts import SIGMA_RULES, generate_alerts  # noqa: E402
+
+# Representative values for routes that need parameters; the generator's most frequent entities
+USER = "user00000"
+COMPUTER = "ws00000.corp.local"
+TITLE = SIGMA_RULES[0][0]
+
+ROUTE_PARAMS = {
+    "/api/alerts": {"page": 1, "per_page": 100},
+    "/api/user_origin_timeline": {"user_origin": USER},
+    "/api/user_impacted_timeline": {"user_impacted": USER},
+    "/api/computer_impacted_timeline": {"computer_name": COMPUTER},
+    "/api/user_origin_logs": {"user_origin": USER, "title": TITLE},
+    "/api/user_impacted_logs": {"user_impacted": USER, "title": TITLE},
+    "/api/computer_impacted_logs": {"computer_name": COMPUTER, "title": TITLE},
+    "/api/export": {"computer_name": COMPUTER, "format": "ndjson"},
+}
+
+# Endpoints that never finish on their own
+SKIP_ROUTES = {"/api/stream"}
+
+INSERT_QUERY = """
+INSERT IGNORE INTO sigma_alerts (title, tags, description, system_time, computer_name, user_id, event_id, provider_name, ml_cluster, ip_address, task, rule_level, target_user_name, target_domain_name, ruleid, raw, unique_hash, tactics, techniques, ml_description, risk)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+
+def seed_database(days, rows_per_day, seed):
+    """Create the schema in the scratch database and fill it with synthetic alerts."""
+    sys.path.insert(0, os.path.join(BENCH_DIR, "..", "Backend"))
+    import mysql.connector
+    import Initializer
+    from sigma_common.rollup import refresh_raw_span
+    from sigma_common.tags import backfill_alert_tags
+    from sigma_common.outliers import rebuild_outlier_groups
+    from sigma_common.migrations import migrate
+
+    Initializer.create_database()
+    # Includes the query-shape indexes; without them every entity route is a full scan
+    if migrate() is None:
+        sys.exit("Could not migrate the benchmark database schema.")
+
+    connection = mysql.connector.connect(**Initializer.db_config)
+    cursor = connection.cursor()
+    cursor.execute("TRUNCATE TABLE sigma_alerts")
+    batch = []
+    total = days * rows_per_day
+    for alert in generate_alerts(total, seed=seed, days=days):
+        raw = json.dumps(alert, default=str)
+        batch.append((
+            alert["title"], alert["tags"], alert["description"], alert["system_time"], alert["computer_name"],
+            alert["user_id"], alert["event_id"], alert["provider_name"], alert["ml_cluster"], alert["ip_address"],
+            alert["task"], alert["rule_level"], alert["target_user_name"], alert["target_domain_name"],
+            alert["ruleid"], raw, hashlib.sha256(raw.encode()).hexdigest(), alert["tactics"], alert["techniques"],
+            "Normal Behavior" if alert["ml_cluster"] == 0 else "General: Unusual Activity", alert["risk"],
+        ))
+        if len(batch) == 5000:
+            cursor.executemany(INSERT_QUERY, batch)
+            connection.commit()
+            batch = []
+    if batch:
+        cursor.executemany(INSERT_QUERY, batch)
+        connection.commit()
+    # The dashboard routes read the hourly rollup, so build it like the ingest service would
+    cursor.execute("TRUNCATE TABLE sigma_alerts_hourly")
+    # Freshly seeded and never truncated, so every hour is complete, including those past the raw retention
+    refresh_raw_span(cursor, cutoff=datetime.min)
+    rebuild_outlier_groups(cursor)
+    connection.commit()
+    cursor.execute("TRUNCATE TABLE alert_tags")
+    last_id = 0
+    while last_id is not None:
+        last_id = backfill_alert_tags(cursor, last_id, 5000)
+        connection.commit()
+    cursor.close()
+    connection.close()
+    print(f"Seeded {total} alerts over {days} days.", file=sys.stderr)
+
+
+def discover_routes(app):
+    """Every parameterless GET route under /api, plus the parameterised ones we know how to call."""
+    routes = []
+    for rule in app.url_map.iter_rules():
+        if not rule.rule.startswith("/api/") or "GET" not in rule.methods or rule.arguments:
+            continue
+        if rule.rule in SKIP_ROUTES:
+            continue
+        routes.append((rule.rule, ROUTE_PARAMS.get(rule.rule, {})))
+    return sorted(routes)
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    # Nearest-rank percentile
+    index = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return round(ordered[index], 2)
+
+
+def timed_get(client, path, params):
+    start = time.perf_counter()
+    response = client.get(path, query_string=params)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    db_ms = 0.0
+    for metric in response.headers.get("Server-Timing", "").split(","):
+        name, _, duration = metric.strip().partition(";dur=")
+        if name == "db" and duration:
+            db_ms = float(duration)
+    return elapsed_ms, db_ms, response.status_code, len(response.data)
+
+
+def summarize(samples, wall_seconds):
+    latencies = [sample[0] for sample in samples]
+    db_times = [sample[1] for sample in samples]
+    statuses = {}
+    for sample in samples:
+        statuses[str(sample[2])] = statuses.get(str(sample[2]), 0) + 1
+    return {
+        "requests": len(samples),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "db_p50_ms": percentile(db_times, 50),
+        "db_p95_ms": percentile(db_times, 95),
+        "throughput_rps": round(len(samples) / wall_seconds, 1) if wall_seconds else None,
+        "bytes": samples[-1][3] if samples else None,
+        "statuses": statuses,
+    }
+
+
+def bench_route(app, cache, path, params, cold_requests, warm_requests, concurrency):
+    client = app.test_client()
+
+    cold = []
+    start = time.perf_counter()
+    for _ in range(cold_requests):
+        cache.clear()
+        cold.append(timed_get(client, path, params))
+    cold_wall = time.perf_counter() - start
+
+    # Prime, then hit the warm cache from several threads at once
+    timed_get(client, path, params)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        warm = list(executor.map(lambda _: timed_get(app.test_client(), path, params), range(warm_requests)))
+    warm_wall = time.perf_counter() - start
+
+    return {"route": path, "params": params, "cold": summarize(cold, cold_wall), "warm": summarize(warm, warm_wall)}
+
+
+def check_regressions(results, thresholds, baseline, tolerance):
+    """Return human-readable regression messages."""
+    problems = []
+    defaults = thresholds.get("default", {})
+    per_route = thresholds.get("routes", {})
+    previous = {result["route"]: result for result in (baseline or {}).get("results", [])}
+
+    for result in results:
+        limits = dict(defaults, **per_route.get(result["route"], {}))
+        for phase in ("cold", "warm"):
+            stats = result[phase]
+            for metric in ("p50_ms", "p95_ms", "p99_ms", "db_p95_ms"):
+                limit = limits.get(f"{phase}_{metric}")
+                if limit is not None and stats[metric] is not None and stats[metric] > limit:
+                    problems.append(f"{result['route']} {phase} {metric} {stats[metric]} > threshold {limit}")
+            errors = sum(count for status, count in stats["statuses"].items() if status.startswith("5"))
+            if errors:
+                problems.append(f"{result['route']} {phase} returned {errors} server errors")
+
+            before = previous.get(result["route"], {}).get(phase, {}).get("p95_ms")
+            if before and stats["p95_ms"] and stats["p95_ms"] > before * (1 + tolerance):
+                problems.append(f"{result['route']} {phase} p95_ms {stats['p95_ms']} regressed from {before}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency benchmark for the Api_Gateway routes.")
+    parser.add_argument("--seed-days", type=int, default=0, help="Reseed the scratch database with this many days of alerts")
+    parser.add_argument("--rows-per-day", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--cold-requests", type=int, default=5)
+    parser.add_argument("--warm-requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--routes", help="Comma-separated route paths to limit the run to")
+    parser.add_argument("--thresholds", help="JSON file with default/per-route limits such as warm_p95_ms")
+    parser.add_argument("--baseline", help="Results file from an earlier run to compare p95 against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed p95 growth over the baseline")
+    parser.add_argument("--output", default="bench_api.json")
+    args = parser.parse_args()
+    output, thresholds_path, baseline_path = (
+        os.path.abspath(path) if path else None for path in (args.output, args.thresholds, args.baseline)
+    )
+
+    # Point both the seeder and the gateway at the scratch database before anything connects
+    os.environ.setdefault("DB_NAME", "sigma_bench")
+
+    if args.seed_days:
+        seed_database(args.seed_days, args.rows_per_day, args.seed)
+
+    os.chdir(os.path.join(BENCH_DIR, "..", "Api_Gateway"))
+    sys.path.insert(0, os.getcwd())
+    from app import create_app, cache
+
+    app = create_app()
+    routes = discover_routes(app)
+    if args.routes:
+        wanted = set(args.routes.split(","))
+        routes = [route for route in routes if route[0] in wanted]
+
+    results = []
+    for path, params in routes:
+        result = bench_route(app, cache, path, params, args.cold_requests, args.warm_requests, args.concurrency)
+        results.append(result)
+        print(json.dumps(result), flush=True)
+
+    report = {
+        "timestamp": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "database": os.environ["DB_NAME"],
+        "concurrency": args.concurrency,
+        "results": results,
+    }
+    with open(output, "w") as file:
+        json.dump(report, file, indent=2)
+
+    thresholds = {}
+    if thresholds_path:
+        with open(thresholds_path) as file:
+            thresholds = json.load(file)
+    baseline = None
+    if baseline_path:
+        with open(baseline_path) as file:
+            baseline = json.load(file)
+
+    problems = check_regressions(results, thresholds, baseline, args.tolerance)
+    for problem in problems:
+        print(f"REGRESSION: {problem}", file=sys.stderr)
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
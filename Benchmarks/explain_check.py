@@ -0,0 +1,161 @@
+"""Check that no dashboard query falls back to a full table scan.
+
+Calls every GET /api/* route (plus the parameter variants below) through the
+Flask app with the caches cleared, records each SELECT the routes run via the
+statement hooks in sigma_common.db, and runs EXPLAIN on it with the same
+parameters. The workers' backlog and outlier queries are checked too. Exits
+non-zero if any plan reads a large table with type ALL, unless the route is
+listed in ALLOWED_FULL_SCANS. Point it at a seeded scratch database; seeding
+migrates it, so the indexes are the ones sigma_common.migrations creates.
+
+    python Benchmarks/explain_check.py --seed-days 1 --rows-per-day 50000
+    python Benchmarks/explain_check.py --output explain.json
+"""
+import os
+import sys
+import json
+import argparse
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.join(BENCH_DIR, ".."))
+
+from api_benchmark import COMPUTER, TITLE, USER, discover_routes, seed_database  # noqa: E402
+from sigma_common.outliers import MEMBER_COLUMNS, UPSERT_GROUPS_QUERY, insert_members_query  # noqa: E402
+
+# Tables big enough that a full scan matters; the others hold a few hundred rows at most
+LARGE_TABLES = {"sigma_alerts", "sigma_alerts_hourly", "alert_tags", "outlier_group_members"}
+
+# Query shapes that discover_routes' single call per route does not reach
+VARIANTS = [
+    ("/api/alerts", {"pagination": "keyset", "total": "exact"}),
+    ("/api/alerts", {"tag": "t1059"}),
+    ("/api/export", {"title": TITLE, "format": "ndjson"}),
+    ("/api/export", {"user_origin": USER, "title": TITLE, "format": "ndjson"}),
+    ("/api/user_origin_timeline", {"user_origin": USER, "mode": "histogram"}),
+    ("/api/computer_impacted_timeline", {"computer_name": COMPUTER, "mode": "histogram"}),
+    ("/api/alerts/1/raw", {}),
+    ("/api/outliers/1/members", {}),
+]
+
+
+def select_part(statement):
+    """The SELECT feeding an INSERT ... SELECT, without its ON DUPLICATE KEY UPDATE clause."""
+    select = statement[statement.index("SELECT"):]
+    return select.split("ON DUPLICATE KEY UPDATE")[0].strip().rstrip(";")
+
+
+# Statements the background workers run on every pass, keyed by a label; the outlier rebuild's
+# INSERT ... SELECTs are checked through their SELECTs, with placeholder values for the constants
+WORKER_QUERIES = {
+    "risk scoring backlog": ("SELECT id, system_time, tactics, techniques, ingested_at FROM sigma_alerts WHERE risk IS NULL", None),
+    "outlier group rebuild": (select_part(UPSERT_GROUPS_QUERY), (datetime(2000, 1, 1), 0)),
+}
+WORKER_QUERIES.update({
+    f"outlier group rebuild ({member_type} members)": (select_part(insert_members_query(column)), (member_type,))
+    for member_type, column in MEMBER_COLUMNS.items()
+})
+
+# Routes allowed to scan, with the reason; keep this list short
+ALLOWED_FULL_SCANS = {
+    # One scan of the whole 7-day window feeds all three routes, cached and computed single-flight
+    "/api/user_origin_outlier_highrisk": "highrisk snapshot aggregates every row in the window",
+    "/api/user_impacted_outlier_highrisk": "highrisk snapshot aggregates every row in the window",
+    "/api/computer_impacted_outlier_highrisk": "highrisk snapshot aggregates every row in the window",
+}
+
+
+def capture_route_queries(app, cache, requests):
+    """Call each (path, params) with cold caches and return {(route, statement): params} for its SELECTs."""
+    from sigma_common.db import add_statement_hook, remove_statement_hook, strip_statement_settings
+    from app.utils.metrics import route_label
+
+    captured = {}
+
+    def hook(statement, params, seconds, rowcount):
+        # EXPLAIN the query without MariaDB's SET STATEMENT time limit prefix
+        statement = strip_statement_settings(statement)
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.setdefault((route_label(), statement), params)
+
+    add_statement_hook(hook)
+    try:
+        client = app.test_client()
+        for path, params in requests:
+            with app.app_context():
+                cache.clear()
+            response = client.get(path, query_string=params)
+            # Streamed routes (export) run their query while the body is read
+            response.get_data()
+            response.close()
+            if response.status_code >= 500:
+                print(f"{path} {params} answered {response.status_code}", file=sys.stderr)
+    finally:
+        remove_statement_hook(hook)
+    return captured
+
+
+def explain(cursor, statement, params):
+    """EXPLAIN rows for statement as dicts (table, type, key, rows, Extra, ...)."""
+    cursor.execute("EXPLAIN " + statement, params)
+    return cursor.fetchall()
+
+
+def full_scans(plan):
+    """The plan rows that read a large table without an index."""
+    return [row for row in plan if row.get("type") == "ALL" and row.get("table") in LARGE_TABLES]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail if a route query plans a full table scan.")
+    parser.add_argument("--seed-days", type=int, default=0, help="Reseed the scratch database with this many days of alerts")
+    parser.add_argument("--rows-per-day", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write every plan to this JSON file")
+    args = parser.parse_args()
+    output = os.path.abspath(args.output) if args.output else None
+
+    # Never EXPLAIN against production by accident; same default as the API benchmark
+    os.environ.setdefault("DB_NAME", "sigma_bench")
+
+    if args.seed_days:
+        seed_database(args.seed_days, args.rows_per_day, args.seed)
+
+    os.chdir(os.path.join(BENCH_DIR, "..", "Api_Gateway"))
+    sys.path.insert(0, os.getcwd())
+    from app import create_app, cache
+    from sigma_common.db import get_connection
+
+    app = create_app()
+    captured = capture_route_queries(app, cache, discover_routes(app) + VARIANTS)
+    for label, (statement, params) in WORKER_QUERIES.items():
+        captured[(label, statement)] = params
+
+    plans = []
+    problems = []
+    connection = get_connection()
+    try:
+        cursor = connection.cursor(dictionary=True, buffered=True)
+        for (route, statement), params in sorted(captured.items(), key=lambda item: item[0]):
+            plan = explain(cursor, statement, params)
+            scans = full_scans(plan)
+            plans.append({"route": route, "statement": " ".join(statement.split()), "plan": plan})
+            if scans and route not in ALLOWED_FULL_SCANS:
+                tables = ", ".join(sorted({row["table"] for row in scans}))
+                problems.append(f"{route}: full scan of {tables} in {' '.join(statement.split())[:160]}")
+        cursor.close()
+    finally:
+        connection.close()
+
+    print(f"Checked {len(plans)} statements from {len({route for route, _ in captured})} routes and workers.")
+    if output:
+        with open(output, "w") as file:
+            json.dump({"timestamp": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"), "plans": plans}, file, indent=2, default=str)
+    for problem in problems:
+        print(f"FULL SCAN: {problem}", file=sys.stderr)
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
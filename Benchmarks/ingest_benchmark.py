@@ -0,0 +1,199 @@
+"""Benchmark the ingest service on synthetic Zircolite detections.
+
+Measures lines/sec for process_log_file alone and end to end through
+insert_data_to_sql, either into an in-memory sink (no database needed) or a
+local MySQL/MariaDB instance. Each run appends one JSON record per stage to
+--output so results can be tracked across commits.
+
+    python Benchmarks/ingest_benchmark.py --lines 200000 --sink memory
+    python Benchmarks/ingest_benchmark.py --lines 200000 --sink mysql --db-name sigma_bench
+"""
+import os
+import sys
+import json
+import time
+import socket
+import logging
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "Backend"))
+sys.path.insert(0, os.path.join(BENCH_DIR, ".."))
+
+from synthetic_zircolite import write_log_files  # noqa: E402
+from sigma_common import db  # noqa: E402
+from sigma_common.migrations import migrate  # noqa: E402
+
+
+class LineErrorCounter(logging.Handler):
+    """Count the per-line parse failures the ingest service logs."""
+
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+        self.count = 0
+
+    def emit(self, record):
+        # Only the per-line message; a bad SystemTime logs "Failed to process time" and then fails its line too
+        if record.getMessage().startswith("Failed to process line"):
+            self.count += 1
+
+
+class MemorySinkCursor:
+    def __init__(self, sink):
+        self.sink = sink
+        self.rowcount = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        self.sink.statements += 1
+
+    def executemany(self, query, rows):
+        self.sink.statements += 1
+        self.sink.rows += len(rows)
+        self.rowcount = len(rows)
+
+    def fetchall(self):
+        # Nothing was stored, so id lookups (e.g. for the tag bridge) find no rows
+        return []
+
+    def close(self):
+        pass
+
+
+class MemorySinkConnection:
+    """Stands in for a mysql.connector connection and only counts what would be written."""
+
+    def __init__(self):
+        self.statements = 0
+        self.rows = 0
+        self.commits = 0
+
+    def cursor(self, *args, **kwargs):
+        return MemorySinkCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+    @property
+    def unread_result(self):
+        return False
+
+    def ping(self, reconnect=False):
+        pass
+
+    def close(self):
+        pass
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_parse(SQL, folder, names, lines):
+    errors = LineErrorCounter()
+    logging.getLogger().addHandler(errors)
+    try:
+        start = time.perf_counter()
+        rows = 0
+        for name in names:
+            data, _ = SQL.process_log_file(os.path.join(folder, name), None)
+            rows += len(data)
+        elapsed = time.perf_counter() - start
+    finally:
+        logging.getLogger().removeHandler(errors)
+    return {
+        "stage": "parse",
+        "lines": lines,
+        "rows": rows,
+        "parse_errors": errors.count,
+        "seconds": round(elapsed, 3),
+        "lines_per_sec": round(lines / elapsed, 1),
+    }
+
+
+def bench_end_to_end(SQL, folder, names, lines, sink):
+    memory = MemorySinkConnection()
+    if sink == "memory":
+        # Every pooled connection the ingest service checks out is the counting sink
+        db.configure(connect=lambda **kwargs: memory)
+    elif migrate() is None:
+        sys.exit("Could not migrate the benchmark database schema.")
+
+    start = time.perf_counter()
+    for name in names:
+        data, _ = SQL.process_log_file(os.path.join(folder, name), None)
+        SQL.insert_data_to_sql(data, "sigma_alerts", None)
+    elapsed = time.perf_counter() - start
+
+    result = {
+        "stage": f"end_to_end_{sink}",
+        "lines": lines,
+        "seconds": round(elapsed, 3),
+        "lines_per_sec": round(lines / elapsed, 1),
+    }
+    if sink == "memory":
+        result.update(rows=memory.rows, statements=memory.statements, commits=memory.commits)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Zircolite log ingestion.")
+    parser.add_argument("--lines", type=int, default=100_000)
+    parser.add_argument("--files", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--malformed-rate", type=float, default=0.01)
+    parser.add_argument("--sink", choices=["memory", "mysql", "none"], default="memory",
+                        help="Where end-to-end runs write; 'none' benchmarks parsing only")
+    parser.add_argument("--db-host", default=os.getenv("DB_HOST", "localhost"))
+    parser.add_argument("--db-user", default=os.getenv("DB_USER", "root"))
+    parser.add_argument("--db-password", default=os.getenv("DB_PASSWORD", "sigma"))
+    parser.add_argument("--db-name", default="sigma_bench", help="Use a scratch database, never production")
+    parser.add_argument("--output", default="bench_output.jsonl", help="JSON lines file results are appended to")
+    args = parser.parse_args()
+
+    import SQL
+
+    # Keep per-file and per-line log output out of the measurements; errors are still counted
+    logging.getLogger().setLevel(logging.ERROR)
+    for handler in logging.getLogger().handlers:
+        handler.setLevel(logging.CRITICAL)
+    db.configure(dict(db.db_config, host=args.db_host, user=args.db_user, password=args.db_password, database=args.db_name))
+
+    run = {
+        "timestamp": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "revision": _git_revision(),
+        "host": socket.gethostname(),
+        "seed": args.seed,
+        "malformed_rate": args.malformed_rate,
+    }
+
+    with tempfile.TemporaryDirectory() as folder:
+        names = write_log_files(folder, args.lines, files=args.files, seed=args.seed, malformed_rate=args.malformed_rate)
+        results = [bench_parse(SQL, folder, names, args.lines)]
+        if args.sink != "none":
+            results.append(bench_end_to_end(SQL, folder, names, args.lines, args.sink))
+
+    with open(args.output, "a") as file:
+        for result in results:
+            record = dict(run, **result)
+            file.write(json.dumps(record) + "\n")
+            print(json.dumps(record))
+
+
+if __name__ == "__main__":
+    main()
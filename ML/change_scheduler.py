@@ -0,0 +1,155 @@
+import os
+import time
+import logging
+import threading
+from datetime import datetime
+from mysql.connector import Error
+from sigma_common.db import get_connection, register_pool_metrics
+from sigma_common.metrics import Counter, Gauge, Histogram, LAG_BUCKETS, serve
+
+# Run as soon as this many new rows have arrived since the last run
+MIN_NEW_ROWS = int(os.getenv("ML_MIN_NEW_ROWS", "500"))
+
+# Run at most this many seconds after the first unprocessed row was noticed
+MAX_LATENCY = int(os.getenv("ML_MAX_LATENCY_SECONDS", "300"))
+
+# How often to check the high-water mark
+POLL_INTERVAL = int(os.getenv("ML_POLL_INTERVAL_SECONDS", "15"))
+
+# Port of the local /metrics endpoint; 0 turns it off
+METRICS_PORT = int(os.getenv("ML_METRICS_PORT", "9110"))
+
+# Labelling metrics, per job; lag is measured from ingested_at, which the ingest service stamps in UTC
+RUNS = Counter("sigma_ml_runs_total", "Scheduled job runs by result (ok or error)", ["job", "result"])
+RUN_SECONDS = Histogram(
+    "sigma_ml_run_duration_seconds", "Time to run the job", ["job"], buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600),
+)
+PENDING_ROWS = Gauge("sigma_ml_pending_rows", "Rows inserted since the last run, at the last poll", ["job"])
+BACKLOG_AGE = Gauge("sigma_ml_backlog_age_seconds", "Age of the oldest ingested row not yet labelled, at the last poll", ["job"])
+LABEL_LAG = Histogram(
+    "sigma_ml_label_lag_seconds", "Seconds from the oldest row's ingested_at to the run that labelled it", ["job"],
+    buckets=LAG_BUCKETS,
+)
+LAST_SUCCESS = Gauge("sigma_ml_last_success_timestamp_seconds", "When the job last finished, as a Unix timestamp", ["job"])
+register_pool_metrics("sigma_ml")
+
+
+def fetch_high_water_mark(since_id=None):
+    """Return (max id, rows with id > since_id, oldest ingested_at among them) for sigma_alerts, or (None, 0, None) on error.
+
+    Without a since_id (the first poll after a start) only MAX(id) is read, and
+    the count and age come back as 0 and None.
+    """
+    connection = None
+    try:
+        connection = get_connection()
+        cursor = connection.cursor()
+        cursor.execute("SELECT MAX(id) FROM sigma_alerts")
+        max_id = cursor.fetchone()[0]
+        new_rows, oldest = 0, None
+        # The first run is due anyway, and counting from id 0 would scan the whole table
+        if max_id is not None and since_id is not None:
+            # Primary key range scan over the rows since the last run
+            cursor.execute("SELECT COUNT(*), MIN(ingested_at) FROM sigma_alerts WHERE id > %s", (since_id,))
+            new_rows, oldest = cursor.fetchone()
+        cursor.close()
+        return max_id, new_rows, oldest
+    except Error as e:
+        logging.error(f"Error fetching high-water mark: {e}")
+        return None, 0, None
+    finally:
+        if connection:
+            connection.close()
+
+
+class ChangeDrivenScheduler:
+    """Run a job when enough new rows arrive in sigma_alerts or a latency deadline passes.
+
+    Runs never overlap: triggers that fire while the job is running are coalesced
+    into a single follow-up run, and polls that see no change are skipped. The
+    job reports failure by raising; the rows it missed are then still pending,
+    so the next poll runs it again.
+    """
+
+    def __init__(self, job, min_new_rows=MIN_NEW_ROWS, max_latency=MAX_LATENCY, poll_interval=POLL_INTERVAL):
+        self.job = job
+        self.min_new_rows = min_new_rows
+        self.max_latency = max_latency
+        self.poll_interval = poll_interval
+        self.last_run_mark = None
+        self.pending_since = None
+        self._run_lock = threading.Lock()
+        self._trigger = threading.Event()
+
+    def trigger(self):
+        """Request a run on the next poll regardless of thresholds."""
+        self._trigger.set()
+
+    def should_run(self, max_id, new_rows, now):
+        """Decide whether the job is due for the given high-water mark."""
+        if self._trigger.is_set():
+            return True
+        if max_id is None or max_id == self.last_run_mark:
+            # Nothing changed since the last run
+            self.pending_since = None
+            return False
+        if self.last_run_mark is None:
+            return True
+        if self.pending_since is None:
+            self.pending_since = now
+        if new_rows >= self.min_new_rows:
+            return True
+        return now - self.pending_since >= self.max_latency
+
+    def run_once(self):
+        """Poll the high-water mark and run the job if it is due. Returns True if the job ran."""
+        if not self._run_lock.acquire(blocking=False):
+            # A run is already in progress; its successor will pick up these rows
+            return False
+        try:
+            max_id, new_rows, oldest = fetch_high_water_mark(self.last_run_mark)
+            job = self.job.__name__
+            PENDING_ROWS.set(new_rows, job=job)
+            BACKLOG_AGE.set(self._age(oldest), job=job)
+            if not self.should_run(max_id, new_rows, time.monotonic()):
+                return False
+
+            self._trigger.clear()
+            logging.info(f"Change detected (max id {max_id}, {new_rows} new rows), running {job}.")
+            start = time.perf_counter()
+            self.job()
+            RUN_SECONDS.observe(time.perf_counter() - start, job=job)
+            RUNS.inc(job=job, result="ok")
+            LAST_SUCCESS.set(time.time(), job=job)
+            if oldest is not None and self.last_run_mark is not None:
+                # Every row up to max_id is labelled now; the first run's backlog is the whole table, so it is not counted
+                LABEL_LAG.observe(self._age(oldest), job=job)
+            # Use the mark taken before the run so rows inserted during it trigger the next one
+            self.last_run_mark = max_id
+            self.pending_since = None
+            return True
+        except Exception as e:
+            RUNS.inc(job=self.job.__name__, result="error")
+            logging.error(f"Error running scheduled job: {e}")
+            return False
+        finally:
+            self._run_lock.release()
+
+    @staticmethod
+    def _age(ingested_at):
+        """Seconds since a UTC ingested_at, or 0 when there is none."""
+        if ingested_at is None:
+            return 0
+        return max((datetime.utcnow() - ingested_at).total_seconds(), 0)
+
+    def run_forever(self):
+        """Serve metrics and poll until interrupted."""
+        if METRICS_PORT and serve(METRICS_PORT):
+            logging.info(f"Serving {self.job.__name__} metrics on port {METRICS_PORT} at /metrics.")
+        logging.info(
+            f"Watching sigma_alerts every {self.poll_interval}s "
+            f"(min {self.min_new_rows} new rows, max latency {self.max_latency}s)."
+        )
+        while True:
+            self.run_once()
+            self._trigger.wait(self.poll_interval)
@@ -1,9 +1,7 @@
 import os
+import sys
 import logging
-import schedule
-import time
 from datetime import datetime
-import mysql.connector
 from mysql.connector import Error
 from sklearn.preprocessing import StandardScaler, LabelEncoder
 from sklearn.ensemble import IsolationForest
@@ -12,24 +10,26 @@ import numpy as np
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import psutil  # For monitoring system resources
 
+# Make the shared sigma_common package importable when run as a script
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from sigma_common.db import get_connection, execute_batched, with_retry
+from sigma_common.generation import bump_generation
+from sigma_common.rollup import refresh_hours_for
+from sigma_common.outliers import rebuild_outlier_groups
+from sigma_common.notify import publish, ML
+from change_scheduler import ChangeDrivenScheduler
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-# Database configuration
-db_config = {
-    "host": "localhost",
-    "user": "sigma",
-    "password": "sigma",
-    "database": "sigma_db",
-}
-
 def fetch_data():
     """Fetch data from the sigma_alerts table."""
+    connection = None
     try:
-        connection = mysql.connector.connect(**db_config)
+        connection = get_connection()
         with connection.cursor() as cursor:
             select_query = """
-            SELECT id, title, tags, computer_name, user_id, target_user_name, event_id, provider_name
+            SELECT id, title, tags, computer_name, user_id, target_user_name, event_id, provider_name, ml_cluster, ml_description, system_time
             FROM sigma_alerts
             WHERE title NOT IN ('Failed Logon From Public IP', 'User Logoff Event', 'External Remote SMB Logon from Public IP')
             """
@@ -38,9 +38,10 @@ def fetch_data():
         return data
     except Error as e:
         logging.error(f"Error fetching data: {e}")
-        return []
+        # Fail the run, so the scheduler keeps these rows pending instead of treating the table as empty
+        raise
     finally:
-        if connection.is_connected():
+        if connection:
             connection.close()
 
 def preprocess_data(data):
@@ -108,23 +109,37 @@ def categorize_event(row, is_anomaly):
 
 def update_cluster_labels_and_descriptions(data, anomaly_labels):
     """Update the sigma_alerts table with the anomaly labels and ML descriptions."""
-    try:
-        connection = mysql.connector.connect(**db_config)
+    update_query = """
+    UPDATE sigma_alerts
+    SET ml_cluster = %s, ml_description = %s, ml_labeled_at = COALESCE(ml_labeled_at, UTC_TIMESTAMP())
+    WHERE id = %s
+    """
+    update_data = [(int(anomaly_labels[i]), categorize_event(data[i], anomaly_labels[i] == -1), data[i][0]) for i in range(len(data))]
+    # Only rows whose label or description changed are written; rewriting the rest just takes row locks
+    changed = [i for i in range(len(data)) if update_data[i][:2] != (data[i][8], data[i][9])]
+    rows = [update_data[i] for i in changed]
+    # Relabelled rows change outlier_count in the hourly buckets of their hours, and only there
+    relabelled_times = [data[i][10] for i in changed if update_data[i][0] != data[i][8]]
+
+    def write(connection):
         with connection.cursor() as cursor:
-            update_query = """
-            UPDATE sigma_alerts
-            SET ml_cluster = %s, ml_description = %s
-            WHERE id = %s
-            """
-            update_data = [(int(anomaly_labels[i]), categorize_event(data[i], anomaly_labels[i] == -1), data[i][0]) for i in range(len(data))]
-            cursor.executemany(update_query, update_data)
+            execute_batched(cursor, update_query, rows)
+            refresh_hours_for(cursor, relabelled_times)
+            # Regroup the outliers /api/outliers serves from the new labels
+            rebuild_outlier_groups(cursor)
+            bump_generation(cursor)
             connection.commit()
-            logging.info(f"Updated {len(update_data)} records with ML cluster labels and descriptions.")
+
+    try:
+        # Ingest refreshes the same hourly buckets concurrently; a deadlock rolls back the whole write, which is retried
+        with_retry(write)
     except Error as e:
         logging.error(f"Error updating ML cluster labels and descriptions: {e}")
-    finally:
-        if connection.is_connected():
-            connection.close()
+        # The labels were rolled back; the scheduler retries the rows on its next poll
+        raise
+    # Only outliers are pushed to the live feed; normal labels are the common case
+    publish(ML, [row[2] for row in rows if row[0] == -1])
+    logging.info(f"Updated {len(rows)} of {len(data)} records with ML cluster labels and descriptions.")
 
 def detect_anomalies():
     """Fetch data, run Isolation Forest, and update the database with anomaly labels."""
@@ -167,12 +182,6 @@ def determine_batch_size(total_samples):
     logging.info(f"Determined batch size: {batch_size}")
     return batch_size
 
-# Run the script immediately with existing data
-detect_anomalies()
-
-# Schedule anomaly detection every 5 minutes
-schedule.every(5).minutes.do(detect_anomalies)
-
-while True:
-    schedule.run_pending()
-    time.sleep(1)
+if __name__ == "__main__":
+    # Run immediately with existing data, then only when sigma_alerts changes
+    ChangeDrivenScheduler(detect_anomalies).run_forever()
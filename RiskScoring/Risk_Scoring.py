@@ -1,32 +1,45 @@
-import mysql.connector
 from mysql.connector import Error
+from datetime import datetime
 import logging
 import time
+import os
+import sys
+
+# Make the shared sigma_common package importable when run as a script
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from sigma_common.db import get_connection, execute_batched, with_retry, register_pool_metrics
+from sigma_common.metrics import Counter, Gauge, Histogram, LAG_BUCKETS, serve
+from sigma_common.generation import bump_generation
+from sigma_common.rollup import refresh_hours_for
+from sigma_common.notify import publish, RISK
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger()
 
-# Database configuration
-db_config = {
-    "host": "localhost",
-    "user": "root",
-    "password": "sigma",
-    "database": "sigma_db",
-}
-
 # Batch size for database updates
 BATCH_SIZE = 1000
 
 # Sleep interval in seconds
 SLEEP_INTERVAL = 10  # 10 seconds
 
+# Port of the local /metrics endpoint; 0 turns it off
+METRICS_PORT = int(os.getenv("RISK_METRICS_PORT", "9109"))
+
+# Risk scoring metrics; lag is measured from ingested_at, which the ingest service stamps in UTC
+ROWS_SCORED = Counter("sigma_risk_rows_scored_total", "Rows given a risk score")
+PASS_SECONDS = Histogram("sigma_risk_pass_duration_seconds", "Time to fetch, score and write one pass")
+PENDING_ROWS = Gauge("sigma_risk_pending_rows", "Rows without a risk score at the start of the last pass")
+BACKLOG_AGE = Gauge("sigma_risk_backlog_age_seconds", "Age of the oldest ingested row without a risk score at the last pass")
+SCORE_LAG = Histogram("sigma_risk_score_lag_seconds", "Seconds from ingested_at to the risk score being written", buckets=LAG_BUCKETS)
+LAST_PASS = Gauge("sigma_risk_last_pass_timestamp_seconds", "When a scoring pass last finished, as a Unix timestamp")
+register_pool_metrics("sigma_risk")
 
-# Function to get a database connection
+
+# Function to get a pooled database connection
 def get_db_connection():
     try:
-        connection = mysql.connector.connect(**db_config)
-        return connection
+        return get_connection()
     except Error as e:
         logger.error(f"Error connecting to database: {e}")
         return None
@@ -53,28 +66,38 @@ def fetch_data(query, params=None):
 
 # Function to update risk scores in the database
 def update_risk_scores(data):
-    connection = get_db_connection()
-    if not connection:
-        return
-
-    try:
+    update_query = """
+    UPDATE sigma_alerts
+    SET risk = %s, risk_scored_at = UTC_TIMESTAMP()
+    WHERE id = %s
+    """
+    update_data = [(row['risk'], row['id']) for row in data]
+
+    def write(connection):
         cursor = connection.cursor()
-        update_query = """
-        UPDATE sigma_alerts
-        SET risk = %s
-        WHERE id = %s
-        """
-        for i in range(0, len(data), BATCH_SIZE):
-            batch = data[i:i + BATCH_SIZE]
-            update_data = [(row['risk'], row['id']) for row in batch]
-            cursor.executemany(update_query, update_data)
+        try:
+            # Scores, rollup and generation commit together, so a retry never finds buckets behind the scores
+            execute_batched(cursor, update_query, update_data, BATCH_SIZE)
+            # max_risk in the hourly buckets of the rescored rows is now out of date
+            refresh_hours_for(cursor, [row['system_time'] for row in data])
+            bump_generation(cursor)
             connection.commit()
-            logger.info(f"Updated risk scores for batch {i // BATCH_SIZE + 1}")
+            logger.info(f"Updated risk scores for {len(update_data)} rows in batches of {BATCH_SIZE}")
+        finally:
+            cursor.close()
+
+    try:
+        # Setting a score is idempotent, so a deadlock with the ingest service is simply retried
+        with_retry(write)
+        ROWS_SCORED.inc(len(data))
+        now = datetime.utcnow()
+        for row in data:
+            # Rows ingested before ingested_at existed have no timestamp to measure from
+            if row['ingested_at'] is not None:
+                SCORE_LAG.observe(max((now - row['ingested_at']).total_seconds(), 0))
+        publish(RISK, [row['id'] for row in data])
     except Error as e:
         logger.error(f"Error updating risk scores: {e}")
-    finally:
-        if connection:
-            connection.close()
 
 
 # Function to calculate risk score
@@ -118,15 +141,28 @@ def calculate_risk_score(tactics, techniques):
     return risk_score + max_technique_risk
 
 
+# Record the size and age of the unscored backlog found by a pass
+def record_backlog(data):
+    PENDING_ROWS.set(len(data))
+    ingested = [row['ingested_at'] for row in data if row['ingested_at'] is not None]
+    BACKLOG_AGE.set(max((datetime.utcnow() - min(ingested)).total_seconds(), 0) if ingested else 0)
+
+
 def main():
+    if METRICS_PORT and serve(METRICS_PORT):
+        logger.info(f"Serving risk scoring metrics on port {METRICS_PORT} at /metrics.")
+
     while True:
+        start = time.perf_counter()
         # Fetch records where risk is NULL
         query = """
-        SELECT id, tactics, techniques
+        SELECT id, system_time, tactics, techniques, ingested_at
         FROM sigma_alerts
         WHERE risk IS NULL
         """
         data = fetch_data(query)
+        if data is not None:
+            record_backlog(data)
 
         if not data:
             logger.info("No records found with NULL risk.")
@@ -140,6 +176,9 @@ def main():
             # Update risk scores in batches
             update_risk_scores(data)
 
+        PASS_SECONDS.observe(time.perf_counter() - start)
+        LAST_PASS.set(time.time())
+
         logger.info(f"Sleeping for {SLEEP_INTERVAL} seconds...")
         time.sleep(SLEEP_INTERVAL)
 
@@ -0,0 +1 @@
+"""Code shared by the ingest service, ML jobs, risk scoring and the API gateway."""
@@ -0,0 +1,420 @@
+"""Pooled MySQL access shared by the ingest service, ML jobs, risk scoring and the API gateway.
+
+Each process keeps a small pool of open connections instead of connecting for
+every operation. Settings come from the DB_* environment variables, so every
+component points at the same database the same way. Writers get a batched
+executemany helper and with_retry(), which re-runs a unit of work after a
+deadlock, lock wait timeout or dropped connection. Every statement run on a
+pooled connection is timed and passed to the registered statement hooks, so
+database cost can be observed in one place.
+"""
+import os
+import re
+import time
+import random
+import logging
+import threading
+from collections import deque
+import mysql.connector
+from mysql.connector import Error, errorcode
+
+logger = logging.getLogger(__name__)
+slow_logger = logging.getLogger("sigma.slow_queries")
+
+
+# Connection settings from the environment; the defaults match a local development install
+def config_from_env():
+    """Return the connection settings given by DB_HOST, DB_PORT, DB_USER, DB_PASSWORD and DB_NAME."""
+    config = {
+        "host": os.getenv("DB_HOST", "localhost"),
+        "user": os.getenv("DB_USER", "root"),
+        "password": os.getenv("DB_PASSWORD", "sigma"),
+        "database": os.getenv("DB_NAME", "sigma_db"),
+    }
+    if os.getenv("DB_PORT"):
+        config["port"] = int(os.environ["DB_PORT"])
+    return config
+
+
+db_config = config_from_env()
+
+# Pool sizing and limits; callers beyond DB_POOL_SIZE queue for up to DB_POOL_TIMEOUT seconds
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+DB_POOL_MAX_WAITING = int(os.getenv("DB_POOL_MAX_WAITING", "100"))
+DB_HEALTH_CHECK_SECONDS = float(os.getenv("DB_HEALTH_CHECK_SECONDS", "30"))
+DB_CONNECTION_MAX_AGE = float(os.getenv("DB_CONNECTION_MAX_AGE", "3600"))
+
+# Attempts and first backoff delay for with_retry; the delay doubles after each failure
+DB_RETRY_ATTEMPTS = int(os.getenv("DB_RETRY_ATTEMPTS", "3"))
+DB_RETRY_BACKOFF = float(os.getenv("DB_RETRY_BACKOFF_SECONDS", "0.5"))
+
+# Statements slower than this are logged as warnings to the sigma.slow_queries logger; 0 turns
+# the log off. Parameters are logged too unless DB_SLOW_STATEMENT_PARAMS=0
+DB_SLOW_STATEMENT_MS = float(os.getenv("DB_SLOW_STATEMENT_MS", "1000"))
+DB_SLOW_STATEMENT_PARAMS = os.getenv("DB_SLOW_STATEMENT_PARAMS", "1") != "0"
+
+# Rows per executemany call in execute_batched
+BATCH_SIZE = 1000
+
+# The connection is gone; it must not go back into the pool
+CONNECTION_ERRORS = {
+    errorcode.CR_CONNECTION_ERROR,
+    errorcode.CR_CONN_HOST_ERROR,
+    errorcode.CR_SERVER_GONE_ERROR,
+    errorcode.CR_SERVER_LOST,
+}
+
+# The server rolled the transaction back or never saw it, so running the work again is safe
+TRANSIENT_ERRORS = CONNECTION_ERRORS | {
+    errorcode.ER_LOCK_DEADLOCK,
+    errorcode.ER_LOCK_WAIT_TIMEOUT,
+}
+
+
+class PoolTimeout(Error):
+    """No connection became free within the acquire timeout."""
+
+
+_statement_hooks = []
+
+
+def add_statement_hook(hook):
+    """Call hook(statement, params, seconds, rowcount) after every statement run on a pooled connection.
+
+    params is None for executemany, whose rows are counted by rowcount instead.
+    """
+    if hook not in _statement_hooks:
+        _statement_hooks.append(hook)
+
+
+def remove_statement_hook(hook):
+    if hook in _statement_hooks:
+        _statement_hooks.remove(hook)
+
+
+def _report(statement, params, seconds, rowcount):
+    for hook in list(_statement_hooks):
+        try:
+            hook(statement, params, seconds, rowcount)
+        except Exception as e:
+            # Observability must never break the query it observes
+            logger.debug(f"Statement hook {hook!r} failed: {e}")
+
+
+# MariaDB's per-statement settings, e.g. SET STATEMENT max_statement_time = 5 FOR SELECT ...
+SET_STATEMENT_PREFIX = re.compile(r"^\s*SET\s+STATEMENT\s+.+?\s+FOR\s+", re.IGNORECASE | re.DOTALL)
+
+
+def strip_statement_settings(statement):
+    """The statement without a leading MariaDB SET STATEMENT ... FOR clause."""
+    statement = statement.decode() if isinstance(statement, bytes) else statement
+    return SET_STATEMENT_PREFIX.sub("", statement, count=1)
+
+
+def statement_summary(statement, limit=200):
+    """The statement on one line, cut to limit characters, for logs and labels."""
+    statement = statement.decode() if isinstance(statement, bytes) else str(statement)
+    statement = " ".join(statement.split())
+    return statement if len(statement) <= limit else statement[:limit - 3] + "..."
+
+
+def log_slow_statements(statement, params, seconds, rowcount):
+    """Statement hook that logs statements slower than DB_SLOW_STATEMENT_MS, with their parameters."""
+    if seconds * 1000 >= DB_SLOW_STATEMENT_MS:
+        message = f"Slow statement ({seconds * 1000:.0f} ms, {rowcount} rows): {statement_summary(statement, 2000)}"
+        if DB_SLOW_STATEMENT_PARAMS and params is not None:
+            message += f" | params: {statement_summary(repr(params), 500)}"
+        slow_logger.warning(message)
+
+
+if DB_SLOW_STATEMENT_MS > 0:
+    add_statement_hook(log_slow_statements)
+
+
+class TimedCursor:
+    """Cursor proxy that reports how long each execute and executemany took."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+        return False
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._cursor.execute(operation, params, *args, **kwargs)
+        finally:
+            _report(operation, params, time.perf_counter() - start, self._cursor.rowcount)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._cursor.executemany(operation, seq_params, *args, **kwargs)
+        finally:
+            _report(operation, None, time.perf_counter() - start, self._cursor.rowcount)
+
+
+class PooledConnection:
+    """A checked-out connection; close() hands it back to its pool instead of closing it."""
+
+    def __init__(self, pool, connection, created_at):
+        self._pool = pool
+        self._connection = connection
+        self._created_at = created_at
+        self._broken = False
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def cursor(self, *args, **kwargs):
+        return TimedCursor(self._connection.cursor(*args, **kwargs))
+
+    def mark_broken(self):
+        """Discard rather than reuse this connection, e.g. after a connection-level error."""
+        self._broken = True
+
+    def close(self):
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            pool._release(self._connection, self._created_at, self._broken)
+
+
+class ConnectionPool:
+    """Fixed-size MySQL connection pool with a bounded wait queue.
+
+    Callers beyond `size` wait up to `acquire_timeout` seconds for a connection
+    instead of failing at once, and at most `max_waiting` may wait at a time.
+    Idle connections are pinged before reuse once they have been idle for
+    `health_check_after` seconds, and recycled after `max_age` seconds.
+    With `autocommit` off, an uncommitted transaction is rolled back when the
+    connection is returned, so the next user never inherits it.
+    """
+
+    def __init__(self, config, size=10, acquire_timeout=5.0, max_waiting=100,
+                 health_check_after=30.0, max_age=3600.0, session_sql=(),
+                 autocommit=True, connect=None):
+        self.config = dict(config)
+        self.size = size
+        self.acquire_timeout = acquire_timeout
+        self.max_waiting = max_waiting
+        self.health_check_after = health_check_after
+        self.max_age = max_age
+        self.session_sql = list(session_sql)
+        self.autocommit = autocommit
+        self.connect = connect or mysql.connector.connect
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = deque()  # (connection, created_at, last_used)
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._in_use = 0
+        self._timeouts = 0
+        self._wait_seconds = 0.0
+
+    def _connect(self):
+        connection = self.connect(**self.config)
+        connection.autocommit = self.autocommit
+        cursor = connection.cursor()
+        for statement in self.session_sql:
+            try:
+                cursor.execute(statement)
+            except Error:
+                # e.g. max_execution_time on a server that does not know it
+                pass
+        cursor.close()
+        return connection, time.monotonic()
+
+    def _healthy(self, connection, created_at, last_used):
+        now = time.monotonic()
+        if now - created_at > self.max_age:
+            return False
+        if now - last_used < self.health_check_after:
+            return True
+        try:
+            connection.ping(reconnect=False)
+            return True
+        except Error:
+            return False
+
+    def acquire(self, timeout=None):
+        """Check out a connection, waiting up to timeout (default acquire_timeout) for a free slot."""
+        timeout = self.acquire_timeout if timeout is None else timeout
+        with self._lock:
+            if self._waiting >= self.max_waiting:
+                self._timeouts += 1
+                raise PoolTimeout("Too many callers waiting for a database connection")
+            self._waiting += 1
+        start = time.monotonic()
+        try:
+            acquired = self._slots.acquire(timeout=timeout)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+                self._wait_seconds += time.monotonic() - start
+        if not acquired:
+            with self._lock:
+                self._timeouts += 1
+            raise PoolTimeout(f"No database connection free after {timeout:.1f}s")
+
+        try:
+            while True:
+                with self._lock:
+                    entry = self._idle.pop() if self._idle else None
+                if entry is None:
+                    connection, created_at = self._connect()
+                    break
+                connection, created_at, last_used = entry
+                if self._healthy(connection, created_at, last_used):
+                    break
+                self._discard(connection)
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use += 1
+        return PooledConnection(self, connection, created_at)
+
+    def _release(self, connection, created_at, broken):
+        with self._lock:
+            self._in_use -= 1
+        try:
+            if broken or time.monotonic() - created_at > self.max_age:
+                self._discard(connection)
+            else:
+                # Drop any unread result and open transaction so the next user starts clean
+                if connection.unread_result:
+                    connection.get_rows()
+                if not self.autocommit:
+                    connection.rollback()
+                with self._lock:
+                    self._idle.append((connection, created_at, time.monotonic()))
+        except Error:
+            self._discard(connection)
+        finally:
+            self._slots.release()
+
+    def _discard(self, connection):
+        try:
+            connection.close()
+        except Error:
+            pass
+
+    def stats(self):
+        """Snapshot of pool usage for metrics and health endpoints."""
+        with self._lock:
+            return {
+                "size": self.size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+                "timeouts": self._timeouts,
+                "wait_seconds": round(self._wait_seconds, 3),
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def configure(config=None, **options):
+    """Replace this process's pool, e.g. to point a benchmark at a scratch database.
+
+    Takes the connection settings (default db_config) and any ConnectionPool
+    options; connections already checked out keep working until closed.
+    """
+    global _pool
+    settings = {
+        "size": DB_POOL_SIZE,
+        "acquire_timeout": DB_POOL_TIMEOUT,
+        "max_waiting": DB_POOL_MAX_WAITING,
+        "health_check_after": DB_HEALTH_CHECK_SECONDS,
+        "max_age": DB_CONNECTION_MAX_AGE,
+        # Workers commit their own transactions
+        "autocommit": False,
+    }
+    settings.update(options)
+    with _pool_lock:
+        _pool = ConnectionPool(db_config if config is None else config, **settings)
+        return _pool
+
+
+def get_pool():
+    """This process's pool, created from db_config on first use."""
+    with _pool_lock:
+        pool = _pool
+    return pool if pool is not None else configure()
+
+
+def get_connection():
+    """Check a connection out of this process's pool; close() returns it."""
+    return get_pool().acquire()
+
+
+def pool_stats():
+    """Usage of this process's pool, or None if nothing has connected yet."""
+    with _pool_lock:
+        return _pool.stats() if _pool is not None else None
+
+
+def execute_batched(cursor, query, rows, batch_size=BATCH_SIZE, commit=None):
+    """executemany rows in chunks of batch_size, calling commit() after each chunk if given.
+
+    Returns the number of rows sent.
+    """
+    rows = list(rows)
+    for i in range(0, len(rows), batch_size):
+        cursor.executemany(query, rows[i:i + batch_size])
+        if commit is not None:
+            commit()
+    return len(rows)
+
+
+def with_retry(work, attempts=None, backoff=None):
+    """Run work(connection) on a pooled connection and return its result.
+
+    Deadlocks, lock wait timeouts and lost connections are retried up to
+    attempts times (DB_RETRY_ATTEMPTS) on a fresh connection, waiting backoff
+    (DB_RETRY_BACKOFF_SECONDS) doubled after each failure, with jitter. work must
+    be safe to run again from the start. Any other error is raised at once.
+    """
+    attempts = DB_RETRY_ATTEMPTS if attempts is None else attempts
+    backoff = DB_RETRY_BACKOFF if backoff is None else backoff
+    for attempt in range(1, attempts + 1):
+        connection = None
+        try:
+            connection = get_connection()
+            return work(connection)
+        except Error as e:
+            if connection is not None and e.errno in CONNECTION_ERRORS:
+                connection.mark_broken()
+            if e.errno not in TRANSIENT_ERRORS or attempt == attempts:
+                raise
+            delay = backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+            logger.warning(f"Transient database error ({e}), retrying in {delay:.2f}s (attempt {attempt} of {attempts}).")
+        finally:
+            if connection is not None:
+                connection.close()
+        time.sleep(delay)
+
+
+def register_pool_metrics(prefix):
+    """Export this process's pool usage as {prefix}_db_pool_connections{state=...} gauges."""
+    from sigma_common.metrics import Gauge
+
+    def values():
+        stats = pool_stats() or {}
+        return [({"state": state}, stats[state]) for state in ("size", "in_use", "idle", "waiting") if state in stats]
+
+    return Gauge(f"{prefix}_db_pool_connections", "Pooled database connections by state", ["state"], function=values)
@@ -0,0 +1,26 @@
+"""Data generation counters.
+
+Every writer to sigma_alerts bumps the counter after committing, and the API
+gateway embeds the current value in its cache keys, so cached responses are
+invalidated as soon as the data changes.
+"""
+
+SIGMA_ALERTS = "sigma_alerts"
+
+
+def bump_generation(cursor, name=SIGMA_ALERTS):
+    """Increment the generation for name; the caller commits."""
+    cursor.execute(
+        "INSERT INTO data_generation (name, generation) VALUES (%s, 1) "
+        "ON DUPLICATE KEY UPDATE generation = generation + 1",
+        (name,),
+    )
+
+
+def read_generation(cursor, name=SIGMA_ALERTS):
+    """Return the current generation for name, 0 if it has never been bumped."""
+    cursor.execute("SELECT generation FROM data_generation WHERE name = %s", (name,))
+    row = cursor.fetchone()
+    if not row:
+        return 0
+    return int(row["generation"] if isinstance(row, dict) else row[0])
@@ -0,0 +1,25 @@
+"""Secondary indexes on sigma_alerts, one per query shape that reads it.
+
+Each entry is (table, index name, columns). Columns follow the shape of the
+queries they serve: equality filters first, then the system_time range, then
+id so keyset pages and ORDER BY system_time, id read the index in order. The
+entity indexes also cover the *_logs COUNT(*) queries without touching rows.
+Benchmarks/explain_check.py runs EXPLAIN on every route query and fails on a
+full table scan. Migration 4 in sigma_common.migrations creates this set with
+its own copy of the list; an index added here later needs a new migration.
+"""
+
+INDEXES = [
+    # 7-day windows, keyset pagination, rollup refreshes and the highrisk snapshot
+    ("sigma_alerts", "idx_system_time_id", "system_time, id"),
+    # *_logs, export and timelines by entity, optionally narrowed to one rule title
+    ("sigma_alerts", "idx_user_title_time", "user_id, title, system_time, id"),
+    ("sigma_alerts", "idx_target_user_title_time", "target_user_name, title, system_time, id"),
+    ("sigma_alerts", "idx_computer_title_time", "computer_name, title, system_time, id"),
+    # export?title= without an entity
+    ("sigma_alerts", "idx_title_time", "title, system_time, id"),
+    # Outlier groups: ml_cluster = -1 within the 7-day window
+    ("sigma_alerts", "idx_ml_cluster_time", "ml_cluster, system_time"),
+    # Risk scoring's backlog: risk IS NULL
+    ("sigma_alerts", "idx_risk", "risk"),
+]
@@ -0,0 +1,360 @@
+"""Versioned schema migrations for the sigma database.
+
+MIGRATIONS is an ordered list of (version, description, steps). migrate()
+applies the pending ones in a single session and records each in the
+schema_version table, so a service whose schema is current starts after one
+SELECT. Migrations never change once released: a schema change is a new
+version at the end of the list.
+
+Steps are idempotent, so a migration interrupted half way is simply run
+again, and databases created before versioning (by the old ensure_* calls)
+are brought in line without errors. ALTERs ask for ALGORITHM=INSTANT or
+INPLACE with LOCK=NONE so sigma_alerts stays readable and writable while they
+run, falling back to the server's default where it cannot do that, and give up
+after MIGRATION_LOCK_WAIT seconds rather than queueing every query on the
+table behind a metadata lock.
+"""
+import os
+import time
+import logging
+from mysql.connector import Error
+from sigma_common.db import get_connection
+
+logger = logging.getLogger(__name__)
+
+# Seconds an ALTER may wait for a metadata lock on a busy table before failing
+MIGRATION_LOCK_WAIT = int(os.getenv("DB_MIGRATION_LOCK_WAIT_SECONDS", "10"))
+
+# Seconds a service waits for another one that is migrating the same database
+MIGRATION_TIMEOUT = int(os.getenv("DB_MIGRATION_TIMEOUT_SECONDS", "600"))
+
+# Tries, and seconds between them, before a service gives up on an unmigrated schema;
+# a busy sigma_alerts makes an ALTER give up after MIGRATION_LOCK_WAIT on purpose
+MIGRATION_ATTEMPTS = int(os.getenv("DB_MIGRATION_ATTEMPTS", "5"))
+MIGRATION_RETRY_SECONDS = float(os.getenv("DB_MIGRATION_RETRY_SECONDS", "30"))
+
+# Named lock serializing migrations across services starting together
+MIGRATION_LOCK = "sigma_schema_migrations"
+
+# Server errors meaning an ALGORITHM/LOCK clause is unsupported: not possible for this
+# change (1845, 1846), a value the server does not know, like INSTANT before MySQL 8.0 or
+# MariaDB 10.3 (1800, 1801), or a clause it cannot parse (1064)
+UNSUPPORTED_ALGORITHM_ERRORS = {1064, 1800, 1801, 1845, 1846}
+
+# Error for a missing table (schema_version before the first migration)
+NO_SUCH_TABLE = 1146
+
+CREATE_SCHEMA_VERSION_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_version (
+    version INT PRIMARY KEY,
+    description VARCHAR(255) NOT NULL,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+# Tables as they stood when versioning was introduced. These are frozen: later changes to any
+# of them come from new migrations, never from edits here
+CREATE_SIGMA_ALERTS_TABLE = """
+CREATE TABLE IF NOT EXISTS sigma_alerts (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    title VARCHAR(255),
+    tags TEXT,
+    description TEXT,
+    system_time DATETIME,
+    computer_name VARCHAR(100),
+    user_id VARCHAR(100),
+    event_id VARCHAR(50),
+    provider_name VARCHAR(100),
+    ml_cluster INT DEFAULT NULL,
+    ip_address VARCHAR(50),
+    task VARCHAR(255),
+    rule_level VARCHAR(50),
+    target_user_name VARCHAR(100),
+    target_domain_name VARCHAR(100),
+    ruleid VARCHAR(50),
+    raw TEXT,
+    unique_hash VARCHAR(64),
+    tactics TEXT DEFAULT NULL,
+    techniques TEXT DEFAULT NULL,
+    ml_description TEXT DEFAULT NULL,
+    risk INT DEFAULT NULL,
+    UNIQUE INDEX unique_log (unique_hash)
+);
+"""
+
+CREATE_DATA_GENERATION_TABLE = """
+CREATE TABLE IF NOT EXISTS data_generation (
+    name VARCHAR(64) PRIMARY KEY,
+    generation BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+"""
+
+CREATE_HOURLY_TABLE = """
+CREATE TABLE IF NOT EXISTS sigma_alerts_hourly (
+    bucket_hour DATETIME NOT NULL,
+    bucket_key BINARY(16) NOT NULL,
+    title VARCHAR(255),
+    tags TEXT,
+    description TEXT,
+    rule_level VARCHAR(50),
+    user_id VARCHAR(100),
+    target_user_name VARCHAR(100),
+    computer_name VARCHAR(100),
+    event_count INT NOT NULL,
+    max_risk INT DEFAULT NULL,
+    outlier_count INT NOT NULL DEFAULT 0,
+    first_seen DATETIME,
+    last_seen DATETIME,
+    PRIMARY KEY (bucket_hour, bucket_key),
+    INDEX idx_hourly_user (user_id, bucket_hour),
+    INDEX idx_hourly_target_user (target_user_name, bucket_hour),
+    INDEX idx_hourly_computer (computer_name, bucket_hour)
+);
+"""
+
+CREATE_TAGS_TABLE = """
+CREATE TABLE IF NOT EXISTS tags (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    tag_type VARCHAR(20) NOT NULL,
+    UNIQUE INDEX unique_tag (name),
+    INDEX idx_tag_type (tag_type)
+);
+"""
+
+CREATE_ALERT_TAGS_TABLE = """
+CREATE TABLE IF NOT EXISTS alert_tags (
+    tag_id INT NOT NULL,
+    system_time DATETIME NOT NULL,
+    alert_id INT NOT NULL,
+    PRIMARY KEY (tag_id, system_time, alert_id),
+    INDEX idx_alert_tags_alert (alert_id),
+    INDEX idx_alert_tags_time (system_time)
+);
+"""
+
+CREATE_OUTLIER_GROUPS_TABLE = """
+CREATE TABLE IF NOT EXISTS outlier_groups (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    group_key BINARY(16) NOT NULL,
+    title VARCHAR(255),
+    tactics TEXT,
+    techniques TEXT,
+    severity VARCHAR(50),
+    risk INT DEFAULT NULL,
+    ml_description TEXT,
+    first_seen DATETIME,
+    last_seen DATETIME,
+    anomaly_count INT NOT NULL DEFAULT 0,
+    origin_users TEXT,
+    origin_users_count INT NOT NULL DEFAULT 0,
+    impacted_computers TEXT,
+    impacted_computers_count INT NOT NULL DEFAULT 0,
+    source_ips TEXT,
+    source_ips_count INT NOT NULL DEFAULT 0,
+    refreshed_at DATETIME NOT NULL,
+    UNIQUE INDEX unique_outlier_group (group_key),
+    INDEX idx_outlier_groups_rank (anomaly_count, last_seen)
+);
+"""
+
+CREATE_OUTLIER_GROUP_MEMBERS_TABLE = """
+CREATE TABLE IF NOT EXISTS outlier_group_members (
+    group_id INT NOT NULL,
+    member_type VARCHAR(20) NOT NULL,
+    member VARCHAR(100) NOT NULL,
+    event_count INT NOT NULL,
+    first_seen DATETIME,
+    last_seen DATETIME,
+    PRIMARY KEY (group_id, member_type, member),
+    INDEX idx_outlier_members_rank (group_id, member_type, event_count)
+);
+"""
+
+
+def online_alter(cursor, statement, algorithms):
+    """Run an ALTER TABLE with the first ALGORITHM/LOCK clause the server accepts, then with none."""
+    for clause in algorithms:
+        try:
+            cursor.execute(f"{statement}, {clause}")
+            return clause
+        except Error as e:
+            if e.errno not in UNSUPPORTED_ALGORITHM_ERRORS:
+                raise
+    cursor.execute(statement)
+    logger.warning(f"Server could not run online, used the default algorithm: {statement}")
+    return None
+
+
+def create(statement):
+    """Step running a CREATE ... IF NOT EXISTS statement."""
+    def step(cursor):
+        cursor.execute(statement)
+    return step
+
+
+def add_column(table, column, definition):
+    """Step adding a column unless it exists; appended columns are INSTANT on MySQL 8 and MariaDB 10.3+."""
+    def step(cursor):
+        cursor.execute(
+            "SELECT 1 FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s",
+            (table, column),
+        )
+        if cursor.fetchall():
+            return
+        online_alter(
+            cursor, f"ALTER TABLE {table} ADD COLUMN {column} {definition}",
+            ["ALGORITHM=INSTANT", "ALGORITHM=INPLACE, LOCK=NONE"],
+        )
+        logger.info(f"Added '{column}' column to '{table}' table.")
+    return step
+
+
+def add_index(table, name, columns):
+    """Step adding an index unless it exists; built INPLACE without blocking writes."""
+    def step(cursor):
+        cursor.execute(
+            "SELECT 1 FROM information_schema.STATISTICS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s",
+            (table, name),
+        )
+        if cursor.fetchall():
+            return
+        online_alter(cursor, f"ALTER TABLE {table} ADD INDEX {name} ({columns})", ["ALGORITHM=INPLACE, LOCK=NONE"])
+        logger.info(f"Added index '{name}' to '{table}' table.")
+    return step
+
+
+MIGRATIONS = [
+    (1, "Base tables", [
+        create(CREATE_SIGMA_ALERTS_TABLE),
+        create(CREATE_DATA_GENERATION_TABLE),
+        create(CREATE_HOURLY_TABLE),
+        create(CREATE_TAGS_TABLE),
+        create(CREATE_ALERT_TAGS_TABLE),
+        create(CREATE_OUTLIER_GROUPS_TABLE),
+        create(CREATE_OUTLIER_GROUP_MEMBERS_TABLE),
+    ]),
+    # Databases from before these columns were part of the schema may lack some of them
+    (2, "sigma_alerts columns added after the first release", [
+        add_column("sigma_alerts", "ml_cluster", "INT DEFAULT NULL"),
+        add_column("sigma_alerts", "tactics", "TEXT DEFAULT NULL"),
+        add_column("sigma_alerts", "techniques", "TEXT DEFAULT NULL"),
+        add_column("sigma_alerts", "ml_description", "TEXT DEFAULT NULL"),
+        add_column("sigma_alerts", "raw", "TEXT"),
+        add_column("sigma_alerts", "ip_address", "VARCHAR(50)"),
+        add_column("sigma_alerts", "task", "VARCHAR(255)"),
+        add_column("sigma_alerts", "rule_level", "VARCHAR(50)"),
+        add_column("sigma_alerts", "target_user_name", "VARCHAR(100)"),
+        add_column("sigma_alerts", "target_domain_name", "VARCHAR(100)"),
+        add_column("sigma_alerts", "ruleid", "VARCHAR(50)"),
+        add_column("sigma_alerts", "risk", "INT DEFAULT NULL"),
+    ]),
+    # All UTC: end-to-end lag is system_time -> ingested_at -> risk_scored_at / ml_labeled_at
+    (3, "Pipeline timestamps", [
+        add_column("sigma_alerts", "ingested_at", "DATETIME DEFAULT NULL"),
+        add_column("sigma_alerts", "risk_scored_at", "DATETIME DEFAULT NULL"),
+        add_column("sigma_alerts", "ml_labeled_at", "DATETIME DEFAULT NULL"),
+    ]),
+    # Written out rather than built from sigma_common.indexes.INDEXES, which may grow after release
+    (4, "Composite indexes for the dashboard and worker query shapes", [
+        add_index("sigma_alerts", "idx_system_time_id", "system_time, id"),
+        add_index("sigma_alerts", "idx_user_title_time", "user_id, title, system_time, id"),
+        add_index("sigma_alerts", "idx_target_user_title_time", "target_user_name, title, system_time, id"),
+        add_index("sigma_alerts", "idx_computer_title_time", "computer_name, title, system_time, id"),
+        add_index("sigma_alerts", "idx_title_time", "title, system_time, id"),
+        add_index("sigma_alerts", "idx_ml_cluster_time", "ml_cluster, system_time"),
+        add_index("sigma_alerts", "idx_risk", "risk"),
+    ]),
+    # refreshed_at has second precision, so two rebuilds in the same second could not tell their groups apart
+    (5, "Rebuild number on outlier groups", [
+        add_column("outlier_groups", "rebuild_id", "BIGINT NOT NULL DEFAULT 0"),
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(cursor):
+    """The highest applied migration, 0 for a database that has none recorded."""
+    try:
+        cursor.execute("SELECT MAX(version) FROM schema_version")
+    except Error as e:
+        if e.errno == NO_SUCH_TABLE:
+            return 0
+        raise
+    return cursor.fetchall()[0][0] or 0
+
+
+def apply_pending(connection, cursor):
+    """Apply every migration newer than the recorded version; the caller holds MIGRATION_LOCK."""
+    cursor.execute(CREATE_SCHEMA_VERSION_TABLE)
+    version = current_version(cursor)
+    cursor.execute("SELECT @@SESSION.lock_wait_timeout")
+    lock_wait_timeout = cursor.fetchall()[0][0]
+    cursor.execute(f"SET SESSION lock_wait_timeout = {int(MIGRATION_LOCK_WAIT)}")
+    try:
+        for number, description, steps in MIGRATIONS:
+            if number <= version:
+                continue
+            logger.info(f"Applying schema migration {number}: {description}.")
+            for step in steps:
+                step(cursor)
+            # DDL commits implicitly, so each migration is recorded as soon as it is done
+            cursor.execute("INSERT INTO schema_version (version, description) VALUES (%s, %s)", (number, description))
+            connection.commit()
+            version = number
+    finally:
+        # The connection goes back to the pool
+        cursor.execute(f"SET SESSION lock_wait_timeout = {int(lock_wait_timeout)}")
+    return version
+
+
+def migrate():
+    """Bring the schema up to LATEST_VERSION and return the version in place, or None on failure.
+
+    Costs one query when nothing is pending. Otherwise takes MIGRATION_LOCK so
+    that services starting together migrate once, and re-reads the version
+    under it.
+    """
+    connection = None
+    try:
+        connection = get_connection()
+        cursor = connection.cursor()
+        version = current_version(cursor)
+        if version >= LATEST_VERSION:
+            return version
+
+        cursor.execute("SELECT GET_LOCK(%s, %s)", (MIGRATION_LOCK, MIGRATION_TIMEOUT))
+        if cursor.fetchall()[0][0] != 1:
+            logger.error("Timed out waiting for another service to finish migrating the schema.")
+            return None
+        try:
+            version = apply_pending(connection, cursor)
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK,))
+            cursor.fetchall()
+        logger.info(f"Schema is at version {version}.")
+        return version
+    except Error as e:
+        logger.error(f"Error migrating the schema: {e}")
+        return None
+    finally:
+        if connection:
+            connection.close()
+
+
+def migrate_with_retry(attempts=MIGRATION_ATTEMPTS, delay=MIGRATION_RETRY_SECONDS):
+    """migrate(), tried up to attempts times delay seconds apart; returns the version or None if every try failed.
+
+    Services must not start on a schema they cannot write to, so callers exit
+    on None.
+    """
+    for attempt in range(1, attempts + 1):
+        version = migrate()
+        if version is not None:
+            return version
+        if attempt < attempts:
+            logger.warning(f"Schema migration failed (attempt {attempt} of {attempts}), retrying in {delay:.0f}s.")
+            time.sleep(delay)
+    return None
@@ -0,0 +1,82 @@
+"""Local pub/sub for change notifications.
+
+Writers publish the ids they just committed as small JSON datagrams to a UDP
+multicast group; every API worker that serves the live feed subscribes to it
+and fetches those rows once for all of its clients. Multicast lets any number
+of worker processes receive each message without a broker, and the default TTL
+of 0 keeps the datagrams on this host. Delivery is best effort: a lost
+datagram only means a live client misses that update, never that a writer
+fails.
+"""
+import os
+import json
+import socket
+import struct
+import logging
+
+FEED_ENABLED = os.getenv("SIGMA_FEED_ENABLED", "1") != "0"
+FEED_GROUP = os.getenv("SIGMA_FEED_GROUP", "239.255.42.99")
+FEED_PORT = int(os.getenv("SIGMA_FEED_PORT", "5499"))
+FEED_TTL = int(os.getenv("SIGMA_FEED_TTL", "0"))
+
+# Keeps each datagram well under the 64 KB UDP limit
+MAX_IDS_PER_MESSAGE = 1000
+
+# Message kinds
+ALERTS = "alerts"  # rows inserted or re-ingested
+RISK = "risk"      # risk scores assigned
+ML = "ml"          # rows labelled as outliers
+
+logger = logging.getLogger(__name__)
+
+_publisher = None
+
+
+def _publisher_socket():
+    global _publisher
+    if _publisher is None:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, FEED_TTL)
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+        _publisher = sock
+    return _publisher
+
+
+def publish(kind, ids):
+    """Announce that the sigma_alerts rows with these ids changed; call after committing."""
+    if not FEED_ENABLED or not ids:
+        return
+    ids = [int(row_id) for row_id in ids]
+    try:
+        sock = _publisher_socket()
+        for i in range(0, len(ids), MAX_IDS_PER_MESSAGE):
+            message = json.dumps({"kind": kind, "ids": ids[i:i + MAX_IDS_PER_MESSAGE]}, separators=(",", ":"))
+            sock.sendto(message.encode(), (FEED_GROUP, FEED_PORT))
+    except OSError as e:
+        logger.warning(f"Could not publish {kind} notification: {e}")
+
+
+def subscribe(timeout=1.0):
+    """Return a socket joined to the feed group; read it with receive()."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if hasattr(socket, "SO_REUSEPORT"):
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind(("", FEED_PORT))
+    membership = struct.pack("4s4s", socket.inet_aton(FEED_GROUP), socket.inet_aton("0.0.0.0"))
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+    sock.settimeout(timeout)
+    return sock
+
+
+def receive(sock):
+    """Return (kind, ids) for the next message, or None on timeout or a malformed datagram."""
+    try:
+        data = sock.recv(65535)
+    except socket.timeout:
+        return None
+    try:
+        message = json.loads(data)
+        return message["kind"], [int(row_id) for row_id in message["ids"]]
+    except (ValueError, KeyError, TypeError):
+        return None
@@ -0,0 +1,120 @@
+"""Precomputed outlier groups.
+
+The ML jobs rebuild these after labelling, so /api/outliers reads a small
+summary table instead of grouping every outlier of the last 7 days with
+unbounded GROUP_CONCATs. A group is one (title, tactics, techniques,
+rule_level, risk, ml_description) combination of outliers; its origin users,
+impacted computers and source IPs are kept in full in outlier_group_members,
+while outlier_groups only carries their counts and the most frequent few.
+"""
+import os
+from datetime import datetime
+from sigma_common.generation import bump_generation, read_generation
+
+# How many of the most frequent members are inlined into each group row
+MEMBER_SAMPLE_SIZE = int(os.getenv("OUTLIER_MEMBER_SAMPLE_SIZE", "20"))
+
+# data_generation counter numbering the rebuilds; each stamps the groups it keeps with its number
+OUTLIER_REBUILDS = "outlier_rebuilds"
+
+# Member type -> sigma_alerts column; the API exposes the types
+MEMBER_COLUMNS = {
+    "user": "user_id",
+    "computer": "computer_name",
+    "ip": "ip_address",
+}
+
+# Joins the members of a sample; CHAR(31), the unit separator, cannot occur in a user, computer or IP
+MEMBER_SEPARATOR = "\x1f"
+
+# Member type -> outlier_groups columns holding its sample and count
+MEMBER_SUMMARY_COLUMNS = {
+    "user": ("origin_users", "origin_users_count"),
+    "computer": ("impacted_computers", "impacted_computers_count"),
+    "ip": ("source_ips", "source_ips_count"),
+}
+
+# NULLs map to CHAR(0) so they stay distinct from ''
+GROUP_KEY_SQL = (
+    "UNHEX(MD5(CONCAT_WS(CHAR(31), IFNULL({p}title, CHAR(0)), IFNULL({p}tactics, CHAR(0)), "
+    "IFNULL({p}techniques, CHAR(0)), IFNULL({p}rule_level, CHAR(0)), IFNULL({p}risk, CHAR(0)), "
+    "IFNULL({p}ml_description, CHAR(0)))))"
+)
+
+# Outliers still held in sigma_alerts; {p} is an optional table alias prefix
+OUTLIER_WINDOW_SQL = "{p}ml_cluster = -1 AND {p}system_time >= NOW() - INTERVAL 7 DAY"
+
+UPSERT_GROUPS_QUERY = f"""
+INSERT INTO outlier_groups (group_key, title, tactics, techniques, severity, risk, ml_description, first_seen, last_seen, anomaly_count, refreshed_at, rebuild_id)
+SELECT {GROUP_KEY_SQL.format(p="")}, title, tactics, techniques, rule_level, risk, ml_description, first_seen, last_seen, anomaly_count, %s, %s
+FROM (
+    SELECT title, tactics, techniques, rule_level, risk, ml_description,
+        MIN(system_time) AS first_seen, MAX(system_time) AS last_seen, COUNT(*) AS anomaly_count
+    FROM sigma_alerts
+    WHERE {OUTLIER_WINDOW_SQL.format(p="")}
+    GROUP BY title, tactics, techniques, rule_level, risk, ml_description
+) AS grouped
+ON DUPLICATE KEY UPDATE
+first_seen = VALUES(first_seen), last_seen = VALUES(last_seen), anomaly_count = VALUES(anomaly_count), refreshed_at = VALUES(refreshed_at), rebuild_id = VALUES(rebuild_id);
+"""
+
+INSERT_MEMBERS_QUERY = """
+INSERT INTO outlier_group_members (group_id, member_type, member, event_count, first_seen, last_seen)
+SELECT g.id, %s, a.{column}, COUNT(*), MIN(a.system_time), MAX(a.system_time)
+FROM sigma_alerts a
+JOIN outlier_groups g ON g.group_key = {group_key}
+WHERE {window}
+AND a.{column} IS NOT NULL
+GROUP BY g.id, a.{column};
+"""
+
+SUMMARIZE_MEMBERS_QUERY = """
+UPDATE outlier_groups g
+LEFT JOIN (
+    SELECT group_id,
+        SUBSTRING_INDEX(GROUP_CONCAT(member ORDER BY event_count DESC, member SEPARATOR CHAR(31)), CHAR(31), %s) AS sample,
+        COUNT(*) AS member_count
+    FROM outlier_group_members
+    WHERE member_type = %s
+    GROUP BY group_id
+) AS m ON m.group_id = g.id
+SET g.{sample_column} = m.sample, g.{count_column} = IFNULL(m.member_count, 0);
+"""
+
+
+def split_sample(sample):
+    """The member names of a stored sample, most frequent first."""
+    return sample.split(MEMBER_SEPARATOR) if sample else []
+
+
+def insert_members_query(column):
+    """INSERT_MEMBERS_QUERY for the members held in one sigma_alerts column."""
+    return INSERT_MEMBERS_QUERY.format(
+        column=column, group_key=GROUP_KEY_SQL.format(p="a."), window=OUTLIER_WINDOW_SQL.format(p="a."),
+    )
+
+
+def rebuild_outlier_groups(cursor):
+    """Recompute outlier_groups and outlier_group_members from the current labels; the caller commits.
+
+    Group ids stay stable across rebuilds for groups that still exist, so
+    drill-down links keep working.
+    """
+    # The bump holds the counter's row lock until commit, so rebuilds run one at a time and a group
+    # is stale exactly when this rebuild did not stamp it, however close together rebuilds run
+    bump_generation(cursor, OUTLIER_REBUILDS)
+    rebuild_id = read_generation(cursor, OUTLIER_REBUILDS)
+    cursor.execute(UPSERT_GROUPS_QUERY, (datetime.now().replace(microsecond=0), rebuild_id))
+    cursor.execute("DELETE FROM outlier_groups WHERE rebuild_id <> %s", (rebuild_id,))
+
+    cursor.execute("DELETE FROM outlier_group_members")
+    for member_type, column in MEMBER_COLUMNS.items():
+        cursor.execute(insert_members_query(column), (member_type,))
+
+    # The sample only needs the first MEMBER_SAMPLE_SIZE names, but GROUP_CONCAT must not cut one in half
+    cursor.execute("SET SESSION group_concat_max_len = 1048576")
+    for member_type, (sample_column, count_column) in MEMBER_SUMMARY_COLUMNS.items():
+        cursor.execute(
+            SUMMARIZE_MEMBERS_QUERY.format(sample_column=sample_column, count_column=count_column),
+            (MEMBER_SAMPLE_SIZE, member_type),
+        )
@@ -0,0 +1,174 @@
+"""Hourly rollup of sigma_alerts.
+
+sigma_alerts_hourly holds one row per (hour, rule, user, target user, computer)
+with event counts, max risk, outlier counts and first/last seen times. Writers
+refresh the hours they touched with absolute values recomputed from
+sigma_alerts, so a refresh is idempotent and safe to repeat. Buckets outlive
+the raw rows (see ROLLUP_RETENTION_DAYS), which is what lets the API answer
+windows wider than the raw table keeps. Hours before raw_cutoff() are no longer
+complete in sigma_alerts, so they are never recomputed; late rows for them are
+added onto the existing buckets instead (add_ingested_rows).
+"""
+import os
+from datetime import datetime, timedelta
+
+HOURLY_TABLE = "sigma_alerts_hourly"
+
+# Buckets older than this are purged; raw rows are only kept for RAW_RETENTION_DAYS
+ROLLUP_RETENTION_DAYS = int(os.getenv("ROLLUP_RETENTION_DAYS", "90"))
+
+# Days of raw rows the ingest service keeps in sigma_alerts
+RAW_RETENTION_DAYS = 7
+
+# Keep IN lists to a sane size
+CHUNK_SIZE = 1000
+
+# bucket_key identifies the group within an hour; NULLs map to CHAR(0) so they stay distinct from ''
+REFRESH_QUERY = """
+INSERT INTO sigma_alerts_hourly (bucket_hour, bucket_key, title, tags, description, rule_level, user_id, target_user_name, computer_name, event_count, max_risk, outlier_count, first_seen, last_seen)
+SELECT
+    bucket_hour,
+    UNHEX(MD5(CONCAT_WS(CHAR(31), IFNULL(title, CHAR(0)), IFNULL(tags, CHAR(0)), IFNULL(description, CHAR(0)), IFNULL(rule_level, CHAR(0)), IFNULL(user_id, CHAR(0)), IFNULL(target_user_name, CHAR(0)), IFNULL(computer_name, CHAR(0))))),
+    title, tags, description, rule_level, user_id, target_user_name, computer_name,
+    event_count, max_risk, outlier_count, first_seen, last_seen
+FROM (
+    SELECT
+        TIMESTAMP(DATE(system_time), MAKETIME(HOUR(system_time), 0, 0)) AS bucket_hour,
+        title, tags, description, rule_level, user_id, target_user_name, computer_name,
+        COUNT(*) AS event_count,
+        MAX(risk) AS max_risk,
+        COUNT(CASE WHEN ml_cluster = -1 THEN 1 END) AS outlier_count,
+        MIN(system_time) AS first_seen,
+        MAX(system_time) AS last_seen
+    FROM sigma_alerts
+    WHERE system_time >= %s AND system_time < %s
+    GROUP BY bucket_hour, title, tags, description, rule_level, user_id, target_user_name, computer_name
+) AS grouped
+ON DUPLICATE KEY UPDATE
+event_count = VALUES(event_count), max_risk = VALUES(max_risk), outlier_count = VALUES(outlier_count), first_seen = VALUES(first_seen), last_seen = VALUES(last_seen);
+"""
+
+# Adds newly ingested rows onto buckets that can no longer be recomputed; the rows are
+# picked by unique_hash and by the ingested_at of their batch, which a duplicate keeps from its first insert
+ADD_QUERY = """
+INSERT INTO sigma_alerts_hourly (bucket_hour, bucket_key, title, tags, description, rule_level, user_id, target_user_name, computer_name, event_count, max_risk, outlier_count, first_seen, last_seen)
+SELECT
+    bucket_hour,
+    UNHEX(MD5(CONCAT_WS(CHAR(31), IFNULL(title, CHAR(0)), IFNULL(tags, CHAR(0)), IFNULL(description, CHAR(0)), IFNULL(rule_level, CHAR(0)), IFNULL(user_id, CHAR(0)), IFNULL(target_user_name, CHAR(0)), IFNULL(computer_name, CHAR(0))))),
+    title, tags, description, rule_level, user_id, target_user_name, computer_name,
+    event_count, max_risk, outlier_count, first_seen, last_seen
+FROM (
+    SELECT
+        TIMESTAMP(DATE(system_time), MAKETIME(HOUR(system_time), 0, 0)) AS bucket_hour,
+        title, tags, description, rule_level, user_id, target_user_name, computer_name,
+        COUNT(*) AS event_count,
+        MAX(risk) AS max_risk,
+        COUNT(CASE WHEN ml_cluster = -1 THEN 1 END) AS outlier_count,
+        MIN(system_time) AS first_seen,
+        MAX(system_time) AS last_seen
+    FROM sigma_alerts
+    WHERE system_time < %s AND ingested_at = %s AND unique_hash IN ({placeholders})
+    GROUP BY bucket_hour, title, tags, description, rule_level, user_id, target_user_name, computer_name
+) AS grouped
+ON DUPLICATE KEY UPDATE
+event_count = sigma_alerts_hourly.event_count + VALUES(event_count),
+max_risk = GREATEST(COALESCE(sigma_alerts_hourly.max_risk, VALUES(max_risk)), COALESCE(VALUES(max_risk), sigma_alerts_hourly.max_risk)),
+outlier_count = sigma_alerts_hourly.outlier_count + VALUES(outlier_count),
+first_seen = LEAST(sigma_alerts_hourly.first_seen, VALUES(first_seen)),
+last_seen = GREATEST(sigma_alerts_hourly.last_seen, VALUES(last_seen));
+"""
+
+
+def floor_hour(moment):
+    """Start of the hour containing moment (a datetime or 'YYYY-MM-DD HH:MM:SS' string)."""
+    if isinstance(moment, str):
+        moment = datetime.strptime(moment[:19], "%Y-%m-%d %H:%M:%S")
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def hour_ranges(times):
+    """Collapse system times into contiguous (first_hour, last_hour) runs."""
+    hours = sorted({floor_hour(moment) for moment in times if moment})
+    ranges = []
+    for hour in hours:
+        if ranges and hour - ranges[-1][1] == timedelta(hours=1):
+            ranges[-1][1] = hour
+        else:
+            ranges.append([hour, hour])
+    return [tuple(run) for run in ranges]
+
+
+def raw_cutoff():
+    """First hour still complete in sigma_alerts; truncate_old_data deletes the rows before it."""
+    return floor_hour(datetime.now() - timedelta(days=RAW_RETENTION_DAYS))
+
+
+def refresh_hours(cursor, first_hour, last_hour, cutoff=None):
+    """Recompute the buckets for every hour in [first_hour, last_hour]; the caller commits.
+
+    Hours before cutoff (default raw_cutoff()) are skipped: their rows may have
+    been truncated already, and recomputing them would drop the retained counts.
+    """
+    start = max(floor_hour(first_hour), raw_cutoff() if cutoff is None else cutoff)
+    end = floor_hour(last_hour) + timedelta(hours=1)
+    if start >= end:
+        return
+    # Groups that no longer have rows (e.g. relabelled or deleted) must disappear
+    cursor.execute("DELETE FROM sigma_alerts_hourly WHERE bucket_hour >= %s AND bucket_hour < %s", (start, end))
+    cursor.execute(REFRESH_QUERY, (start, end))
+
+
+def refresh_hours_for(cursor, times):
+    """Refresh the buckets of every hour the given system times fall into; the caller commits."""
+    for first_hour, last_hour in hour_ranges(times):
+        refresh_hours(cursor, first_hour, last_hour)
+
+
+def add_ingested_rows(cursor, before, unique_hashes, ingested_at):
+    """Add the rows first inserted at ingested_at among unique_hashes with system_time < before onto their buckets.
+
+    For late or replayed events in hours that can no longer be recomputed; the
+    caller commits in the same transaction as the insert.
+    """
+    for i in range(0, len(unique_hashes), CHUNK_SIZE):
+        chunk = unique_hashes[i:i + CHUNK_SIZE]
+        placeholders = ", ".join(["%s"] * len(chunk))
+        cursor.execute(ADD_QUERY.format(placeholders=placeholders), [before, ingested_at] + list(chunk))
+
+
+def refresh_ingested(cursor, times, unique_hashes, ingested_at):
+    """Bring the buckets up to date after an ingest batch; the caller commits.
+
+    Hours from raw_cutoff() on are recomputed. Rows in older hours are added
+    onto the existing buckets, which hold counts whose rows are already gone.
+    """
+    cutoff = raw_cutoff()
+    refresh_hours_for(cursor, [moment for moment in times if moment and floor_hour(moment) >= cutoff])
+    if any(moment and floor_hour(moment) < cutoff for moment in times):
+        add_ingested_rows(cursor, cutoff, unique_hashes, ingested_at)
+
+
+def refresh_raw_span(cursor, cutoff=None):
+    """Refresh every complete hour sigma_alerts still holds rows for; the caller commits.
+
+    cutoff is passed on to refresh_hours; a freshly seeded table that was never
+    truncated can pass datetime.min to roll up all of it.
+    """
+    cursor.execute("SELECT MIN(system_time), MAX(system_time) FROM sigma_alerts")
+    row = cursor.fetchone()
+    first, last = (row["MIN(system_time)"], row["MAX(system_time)"]) if isinstance(row, dict) else row
+    if first is not None:
+        refresh_hours(cursor, first, last, cutoff)
+
+
+def rollup_is_empty(cursor):
+    """True when the hourly table has no buckets yet, e.g. right after it was created."""
+    cursor.execute("SELECT 1 FROM sigma_alerts_hourly LIMIT 1")
+    return cursor.fetchone() is None
+
+
+def purge_expired_buckets(cursor, retention_days=ROLLUP_RETENTION_DAYS):
+    """Delete buckets older than the retention period and return how many were removed."""
+    cutoff = floor_hour(datetime.now()) - timedelta(days=retention_days)
+    cursor.execute("DELETE FROM sigma_alerts_hourly WHERE bucket_hour < %s", (cutoff,))
+    return cursor.rowcount
@@ -0,0 +1,120 @@
+"""Normalized tag dimension and alert-to-tag bridge.
+
+sigma_alerts keeps the Sigma tags as one comma-joined string such as
+'attack.execution,attack.t1059.001'. The ingest service also splits it into a
+tags dimension (one row per distinct tag, typed tactic/technique/other) and an
+alert_tags bridge, so "all alerts with T1059" is an index lookup instead of a
+LIKE scan. system_time is copied onto the bridge so a tag filter over a time
+window is a single range scan of its primary key.
+"""
+import re
+
+# Same rule the ingest service uses to split tags into the tactics/techniques columns
+TECHNIQUE_PATTERN = re.compile(r'^t\d{4}(\.\d+)?$')
+
+# Keep IN lists and executemany batches to a sane size
+CHUNK_SIZE = 1000
+
+
+def parse_tag(tag):
+    """Return (name, tag_type) for one raw tag, or None if it is blank.
+
+    Names drop the 'attack.' prefix and are lowercased; ATT&CK technique ids are
+    'technique', other ATT&CK tags 'tactic' and anything else 'other'.
+    """
+    tag = tag.strip().strip('"').lower()
+    if not tag:
+        return None
+    is_attack = tag.startswith("attack.")
+    name = tag[len("attack."):] if is_attack else tag
+    if TECHNIQUE_PATTERN.match(name):
+        return name, "technique"
+    return name, "tactic" if is_attack else "other"
+
+
+def split_tags(tags):
+    """Parse a comma-joined tags string into unique (name, tag_type) pairs, keeping their order."""
+    parsed = {}
+    for tag in (tags or "").split(","):
+        result = parse_tag(tag)
+        if result and result[0] not in parsed:
+            parsed[result[0]] = result[1]
+    return list(parsed.items())
+
+
+def tag_filter_values(tag):
+    """Return (name, LIKE pattern) matching a tag and, for techniques, its sub-techniques (t1059 -> t1059.*)."""
+    result = parse_tag(tag)
+    name = result[0] if result else ""
+    escaped = name.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return name, escaped + ".%"
+
+
+def _value(row, index, name):
+    return row[name] if isinstance(row, dict) else row[index]
+
+
+def sync_alert_tags(cursor, alerts):
+    """Replace the bridge rows of the given alerts; the caller commits.
+
+    alerts is a list of (id, system_time, tags) rows, tuples or dicts. Alerts
+    without a system_time are not bridged, like they are left out of every
+    time-windowed query.
+    """
+    alerts = [
+        (_value(row, 0, "id"), _value(row, 1, "system_time"), _value(row, 2, "tags"))
+        for row in alerts
+    ]
+    for i in range(0, len(alerts), CHUNK_SIZE):
+        chunk = alerts[i:i + CHUNK_SIZE]
+        placeholders = ", ".join(["%s"] * len(chunk))
+        # Re-ingested alerts may carry different tags
+        cursor.execute(f"DELETE FROM alert_tags WHERE alert_id IN ({placeholders})", [row[0] for row in chunk])
+
+        parsed = [(alert_id, system_time, split_tags(tags)) for alert_id, system_time, tags in chunk if system_time]
+        names = {}
+        for _, _, pairs in parsed:
+            names.update(pairs)
+        if not names:
+            continue
+
+        cursor.executemany("INSERT IGNORE INTO tags (name, tag_type) VALUES (%s, %s)", list(names.items()))
+        placeholders = ", ".join(["%s"] * len(names))
+        cursor.execute(f"SELECT id, name FROM tags WHERE name IN ({placeholders})", list(names))
+        tag_ids = {_value(row, 1, "name"): _value(row, 0, "id") for row in cursor.fetchall()}
+
+        bridge = [
+            (tag_ids[name], system_time, alert_id)
+            for alert_id, system_time, pairs in parsed
+            for name, _ in pairs
+            if name in tag_ids
+        ]
+        cursor.executemany("INSERT IGNORE INTO alert_tags (tag_id, system_time, alert_id) VALUES (%s, %s, %s)", bridge)
+
+
+def backfill_alert_tags(cursor, after_id=0, batch_size=CHUNK_SIZE):
+    """Bridge the next batch of sigma_alerts rows with id > after_id; the caller commits.
+
+    Returns the last id processed, or None once every row has been bridged.
+    """
+    cursor.execute(
+        "SELECT id, system_time, tags FROM sigma_alerts WHERE id > %s ORDER BY id LIMIT %s",
+        (after_id, batch_size),
+    )
+    rows = cursor.fetchall()
+    if not rows:
+        return None
+    sync_alert_tags(cursor, rows)
+    return _value(rows[-1], 0, "id")
+
+
+def alert_tags_is_empty(cursor):
+    """True when the bridge has no rows yet, e.g. right after it was created."""
+    cursor.execute("SELECT 1 FROM alert_tags LIMIT 1")
+    return cursor.fetchone() is None
+
+
+def delete_alert_tags_before(cursor, cutoff):
+    """Drop bridge rows of alerts older than cutoff, mirroring the raw truncation; the caller commits."""
+    cursor.execute("DELETE FROM alert_tags WHERE system_time < %s", (cutoff,))
+    return cursor.rowcount